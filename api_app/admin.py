@@ -1,4 +1,6 @@
 from django.contrib import admin
+
+from django_starter.utils import EstimatedCountPaginator
 from .models import Product, Review, Order, OrderItem, UserProfile, APIKey
 
 
@@ -15,6 +17,9 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = ['product', 'user', 'rating', 'is_verified', 'created_at']
+    list_select_related = ['product', 'user']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ['rating', 'is_verified', 'created_at']
     search_fields = ['title', 'content', 'user__username', 'product__name']
     raw_id_fields = ['product', 'user']
@@ -36,6 +41,9 @@ class OrderItemInline(admin.TabularInline):
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'status', 'total_amount', 'created_at']
+    list_select_related = ['user']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ['status', 'created_at']
     search_fields = ['user__username', 'user__email', 'shipping_address']
     raw_id_fields = ['user']
@@ -56,6 +64,7 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'phone', 'is_premium', 'created_at']
+    list_select_related = ['user']
     list_filter = ['is_premium', 'created_at']
     search_fields = ['user__username', 'user__email', 'phone']
     raw_id_fields = ['user']
@@ -64,6 +73,7 @@ class UserProfileAdmin(admin.ModelAdmin):
 @admin.register(APIKey)
 class APIKeyAdmin(admin.ModelAdmin):
     list_display = ['name', 'user', 'is_active', 'rate_limit', 'last_used', 'created_at']
+    list_select_related = ['user']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'user__username', 'key']
     raw_id_fields = ['user']
@@ -450,6 +450,24 @@ class DashboardViewTests(BaseAPITestCase):
         url = reverse('api_app:dashboard')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_dashboard_counts(self):
+        """Test dashboard aggregates orders, reviews and notes"""
+        from notes_app.models import Note
+        Order.objects.create(user=self.regular_user, shipping_address='A', status=Order.Status.PENDING)
+        Order.objects.create(
+            user=self.regular_user, shipping_address='B',
+            status=Order.Status.DELIVERED, total_amount=Decimal('12.50')
+        )
+        # Author stats are invalidated when the note's transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.create(title='Draft', slug='dashboard-draft', content='One two', author=self.regular_user)
+        self.client.force_authenticate(user=self.regular_user)
+        response = self.client.get(reverse('api_app:dashboard'))
+        self.assertEqual(response.data['orders'], {'total': 2, 'pending': 1, 'completed': 1})
+        self.assertEqual(response.data['spending']['total'], 12.5)
+        self.assertEqual(response.data['reviews'], {'total': 0, 'verified': 0})
+        self.assertEqual(response.data['notes']['draft'], 1)
 
 
 class GlobalSearchViewTests(BaseAPITestCase):
@@ -587,6 +605,51 @@ class APIKeyViewSetTests(BaseAPITestCase):
 
 from django.urls import reverse
 
+class AdminChangelistQueryTests(BaseAPITestCase):
+    """Test that admin changelists run a fixed number of queries"""
+    
+    def setUp(self):
+        super().setUp()
+        self.admin_user.is_active = True
+        self.admin_user.save()
+        self.client.force_login(self.admin_user)
+        self.row_count = 0
+    
+    def _add_rows(self, count):
+        for _ in range(count):
+            self.row_count += 1
+            user = User.objects.create_user(
+                email=f'buyer{self.row_count}@example.com',
+                username=f'buyer{self.row_count}',
+                password='testpass123'
+            )
+            Review.objects.create(
+                product=self.product, user=user, rating=5, title='Great', content='Great'
+            )
+            Order.objects.create(user=user, shipping_address='Somewhere')
+            UserProfile.objects.create(user=user)
+            APIKey.objects.create(user=user, name='Key', key=f'key-{self.row_count}')
+    
+    def _changelist_queries(self, model):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse(f'admin:api_app_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+    
+    def test_changelist_query_count_is_constant(self):
+        """Test each changelist's query count does not grow with its rows"""
+        models = [Product, Review, Order, UserProfile, APIKey]
+        self._add_rows(1)
+        baseline = {model: self._changelist_queries(model) for model in models}
+        self._add_rows(4)
+        for model in models:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self._changelist_queries(model), baseline[model])
+
+
 class TestApiAppClassBasedViews(TestCase):
     """Tests for api_app class-based views"""
 
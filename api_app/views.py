@@ -477,27 +477,33 @@ class DashboardView(views.APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
+        from notes_app.stats import get_author_stats
+        
         user = request.user
+        delivered = Q(status=Order.Status.DELIVERED)
+        orders = Order.objects.filter(user=user).aggregate(
+            total=Count('pk'),
+            pending=Count('pk', filter=Q(status=Order.Status.PENDING)),
+            completed=Count('pk', filter=delivered),
+            spending=models.Sum('total_amount', filter=delivered),
+        )
+        reviews = Review.objects.filter(user=user).aggregate(
+            total=Count('pk'),
+            verified=Count('pk', filter=Q(is_verified=True)),
+        )
         
         data = {
             'user': UserSerializer(user).data,
             'orders': {
-                'total': Order.objects.filter(user=user).count(),
-                'pending': Order.objects.filter(user=user, status=Order.Status.PENDING).count(),
-                'completed': Order.objects.filter(user=user, status=Order.Status.DELIVERED).count(),
-            },
-            'reviews': {
-                'total': Review.objects.filter(user=user).count(),
-                'verified': Review.objects.filter(user=user, is_verified=True).count(),
+                'total': orders['total'],
+                'pending': orders['pending'],
+                'completed': orders['completed'],
             },
+            'reviews': reviews,
             'spending': {
-                'total': float(
-                    Order.objects.filter(
-                        user=user,
-                        status=Order.Status.DELIVERED
-                    ).aggregate(total=models.Sum('total_amount'))['total'] or 0
-                )
-            }
+                'total': float(orders['spending'] or 0)
+            },
+            'notes': get_author_stats(user.pk),
         }
         
         return Response(data)
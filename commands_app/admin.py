@@ -2,7 +2,10 @@
 Admin configuration for Commands App
 """
 from django.contrib import admin
+from django.db.models import Case, F, FloatField, When
 from django.utils.html import format_html
+
+from django_starter.utils import EstimatedCountPaginator
 from .models import (
     ScheduledTask, TaskExecution, CommandLog,
     SystemMetric, DataImport, DataExport
@@ -38,6 +41,9 @@ class ScheduledTaskAdmin(admin.ModelAdmin):
 @admin.register(TaskExecution)
 class TaskExecutionAdmin(admin.ModelAdmin):
     list_display = ['task', 'status_badge', 'started_at', 'duration_seconds', 'triggered_by']
+    list_select_related = ['task']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ['status', 'triggered_by', 'task']
     search_fields = ['task__name', 'output', 'error_message']
     ordering = ['-started_at']
@@ -62,6 +68,9 @@ class TaskExecutionAdmin(admin.ModelAdmin):
 @admin.register(CommandLog)
 class CommandLogAdmin(admin.ModelAdmin):
     list_display = ['command_name', 'status_badge', 'started_at', 'duration_seconds', 'executed_by']
+    list_select_related = ['executed_by']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ['status', 'command_name']
     search_fields = ['command_name', 'output', 'error_output']
     ordering = ['-started_at']
@@ -86,6 +95,8 @@ class CommandLogAdmin(admin.ModelAdmin):
 @admin.register(SystemMetric)
 class SystemMetricAdmin(admin.ModelAdmin):
     list_display = ['name', 'value', 'unit', 'category', 'timestamp']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ['category', 'name']
     search_fields = ['name']
     ordering = ['-timestamp']
@@ -100,15 +111,26 @@ class DataImportAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
     readonly_fields = ['started_at', 'completed_at', 'total_records', 'processed_records']
     
+    def get_queryset(self, request):
+        # Computed in SQL so the column can be sorted on
+        return super().get_queryset(request).annotate(
+            progress_pct=Case(
+                When(total_records=0, then=None),
+                default=F('processed_records') * 100.0 / F('total_records'),
+                output_field=FloatField(),
+            )
+        )
+    
     def progress(self, obj):
-        if obj.total_records == 0:
+        if obj.progress_pct is None:
             return '-'
-        pct = (obj.processed_records / obj.total_records) * 100
+        pct = f'{obj.progress_pct:.0f}'
         return format_html(
-            '<div class="progress"><div class="progress-bar" style="width: {}%">{:.0f}%</div></div>',
+            '<div class="progress"><div class="progress-bar" style="width: {}%">{}%</div></div>',
             pct, pct
         )
     progress.short_description = 'Progress'
+    progress.admin_order_field = 'progress_pct'
 
 
 @admin.register(DataExport)
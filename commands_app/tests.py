@@ -595,3 +595,58 @@ class TestCommandsAppFunctions(TestCase):
         """
         from commands_app import views
         self.assertTrue(hasattr(views, 'task_run_api') or hasattr(views, 'TaskDetailView') or True)
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Test that admin changelists run a fixed number of queries"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            password='adminpass123'
+        )
+        self.admin.is_active = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+    
+    def _add_rows(self, count):
+        for i in range(count):
+            task = ScheduledTask.objects.create(
+                name=f'Task {i}', command='check', schedule='* * * * *', created_by=self.admin
+            )
+            TaskExecution.objects.create(task=task, status='completed')
+            CommandLog.objects.create(command_name='check', executed_by=self.admin)
+            SystemMetric.objects.create(name='cpu', value=i)
+            DataImport.objects.create(
+                name=f'Import {i}', source_type='file', source_path='data.csv',
+                total_records=10, processed_records=i, created_by=self.admin
+            )
+    
+    def _changelist_queries(self, model):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse(f'admin:commands_app_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+    
+    def test_changelist_query_count_is_constant(self):
+        """Test each changelist's query count does not grow with its rows"""
+        models = [ScheduledTask, TaskExecution, CommandLog, SystemMetric, DataImport]
+        self._add_rows(1)
+        baseline = {model: self._changelist_queries(model) for model in models}
+        self._add_rows(4)
+        for model in models:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self._changelist_queries(model), baseline[model])
+    
+    def test_import_progress_is_rendered(self):
+        """Test the import progress column renders the annotated percentage"""
+        DataImport.objects.create(
+            name='Half done', source_type='file', source_path='data.csv',
+            total_records=8, processed_records=4, created_by=self.admin
+        )
+        response = self.client.get(reverse('admin:commands_app_dataimport_changelist'))
+        self.assertContains(response, 'width: 50%')
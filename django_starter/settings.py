@@ -75,6 +75,48 @@ ELASTICSEARCH_HOST = config('ELASTICSEARCH_HOST', default='https://elasticsearch
 ELASTICSEARCH_USER = config('ELASTICSEARCH_USER', default='elastic')
 ELASTICSEARCH_PASSWORD = config('ELASTICSEARCH_PASSWORD', default='')
 ELASTICSEARCH_INDEX_PREFIX = config('ELASTICSEARCH_INDEX_PREFIX', default='django_starter')
+# Per-operation timeouts (seconds): searches fail fast, bulk loads and merges get minutes
+ELASTICSEARCH_SEARCH_TIMEOUT = config('ELASTICSEARCH_SEARCH_TIMEOUT', default=5, cast=int)
+ELASTICSEARCH_REQUEST_TIMEOUT = config('ELASTICSEARCH_REQUEST_TIMEOUT', default=10, cast=int)
+ELASTICSEARCH_INDEXING_TIMEOUT = config('ELASTICSEARCH_INDEXING_TIMEOUT', default=120, cast=int)
+ELASTICSEARCH_HEALTH_TIMEOUT = config('ELASTICSEARCH_HEALTH_TIMEOUT', default=2, cast=int)
+ELASTICSEARCH_HEALTH_CACHE_SECONDS = config('ELASTICSEARCH_HEALTH_CACHE_SECONDS', default=15, cast=int)
+# Connections per node; match the worker's thread count
+ELASTICSEARCH_POOL_MAXSIZE = config('ELASTICSEARCH_POOL_MAXSIZE', default=25, cast=int)
+ELASTICSEARCH_MAX_RETRIES = config('ELASTICSEARCH_MAX_RETRIES', default=2, cast=int)
+# Circuit breaker: consecutive failures before opening, seconds before a trial request
+ELASTICSEARCH_BREAKER_FAILURES = config('ELASTICSEARCH_BREAKER_FAILURES', default=5, cast=int)
+ELASTICSEARCH_BREAKER_RESET = config('ELASTICSEARCH_BREAKER_RESET', default=30, cast=int)
+ELASTICSEARCH_INDEX_VERSIONS_TO_KEEP = config('ELASTICSEARCH_INDEX_VERSIONS_TO_KEEP', default=2, cast=int)
+ELASTICSEARCH_AUTO_INDEX = config('ELASTICSEARCH_AUTO_INDEX', default=True, cast=bool)
+ELASTICSEARCH_INDEX_DEBOUNCE = config('ELASTICSEARCH_INDEX_DEBOUNCE', default=2, cast=int)
+ELASTICSEARCH_SEARCH_CACHE_TIMEOUT = config('ELASTICSEARCH_SEARCH_CACHE_TIMEOUT', default=60, cast=int)
+ELASTICSEARCH_MAX_RESULT_WINDOW = config('ELASTICSEARCH_MAX_RESULT_WINDOW', default=10000, cast=int)
+ELASTICSEARCH_ANALYTICS_BUFFER_SIZE = config('ELASTICSEARCH_ANALYTICS_BUFFER_SIZE', default=5000, cast=int)
+ELASTICSEARCH_ANALYTICS_FLUSH_BATCH = config('ELASTICSEARCH_ANALYTICS_FLUSH_BATCH', default=100, cast=int)
+ELASTICSEARCH_ANALYTICS_FLUSH_INTERVAL = config('ELASTICSEARCH_ANALYTICS_FLUSH_INTERVAL', default=5, cast=int)
+# Analytics page reads hourly/daily rollups; raw query rows are pruned once rolled up
+ELASTICSEARCH_ANALYTICS_SUMMARY_DAYS = config('ELASTICSEARCH_ANALYTICS_SUMMARY_DAYS', default=30, cast=int)
+ELASTICSEARCH_SEARCH_QUERY_RETENTION_DAYS = config('ELASTICSEARCH_SEARCH_QUERY_RETENTION_DAYS', default=7, cast=int)
+ELASTICSEARCH_HOURLY_ROLLUP_RETENTION_DAYS = config('ELASTICSEARCH_HOURLY_ROLLUP_RETENTION_DAYS', default=30, cast=int)
+# Rows younger than this are left for the next rollup run, so late commits are not skipped
+ELASTICSEARCH_ROLLUP_LAG_SECONDS = config('ELASTICSEARCH_ROLLUP_LAG_SECONDS', default=120, cast=int)
+# In-process prefix trie of popular searches answering /api/suggest/ before Elasticsearch
+ELASTICSEARCH_SUGGEST_TRIE = config('ELASTICSEARCH_SUGGEST_TRIE', default=True, cast=bool)
+ELASTICSEARCH_SUGGEST_TRIE_SIZE = config('ELASTICSEARCH_SUGGEST_TRIE_SIZE', default=1000, cast=int)
+ELASTICSEARCH_SUGGEST_TRIE_TTL = config('ELASTICSEARCH_SUGGEST_TRIE_TTL', default=300, cast=int)
+# Search-time synonyms from SearchSynonym (synonyms.py): the file Django writes and
+# the same file as Elasticsearch sees it, relative to its config directory
+ELASTICSEARCH_SYNONYMS_FILE = config('ELASTICSEARCH_SYNONYMS_FILE', default='')
+ELASTICSEARCH_SYNONYMS_PATH = config('ELASTICSEARCH_SYNONYMS_PATH', default='')
+ELASTICSEARCH_SYNONYMS_DEBOUNCE = config('ELASTICSEARCH_SYNONYMS_DEBOUNCE', default=5, cast=int)
+# Application logs bulk-shipped to daily {prefix}_logs-YYYY.MM.DD indices (log_handlers.py)
+ELASTICSEARCH_LOG_SHIPPING = config('ELASTICSEARCH_LOG_SHIPPING', default=False, cast=bool)
+ELASTICSEARCH_LOG_LEVEL = config('ELASTICSEARCH_LOG_LEVEL', default='INFO')
+ELASTICSEARCH_LOG_QUEUE_SIZE = config('ELASTICSEARCH_LOG_QUEUE_SIZE', default=10000, cast=int)
+ELASTICSEARCH_LOG_BATCH_SIZE = config('ELASTICSEARCH_LOG_BATCH_SIZE', default=500, cast=int)
+ELASTICSEARCH_LOG_FLUSH_INTERVAL = config('ELASTICSEARCH_LOG_FLUSH_INTERVAL', default=2, cast=int)
+ELASTICSEARCH_LOG_RETENTION_DAYS = config('ELASTICSEARCH_LOG_RETENTION_DAYS', default=14, cast=int)
 
 # Harbor Configuration
 HARBOR_URL = config('HARBOR_URL', default='https://harbor.arpansahu.space')
@@ -200,6 +242,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',  # Required for django-allauth
+    'notes_app.middleware.FragmentCacheMetricsMiddleware',  # X-Fragment-Cache hit ratio header
+    'elasticsearch_app.log_handlers.RequestLogContextMiddleware',  # Request fields on shipped logs
 ]
 
 ROOT_URLCONF = 'django_starter.urls'
@@ -295,6 +339,19 @@ if not USE_S3:
     STATIC_URL = '/static/'
     STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
     MEDIA_URL = '/media/'
+
+    STORAGES = {
+        'default': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        },
+        'staticfiles': {
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        },
+        # Deduplicated, reference-counted note attachments
+        'attachments': {
+            'BACKEND': f'{PROJECT_NAME}.storage_backends.DedupFileSystemStorage',
+        },
+    }
 else:
     AWS_S3_REGION_NAME = config('AWS_S3_REGION_NAME', default='eu-north-1')
 
@@ -369,6 +426,11 @@ else:
             },
         },
     }
+    # Deduplicated, reference-counted note attachments
+    STORAGES['attachments'] = {
+        **STORAGES['default'],
+        'BACKEND': f'{PROJECT_NAME}.storage_backends.DedupPublicMediaStorage',
+    }
 
     # Assign the custom storage backends to Django settings
     # STATICFILES_STORAGE = f'{PROJECT_NAME}.storage_backends.StaticStorage'
@@ -533,12 +595,46 @@ SOCIALACCOUNT_ADAPTER = 'user_account.adapter.CustomSocialAccountAdapter'
 MAIL_JET_API_KEY = MAIL_JET_API_KEY
 MAIL_JET_API_SECRET = MAIL_JET_API_SECRET
 
+from celery.schedules import crontab
+
 CELERY_BROKER_URL = REDIS_CLOUD_URL
 CELERY_RESULT_BACKEND = REDIS_CLOUD_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+CELERY_BEAT_SCHEDULE = {
+    # Full related-notes rebuild; also refreshes the IDF weights that
+    # incremental updates keep frozen
+    'rebuild-related-notes': {
+        'task': 'notes_app.tasks.rebuild_related_notes',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'abort-stale-attachment-uploads': {
+        'task': 'notes_app.tasks.abort_stale_attachment_uploads',
+        'schedule': crontab(minute=30),
+    },
+    'rollup-search-queries': {
+        'task': 'elasticsearch_app.tasks.rollup_search_queries',
+        'schedule': crontab(minute='*/5'),
+    },
+    'cleanup-old-search-queries': {
+        'task': 'elasticsearch_app.tasks.cleanup_old_search_queries',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'cleanup-old-log-indices': {
+        'task': 'elasticsearch_app.tasks.cleanup_old_log_indices',
+        'schedule': crontab(hour=4, minute=15),
+    },
+}
+
+# Bulk note actions on more notes than this run in a Celery task
+NOTES_BULK_ASYNC_THRESHOLD = config('NOTES_BULK_ASYNC_THRESHOLD', default=200, cast=int)
+
+# Chunked attachment uploads; S3 needs every part but the last to be >= 5 MiB
+NOTES_UPLOAD_CHUNK_SIZE = config('NOTES_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+NOTES_ATTACHMENT_MAX_UPLOAD_SIZE = config('NOTES_ATTACHMENT_MAX_UPLOAD_SIZE', default=1024 ** 3, cast=int)
+
 # Redis SSL Configuration for TLS connections
 import ssl
 CELERY_REDIS_BACKEND_USE_SSL = {
@@ -621,6 +717,10 @@ LOGGING = {
             'class': 'sentry_sdk.integrations.logging.EventHandler',
             'formatter': 'verbose',
         },
+        'elasticsearch': {
+            'level': ELASTICSEARCH_LOG_LEVEL,
+            'class': 'elasticsearch_app.log_handlers.ElasticsearchLogHandler',
+        },
     },
     'loggers': {
         'django': {
@@ -666,6 +766,12 @@ LOGGING = {
     },
 }
 
+if ELASTICSEARCH_LOG_SHIPPING:
+    # Ship the django loggers and everything that reaches the root logger
+    for _logger in ('django', 'django.request', 'django.db.backends', 'django.security'):
+        LOGGING['loggers'][_logger]['handlers'].append('elasticsearch')
+    LOGGING['root'] = {'handlers': ['console', 'elasticsearch'], 'level': 'WARNING'}
+
 CSRF_TRUSTED_ORIGINS = [f'{PROTOCOL}{DOMAIN}', f'{PROTOCOL}*.{DOMAIN}']
 
 # =============================================================================
@@ -1,4 +1,10 @@
+import hashlib
+import os
+
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
 from storages.backends.s3boto3 import S3Boto3Storage
 
 class StaticStorage(S3Boto3Storage):
@@ -32,4 +38,133 @@ class PrivateMediaStorage(S3Boto3Storage):
     querystring_expire = 3600  # URLs expire in 1 hour
     addressing_style = getattr(settings, 'AWS_S3_ADDRESSING_STYLE', 'auto')
     signature_version = getattr(settings, 'AWS_S3_SIGNATURE_VERSION', 's3v4')
-    verify = getattr(settings, 'AWS_S3_VERIFY', True)
\ No newline at end of file
+    verify = getattr(settings, 'AWS_S3_VERIFY', True)
+
+
+class ContentAddressedStorageMixin:
+    """
+    Deduplicating storage: files are stored once per distinct content.
+
+    Saving hashes the content in one streaming pass and names the blob
+    after its SHA-256. When a blob with that hash already exists in this
+    storage the upload (an S3 PUT) is skipped and the existing name is
+    returned. Every save and adopt adds a reference to the blob's
+    file_manager.StoredBlob row, and every delete removes one
+    (django_cleanup deletes a field's file when its row is deleted or the
+    file replaced). The stored object is removed only when its last
+    reference goes.
+
+    Files saved before deduplication have no StoredBlob row and are
+    deleted directly, as before.
+    """
+    # Distinguishes blob rows of storages that share a bucket
+    blob_namespace = 'default'
+    blob_prefix = 'blobs'
+
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()
+        return f'{self.blob_prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+    def save(self, name, content, max_length=None):
+        from file_manager.models import StoredBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            from django.core.files import File
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        digest = digest.hexdigest()
+        content.seek(0)
+
+        existing = StoredBlob.objects.filter(
+            namespace=self.blob_namespace, sha256=digest
+        ).values_list('name', flat=True).first()
+        if existing is None:
+            # Blob names are derived from the content, so a concurrent
+            # upload of the same file writes identical bytes to the same key
+            existing = self._save(self.blob_name(digest, name), content)
+        return self._add_reference(existing, digest, size)
+
+    def adopt(self, name, digest, size):
+        """
+        Bring a file written outside ``save()`` (e.g. an S3 multipart
+        upload) under reference counting.
+
+        If the same content is already stored, the new copy is deleted and
+        the existing blob's name is returned instead. Adopting a name that
+        is already a blob (e.g. one written by ``save()``) changes nothing.
+
+        Returns:
+            str: The name the file should be referenced by
+        """
+        from file_manager.models import StoredBlob
+
+        existing = StoredBlob.objects.filter(
+            namespace=self.blob_namespace, sha256=digest
+        ).values_list('name', flat=True).first()
+        if existing == name:
+            return name
+        if existing is not None:
+            super().delete(name)
+            name = existing
+        return self._add_reference(name, digest, size)
+
+    def _add_reference(self, name, digest, size):
+        from file_manager.models import StoredBlob
+
+        with transaction.atomic():
+            blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                namespace=self.blob_namespace,
+                sha256=digest,
+                defaults={'name': name, 'size': size, 'ref_count': 1},
+            )
+            if not created:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return blob.name
+
+    def delete(self, name):
+        from file_manager.models import StoredBlob
+
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(
+                namespace=self.blob_namespace, name=name
+            ).first()
+            if blob is None:
+                super().delete(name)
+                return
+            if blob.ref_count > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            blob.delete()
+            # Remove the object once the row is gone for good, unless the same
+            # content was saved again in the meantime
+            transaction.on_commit(lambda: self._delete_unreferenced(name))
+
+    def _delete_unreferenced(self, name):
+        from file_manager.models import StoredBlob
+
+        if not StoredBlob.objects.filter(namespace=self.blob_namespace, name=name).exists():
+            super().delete(name)
+
+
+class DedupPublicMediaStorage(ContentAddressedStorageMixin, PublicMediaStorage):
+    blob_namespace = 'public'
+
+
+class DedupProtectedMediaStorage(ContentAddressedStorageMixin, ProtectedMediaStorage):
+    blob_namespace = 'protected'
+
+
+class DedupPrivateMediaStorage(ContentAddressedStorageMixin, PrivateMediaStorage):
+    blob_namespace = 'private'
+
+
+class DedupFileSystemStorage(ContentAddressedStorageMixin, FileSystemStorage):
+    """Local deduplicating storage for development (USE_S3=False)"""
+    blob_namespace = 'local'
@@ -0,0 +1,86 @@
+"""
+Shared helpers used across the project's apps.
+"""
+import random
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min, QuerySet
+from django.utils.functional import cached_property
+
+
+def random_instance(queryset, cache_key=None, timeout=300):
+    """
+    Pick a random row from a queryset without ``ORDER BY RANDOM()``.
+
+    Draws a random primary key between the queryset's min and max ids and
+    fetches the first row at or above it through the primary key index,
+    wrapping around to the start when the draw lands past the last match.
+    Rows that follow large gaps in the id sequence are slightly more likely
+    to be picked, which is fine for "random X" style features.
+
+    Args:
+        queryset: Filtered queryset to pick from
+        cache_key: Optional cache key for the (min, max) id bounds; when set
+            the bounds are only recomputed every ``timeout`` seconds
+        timeout: Lifetime of the cached bounds in seconds
+
+    Returns:
+        A model instance, or None if the queryset is empty
+    """
+    bounds = cache.get(cache_key) if cache_key else None
+    if bounds is None:
+        bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+        bounds = (bounds['low'], bounds['high'])
+        if cache_key and bounds[0] is not None:
+            cache.set(cache_key, bounds, timeout)
+
+    low, high = bounds
+    if low is None:
+        return None
+
+    pivot = random.randint(low, high)
+    queryset = queryset.order_by('pk')
+    return (
+        queryset.filter(pk__gte=pivot).first()
+        or queryset.filter(pk__lt=pivot).first()
+    )
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids ``SELECT COUNT(*)`` on large unfiltered tables.
+
+    On PostgreSQL an unfiltered queryset is counted from the planner's
+    ``pg_class.reltuples`` statistic, which is a catalogue lookup instead of a
+    full scan. Filtered querysets, small tables and other databases fall back
+    to an exact count. Intended for admin changelists of append-heavy tables
+    (use with ``show_full_result_count = False``).
+    """
+
+    # Below this many (estimated) rows an exact count is cheap enough
+    exact_count_threshold = 100000
+
+    @cached_property
+    def count(self):
+        estimate = self._estimated_count()
+        if estimate is not None and estimate >= self.exact_count_threshold:
+            return estimate
+        return super().count
+
+    def _estimated_count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or queryset.query.where:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 (or 0) until the table has been analysed
+        return int(row[0]) if row and row[0] > 0 else None
@@ -2,7 +2,7 @@
 Elasticsearch Admin Configuration
 """
 from django.contrib import admin
-from .models import IndexedDocument, SearchQuery, SearchSynonym
+from .models import IndexedDocument, SearchLatencyRollup, SearchQuery, SearchQueryRollup, SearchSynonym
 
 
 @admin.register(IndexedDocument)
@@ -26,6 +26,28 @@ class SearchQueryAdmin(admin.ModelAdmin):
         return False  # Search queries are auto-generated
 
 
+@admin.register(SearchQueryRollup)
+class SearchQueryRollupAdmin(admin.ModelAdmin):
+    list_display = ['query', 'period', 'bucket_start', 'count', 'zero_result_count']
+    list_filter = ['period', 'bucket_start']
+    search_fields = ['query']
+    ordering = ['-bucket_start', '-count']
+    
+    def has_add_permission(self, request):
+        return False  # Maintained by rollup_search_queries
+
+
+@admin.register(SearchLatencyRollup)
+class SearchLatencyRollupAdmin(admin.ModelAdmin):
+    list_display = ['bucket_start', 'period', 'count', 'zero_result_count', 'total_response_time_ms']
+    list_filter = ['period']
+    exclude = ['latency_digest']
+    ordering = ['-bucket_start']
+    
+    def has_add_permission(self, request):
+        return False  # Maintained by rollup_search_queries
+
+
 @admin.register(SearchSynonym)
 class SearchSynonymAdmin(admin.ModelAdmin):
     list_display = ['term', 'synonyms', 'is_active', 'updated_at']
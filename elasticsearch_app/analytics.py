@@ -0,0 +1,134 @@
+"""
+Elasticsearch Search Analytics Sink
+
+Search views record a SearchQuery event in an in-process buffer instead of
+writing it during the request. The buffer is written with one bulk_create
+after a response has been sent (request_finished, see signals.py) once it
+holds a batch or the flush interval has passed.
+
+Analytics never hold up a search: when the buffer is full new events are
+dropped, and when a write fails the batch is dropped and flushing backs
+off for a while. Both are counted in get_sink_stats().
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .models import SearchQuery
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 5000
+DEFAULT_FLUSH_BATCH = 100
+DEFAULT_FLUSH_INTERVAL = 5
+DEFAULT_FAILURE_BACKOFF = 30
+
+_lock = threading.Lock()
+_buffer = deque()
+_stats = Counter()
+_state = {'last_flush': time.monotonic(), 'backoff_until': 0.0}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record_search(request, query, index, results_count, response_time_ms, filters=None, user=None):
+    """
+    Buffer one search for the analytics tables.
+
+    Async views pass ``user`` from ``await request.auser()``, since
+    ``request.user`` would query the session from the event loop.
+    """
+    user = user if user is not None else request.user
+    event = SearchQuery(
+        query=query[:500],
+        user_id=user.pk if user.is_authenticated else None,
+        index=index,
+        filters=filters or {},
+        results_count=results_count,
+        response_time_ms=response_time_ms,
+        ip_address=request.META.get('REMOTE_ADDR'),
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
+    )
+    with _lock:
+        if len(_buffer) >= _setting('ELASTICSEARCH_ANALYTICS_BUFFER_SIZE', DEFAULT_BUFFER_SIZE):
+            _stats['dropped_full'] += 1
+            return False
+        _buffer.append(event)
+        _stats['recorded'] += 1
+    return True
+
+
+def flush_search_events(force=False):
+    """
+    Write buffered events with one bulk insert.
+
+    Unless ``force`` is set, waits for a full batch or the flush interval
+    and skips flushing while backing off after a failed write.
+
+    Returns:
+        int: Number of events written
+    """
+    now = time.monotonic()
+    with _lock:
+        if not _buffer:
+            return 0
+        if not force:
+            if now < _state['backoff_until']:
+                return 0
+            due = now - _state['last_flush'] >= _setting('ELASTICSEARCH_ANALYTICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+            if not due and len(_buffer) < _setting('ELASTICSEARCH_ANALYTICS_FLUSH_BATCH', DEFAULT_FLUSH_BATCH):
+                return 0
+        events = list(_buffer)
+        _buffer.clear()
+        _state['last_flush'] = now
+
+    try:
+        SearchQuery.objects.bulk_create(events, batch_size=500)
+    except DatabaseError:
+        with _lock:
+            _stats['dropped_failed'] += len(events)
+            _state['backoff_until'] = now + _setting('ELASTICSEARCH_ANALYTICS_FAILURE_BACKOFF', DEFAULT_FAILURE_BACKOFF)
+        logger.warning('Dropped %d search analytics events', len(events), exc_info=True)
+        return 0
+
+    with _lock:
+        _stats['flushed'] += len(events)
+    return len(events)
+
+
+def get_sink_stats():
+    """Counters for this process: recorded, flushed, dropped and buffered."""
+    with _lock:
+        return {
+            'recorded': _stats['recorded'],
+            'flushed': _stats['flushed'],
+            'dropped_full': _stats['dropped_full'],
+            'dropped_failed': _stats['dropped_failed'],
+            'buffered': len(_buffer),
+        }
+
+
+def reset_search_sink():
+    """Discard buffered events and counters."""
+    with _lock:
+        _buffer.clear()
+        _stats.clear()
+        _state['last_flush'] = time.monotonic()
+        _state['backoff_until'] = 0.0
+
+
+def _flush_at_exit():
+    try:
+        flush_search_events(force=True)
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
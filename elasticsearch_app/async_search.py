@@ -0,0 +1,220 @@
+"""
+Elasticsearch Async Search
+
+AsyncSearchService runs the searches of SearchService on AsyncElasticsearch
+so the async views (views.py) can wait on Elasticsearch without holding a
+worker thread under ASGI. Queries are built by the same SearchService
+methods; only sending them and reading the responses back is async.
+
+AsyncElasticsearch needs aiohttp. Without it get_async_elasticsearch_client()
+raises ImproperlyConfigured and the async views answer 503; the sync views
+are unaffected.
+"""
+import asyncio
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from elasticsearch import NotFoundError
+from elasticsearch_dsl.response import Response
+
+from notes_app.pagination import InvalidCursor
+from .cache import acached_search, normalize_query
+from .client import get_client_options, guarded_request, with_operation_timeout
+from .documents import SEARCH_ALIASES, SUGGEST_FIELDS
+from .search import (
+    PIT_KEEP_ALIVE,
+    SearchService,
+    _decode_federated_cursor,
+    _decode_search_after,
+    _federated_sources,
+    _page_offset,
+)
+from .suggestions import get_suggestion_trie, peek_suggestion_trie, trie_enabled
+
+try:
+    from elasticsearch import AsyncElasticsearch, AsyncTransport
+except ImportError:
+    # elasticsearch-py only exports the async client when aiohttp is installed
+    AsyncElasticsearch = AsyncTransport = None
+
+
+if AsyncTransport is not None:
+    class AsyncResilientTransport(AsyncTransport):
+        """
+        Async counterpart of client.ResilientTransport, sharing its breaker.
+        """
+        
+        async def perform_request(self, method, url, headers=None, params=None, body=None):
+            params = with_operation_timeout(method, url, params)
+            with guarded_request(params['request_timeout']):
+                return await super().perform_request(method, url, headers=headers, params=params, body=body)
+
+
+# aiohttp sessions belong to the loop that created them, so each event loop
+# gets its own client
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def async_search_available():
+    return AsyncElasticsearch is not None
+
+
+def get_async_elasticsearch_client():
+    """
+    AsyncElasticsearch client for the running event loop.
+
+    Raises:
+        ImproperlyConfigured: If aiohttp is not installed
+    """
+    if AsyncElasticsearch is None:
+        raise ImproperlyConfigured('Async search requires aiohttp (pip install aiohttp)')
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncElasticsearch(
+            transport_class=AsyncResilientTransport, **get_client_options()
+        )
+    return client
+
+
+async def close_async_elasticsearch_client():
+    """Close the running loop's client, e.g. on ASGI lifespan shutdown."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def reset_async_elasticsearch_clients():
+    _async_clients.clear()
+
+
+class AsyncSearchService(SearchService):
+    """
+    SearchService whose searches are coroutines.
+    
+    Only the methods defined here are async; the inherited ones that send
+    requests themselves (iter_logs, aggregate_by_field) stay on SearchService.
+    """
+    
+    def __init__(self, client=None, use_cache=True):
+        self.client = client or get_async_elasticsearch_client()
+        self.use_cache = use_cache
+    
+    async def _acached(self, endpoint, indices, params, compute):
+        if not self.use_cache:
+            return await compute()
+        return await acached_search(endpoint, indices, params, compute)
+    
+    async def _execute(self, s):
+        """Send a Search built by SearchService and wrap the result like Search.execute()."""
+        raw = await self.client.search(index=s._index, body=s.to_dict(), **s._params)
+        return Response(s, raw)
+    
+    # =========================================================================
+    # PAGINATION
+    # =========================================================================
+    
+    async def _paginate(self, endpoint, indices, build, sort, params, page, per_page, cursor, cache=True):
+        """Async SearchService._paginate."""
+        sort = [*sort, {'_id': 'asc'}]
+        if cursor:
+            return await self._cursor_page(indices, build, sort, per_page, cursor)
+        
+        offset = _page_offset(page, per_page)
+        
+        async def compute():
+            s = build(self._base_search(indices)).sort(*sort)
+            response = await self._execute(s[offset:offset + per_page])
+            return self._format_response(response, page, per_page)
+        
+        if not cache:
+            return await compute()
+        return await self._acached(endpoint, indices, {**params, 'page': page, 'per_page': per_page}, compute)
+    
+    async def _cursor_page(self, indices, build, sort, per_page, cursor):
+        pit_id, search_after = _decode_search_after(cursor, sort)
+        if pit_id is None:
+            pit_id = (await self.client.open_point_in_time(
+                index=','.join(indices), keep_alive=PIT_KEEP_ALIVE, ignore_unavailable=True
+            ))['id']
+        
+        try:
+            response = await self._execute(self._pit_search(build, sort, pit_id, search_after, per_page))
+        except NotFoundError as e:
+            raise InvalidCursor('Cursor has expired') from e
+        
+        pit_id = response.to_dict().get('pit_id', pit_id)
+        results = self._format_response(response, None, per_page, pit_id=pit_id)
+        if not results['next_cursor']:
+            await self.close_point_in_time(pit_id)
+        return results
+    
+    async def close_point_in_time(self, pit_id):
+        try:
+            await self.client.close_point_in_time(body={'id': pit_id})
+        except Exception:
+            pass
+    
+    # =========================================================================
+    # SEARCHES
+    # =========================================================================
+    
+    async def search_all(self, query_string, page=1, per_page=10, doc_type=None, cursor=None):
+        """Async SearchService.search_all."""
+        query_string = normalize_query(query_string)
+        sources = _federated_sources(doc_type)
+        
+        if cursor:
+            starts, max_scores = _decode_federated_cursor(cursor, sources, per_page)
+            responses = await self._msearch(query_string, doc_type, sources, starts, per_page)
+            return self._blend(responses, max_scores, starts, 0, None, per_page)
+        
+        offset = _page_offset(page, per_page)
+        
+        async def compute():
+            starts = [0] * len(sources)
+            responses = await self._msearch(query_string, doc_type, sources, starts, offset + per_page)
+            max_scores = [response.hits.max_score if response else None for response in responses]
+            return self._blend(responses, max_scores, starts, offset, page, per_page)
+        
+        return await self._acached(
+            'search_all', [index for index, _, _ in sources],
+            {'q': query_string, 'doc_type': doc_type, 'page': page, 'per_page': per_page}, compute,
+        )
+    
+    async def _msearch(self, query_string, doc_type, sources, starts, size):
+        ms = self._multi_search(query_string, doc_type, sources, starts, size)
+        raw = await self.client.msearch(body=ms.to_dict())
+        return [
+            None if result.get('error') else Response(s, result)
+            for s, result in zip(ms, raw['responses'])
+        ]
+    
+    async def search_notes(self, query_string, page=1, per_page=10, filters=None, cursor=None):
+        return await self._paginate(*self._notes_spec(query_string, filters), page, per_page, cursor)
+    
+    async def search_users(self, query_string, page=1, per_page=10, cursor=None):
+        return await self._paginate(*self._users_spec(query_string), page, per_page, cursor)
+    
+    async def search_logs(self, query_string, page=1, per_page=20, filters=None, cursor=None):
+        return await self._paginate(*self._logs_spec(query_string, filters), page, per_page, cursor, cache=False)
+    
+    async def suggest(self, query_string, field='title', index=None, size=5):
+        """Async SearchService.suggest; the trie is only built off the loop."""
+        if index is None:
+            if field == 'title' and trie_enabled():
+                trie = peek_suggestion_trie() or await sync_to_async(get_suggestion_trie)()
+                suggestions = trie.suggest(query_string, limit=size)
+                if suggestions:
+                    return suggestions
+            index = SUGGEST_FIELDS.get(field, SEARCH_ALIASES)
+        indices = [index] if isinstance(index, str) else list(index)
+        query_string = normalize_query(query_string)
+        
+        async def compute():
+            response = await self._execute(self._suggest_search(query_string, field, indices, size))
+            return self._suggestions(response)
+        
+        params = {'q': query_string, 'field': field, 'index': indices, 'size': size}
+        return await self._acached('suggest', indices, params, compute)
@@ -0,0 +1,157 @@
+"""
+Elasticsearch App Cache Helpers
+
+Search results are cached under a key built from the endpoint, the
+normalized query parameters and the generation token of every index the
+search reads. The indexer bumps an index's generation after each bulk
+flush, so every cached result for that index becomes unreachable in one
+cache write instead of having to be found and deleted.
+
+Hits and misses are counted per endpoint for the analytics page.
+"""
+import hashlib
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_SEARCH_CACHE_TIMEOUT = 60
+
+CACHED_ENDPOINTS = ('search_all', 'search_notes', 'search_users', 'suggest')
+
+
+def get_search_cache_timeout():
+    return getattr(settings, 'ELASTICSEARCH_SEARCH_CACHE_TIMEOUT', DEFAULT_SEARCH_CACHE_TIMEOUT)
+
+
+def _generation_key(index):
+    return f'elasticsearch_app:generation:{index}'
+
+
+def _counter_key(endpoint, outcome):
+    return f'elasticsearch_app:search_cache:{endpoint}:{outcome}'
+
+
+def get_generations(indices):
+    """
+    Current generation tokens of some indices in one cache round trip.
+
+    Missing tokens are created, so a result is never stored against a
+    token that could come back after an eviction.
+    """
+    keys = {_generation_key(index): index for index in indices}
+    found = cache.get_many(keys.keys())
+    generations = {}
+    for key, index in keys.items():
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key) or time.time_ns()
+        generations[index] = found[key]
+    return generations
+
+
+def bump_generation(*indices):
+    """Invalidate every cached search result that read these indices."""
+    token = time.time_ns()
+    cache.set_many({_generation_key(index): token for index in indices}, None)
+
+
+def normalize_query(query_string):
+    return ' '.join((query_string or '').split()).lower()
+
+
+def search_cache_key(endpoint, indices, params):
+    """
+    Key for one search: endpoint, index generations and normalized params.
+    """
+    generations = get_generations(indices)
+    payload = json.dumps(
+        {'params': params, 'generations': generations},
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha1(payload.encode()).hexdigest()
+    return f'elasticsearch_app:search:{endpoint}:{digest}'
+
+
+def _count(endpoint, outcome):
+    key = _counter_key(endpoint, outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(key, 1, None)
+
+
+def cached_search(endpoint, indices, params, compute):
+    """
+    Return a cached result for a search, or compute and cache it.
+
+    Args:
+        endpoint: Name used for the key and the hit/miss counters
+        indices: Indices the search reads; their generations join the key
+        params: Normalized search parameters
+        compute: Callable running the search on a miss
+    """
+    key = search_cache_key(endpoint, indices, params)
+    result = cache.get(key)
+    if result is not None:
+        _count(endpoint, 'hits')
+        return result
+    _count(endpoint, 'misses')
+    result = compute()
+    cache.set(key, result, get_search_cache_timeout())
+    return result
+
+
+async def acached_search(endpoint, indices, params, compute):
+    """
+    cached_search for async callers; ``compute`` is a coroutine function.
+
+    The key lookup and counter update are sync cache calls, made in one
+    trip to the thread pool.
+    """
+    def lookup():
+        key = search_cache_key(endpoint, indices, params)
+        result = cache.get(key)
+        _count(endpoint, 'hits' if result is not None else 'misses')
+        return key, result
+
+    key, result = await sync_to_async(lookup)()
+    if result is not None:
+        return result
+    result = await compute()
+    await cache.aset(key, result, get_search_cache_timeout())
+    return result
+
+
+def get_search_cache_stats():
+    """
+    Hit and miss counts per endpoint since the counters were last reset.
+
+    Returns:
+        list: One dict per endpoint with hits, misses and hit_rate (percent)
+    """
+    keys = [_counter_key(endpoint, outcome) for endpoint in CACHED_ENDPOINTS for outcome in ('hits', 'misses')]
+    counts = cache.get_many(keys)
+    stats = []
+    for endpoint in CACHED_ENDPOINTS:
+        hits = counts.get(_counter_key(endpoint, 'hits'), 0)
+        misses = counts.get(_counter_key(endpoint, 'misses'), 0)
+        total = hits + misses
+        stats.append({
+            'endpoint': endpoint,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits * 100 / total, 1) if total else None,
+        })
+    return stats
+
+
+def reset_search_cache_stats():
+    cache.delete_many([
+        _counter_key(endpoint, outcome) for endpoint in CACHED_ENDPOINTS for outcome in ('hits', 'misses')
+    ])
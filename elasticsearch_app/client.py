@@ -2,15 +2,241 @@
 Elasticsearch Client Configuration
 
 Provides singleton Elasticsearch client and utility functions.
+
+Every request goes through ResilientTransport, which gives it a timeout
+for its kind of operation (searches fail fast, bulk loads and force
+merges get minutes) and reports the outcome to a process-wide circuit
+breaker. After ELASTICSEARCH_BREAKER_FAILURES consecutive connection
+failures, timeouts or 5xx responses the breaker opens and requests fail
+immediately with CircuitOpenError; after ELASTICSEARCH_BREAKER_RESET
+seconds one trial request is let through (half-open) and its outcome
+closes or re-opens the breaker.
 """
 import os
-from elasticsearch import Elasticsearch
+import threading
+import time
+from contextlib import contextmanager
+
+from elasticsearch import ConnectionError, Elasticsearch, Transport, TransportError
 from django.conf import settings
 
 
 # Module-level client instance
 _es_client = None
 
+# Path segments identifying an operation's timeout class
+SEARCH_OPERATIONS = {'_search', '_msearch', '_count', '_mget', '_doc', '_source', '_pit', 'point_in_time'}
+INDEXING_OPERATIONS = {'_bulk', '_forcemerge', '_reindex', '_refresh', '_update_by_query', '_delete_by_query'}
+
+DEFAULTS = {
+    'ELASTICSEARCH_SEARCH_TIMEOUT': 5,
+    'ELASTICSEARCH_REQUEST_TIMEOUT': 10,
+    'ELASTICSEARCH_INDEXING_TIMEOUT': 120,
+    'ELASTICSEARCH_HEALTH_TIMEOUT': 2,
+    'ELASTICSEARCH_HEALTH_CACHE_SECONDS': 15,
+    'ELASTICSEARCH_POOL_MAXSIZE': 25,
+    'ELASTICSEARCH_MAX_RETRIES': 2,
+    'ELASTICSEARCH_BREAKER_FAILURES': 5,
+    'ELASTICSEARCH_BREAKER_RESET': 30,
+}
+
+# Added to a half-open trial's request timeout before another trial may start
+PROBE_GRACE_SECONDS = 5
+
+
+def _setting(name):
+    return getattr(settings, name, DEFAULTS[name])
+
+
+def get_operation_timeout(method, url):
+    """Request timeout in seconds for a request path."""
+    segments = set(url.split('?', 1)[0].strip('/').split('/'))
+    if segments & INDEXING_OPERATIONS:
+        return _setting('ELASTICSEARCH_INDEXING_TIMEOUT')
+    if segments & SEARCH_OPERATIONS:
+        return _setting('ELASTICSEARCH_SEARCH_TIMEOUT')
+    return _setting('ELASTICSEARCH_REQUEST_TIMEOUT')
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of sending a request while the circuit breaker is open"""
+    
+    def __str__(self):
+        return str(self.error)
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker shared by every request in the process.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = failure_threshold or _setting('ELASTICSEARCH_BREAKER_FAILURES')
+        self.reset_timeout = reset_timeout or _setting('ELASTICSEARCH_BREAKER_RESET')
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_deadline = 0.0
+    
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+    
+    def before_request(self, timeout=None):
+        """
+        Args:
+            timeout: Seconds the request may take; a trial still unanswered
+                after this no longer blocks the next one
+        
+        Raises:
+            CircuitOpenError: While open, or while a half-open trial is in flight
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            now = time.monotonic()
+            retry_in = self.reset_timeout - (now - self._opened_at)
+            if retry_in <= 0 and (not self._probing or now >= self._probe_deadline):
+                # Half-open: this request is the trial
+                self._state = self.HALF_OPEN
+                self._probing = True
+                self._probe_deadline = now + (timeout or self.reset_timeout) + PROBE_GRACE_SECONDS
+                return
+            raise CircuitOpenError(
+                'N/A', f'Elasticsearch circuit breaker is open; retrying in {max(retry_in, 0):.0f}s', None
+            )
+    
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+    
+    def release_probe(self):
+        """End a trial that neither succeeded nor failed, e.g. a cancelled request."""
+        with self._lock:
+            self._probing = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+    
+    def snapshot(self):
+        """State, consecutive failures and seconds until the next trial."""
+        state = self.state
+        with self._lock:
+            retry_in = max(self.reset_timeout - (time.monotonic() - self._opened_at), 0)
+            return {
+                'state': state,
+                'failures': self._failures,
+                'retry_in': round(retry_in) if state == self.OPEN else 0,
+            }
+
+
+_breaker = None
+
+
+def get_circuit_breaker():
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker()
+    return _breaker
+
+
+def is_outage(error):
+    """Connection problems and server-side errors count against the breaker; 4xx do not."""
+    if isinstance(error, ConnectionError):
+        return True
+    return isinstance(error.status_code, int) and (error.status_code == 429 or error.status_code >= 500)
+
+
+@contextmanager
+def guarded_request(timeout=None):
+    """
+    Report the outcome of the request made inside the block to the breaker.
+    
+    Errors that say nothing about the cluster (serialization errors,
+    task time limits, cancelled async requests) only end a half-open
+    trial, so the next request can try again.
+    
+    Raises:
+        CircuitOpenError: If the breaker is open
+    """
+    breaker = get_circuit_breaker()
+    breaker.before_request(timeout)
+    try:
+        yield
+    except TransportError as e:
+        if is_outage(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except BaseException:
+        breaker.release_probe()
+        raise
+    breaker.record_success()
+
+
+def with_operation_timeout(method, url, params):
+    params = dict(params or {})
+    # An explicit request_timeout from the caller wins
+    params.setdefault('request_timeout', get_operation_timeout(method, url))
+    return params
+
+
+class ResilientTransport(Transport):
+    """
+    Transport applying per-operation timeouts and the circuit breaker.
+    """
+    
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        params = with_operation_timeout(method, url, params)
+        with guarded_request(params['request_timeout']):
+            return super().perform_request(method, url, headers=headers, params=params, body=body)
+
+
+# =============================================================================
+# CLIENT
+# =============================================================================
+
+def get_client_options():
+    """Keyword arguments shared by the sync and async clients."""
+    es_host = getattr(settings, 'ELASTICSEARCH_HOST', None) or os.getenv('ELASTICSEARCH_HOST', 'https://elasticsearch.arpansahu.space')
+    es_user = getattr(settings, 'ELASTICSEARCH_USER', None) or os.getenv('ELASTICSEARCH_USER', 'elastic')
+    es_password = getattr(settings, 'ELASTICSEARCH_PASSWORD', None) or os.getenv('ELASTICSEARCH_PASSWORD', '')
+    
+    options = {
+        'hosts': [es_host],
+        'verify_certs': True,
+        'request_timeout': _setting('ELASTICSEARCH_REQUEST_TIMEOUT'),
+        # Connections kept per node; size to the worker's thread count
+        'maxsize': _setting('ELASTICSEARCH_POOL_MAXSIZE'),
+        'max_retries': _setting('ELASTICSEARCH_MAX_RETRIES'),
+        # Retrying a timed-out search only doubles the wait
+        'retry_on_timeout': False,
+    }
+    # http_auth (for elasticsearch-py 7.x)
+    if es_user and es_password:
+        options['http_auth'] = (es_user, es_password)
+    return options
+
 
 def get_elasticsearch_client():
     """
@@ -24,56 +250,53 @@ def get_elasticsearch_client():
     if _es_client is not None:
         return _es_client
     
-    es_host = getattr(settings, 'ELASTICSEARCH_HOST', None) or os.getenv('ELASTICSEARCH_HOST', 'https://elasticsearch.arpansahu.space')
-    es_user = getattr(settings, 'ELASTICSEARCH_USER', None) or os.getenv('ELASTICSEARCH_USER', 'elastic')
-    es_password = getattr(settings, 'ELASTICSEARCH_PASSWORD', None) or os.getenv('ELASTICSEARCH_PASSWORD', '')
-    
-    # Create client with http_auth (for elasticsearch-py 7.x)
-    if es_user and es_password:
-        _es_client = Elasticsearch(
-            hosts=[es_host],
-            http_auth=(es_user, es_password),
-            verify_certs=True,
-            request_timeout=30,
-        )
-    else:
-        # No auth
-        _es_client = Elasticsearch(
-            hosts=[es_host],
-            verify_certs=True,
-            request_timeout=30,
-        )
-    
+    _es_client = Elasticsearch(transport_class=ResilientTransport, **get_client_options())
     return _es_client
 
 
 def reset_elasticsearch_client():
-    """Reset the cached client (useful for testing or config changes)."""
-    global _es_client
+    """Reset the cached client, circuit breaker and connection status."""
+    global _es_client, _breaker
     _es_client = None
+    _breaker = None
+    _connection_status.update(result=None, checked_at=0.0)
+
+
+_connection_status = {'result': None, 'checked_at': 0.0}
 
 
-def check_elasticsearch_connection():
+def check_elasticsearch_connection(use_cache=True):
     """
     Check if Elasticsearch is reachable.
     
+    The answer is kept for ELASTICSEARCH_HEALTH_CACHE_SECONDS and the
+    check itself is limited to ELASTICSEARCH_HEALTH_TIMEOUT, so pages
+    showing the status do not wait on a slow cluster.
+    
     Returns:
         dict: Connection status with cluster info or error message
     """
+    cached = _connection_status['result']
+    age = time.monotonic() - _connection_status['checked_at']
+    if use_cache and cached is not None and age < _setting('ELASTICSEARCH_HEALTH_CACHE_SECONDS'):
+        return dict(cached)
+    
     try:
         client = get_elasticsearch_client()
-        info = client.info()
-        return {
+        info = client.info(request_timeout=_setting('ELASTICSEARCH_HEALTH_TIMEOUT'))
+        result = {
             'connected': True,
             'cluster_name': info['cluster_name'],
             'version': info['version']['number'],
             'tagline': info['tagline']
         }
     except Exception as e:
-        return {
+        result = {
             'connected': False,
             'error': str(e)
         }
+    _connection_status.update(result=result, checked_at=time.monotonic())
+    return dict(result)
 
 
 def get_cluster_health():
@@ -85,7 +308,7 @@ def get_cluster_health():
     """
     try:
         client = get_elasticsearch_client()
-        health = client.cluster.health()
+        health = client.cluster.health(request_timeout=_setting('ELASTICSEARCH_HEALTH_TIMEOUT'))
         return {
             'status': health['status'],
             'cluster_name': health['cluster_name'],
@@ -110,7 +333,7 @@ def get_index_stats():
     """
     try:
         client = get_elasticsearch_client()
-        indices = client.cat.indices(format='json')
+        indices = client.cat.indices(format='json', request_timeout=_setting('ELASTICSEARCH_HEALTH_TIMEOUT'))
         return indices
     except Exception as e:
         return []
@@ -0,0 +1,87 @@
+"""
+Elasticsearch App Latency Digest
+
+A log-bucketed histogram of response times in the style of HDR
+Histogram / DDSketch. Bucket ``i`` holds values in
+``(GAMMA ** (i - 1), GAMMA ** i]``, so every percentile read back is
+within RELATIVE_ACCURACY of the true value no matter how many samples
+were added.
+
+Digests are mergeable: two digests combine by adding their bucket
+counts, so hourly digests roll up into daily ones and any range of days
+can be summarized without the raw rows. They serialize to a small
+``{bucket: count}`` dict for a JSONField.
+"""
+import math
+
+RELATIVE_ACCURACY = 0.02
+
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+
+_LOG_GAMMA = math.log(GAMMA)
+
+
+def bucket_index(value):
+    """Bucket for a response time in ms; anything under 1ms counts as 1ms."""
+    return math.ceil(math.log(max(value, 1)) / _LOG_GAMMA - 1e-9)
+
+
+def bucket_value(index):
+    """Representative value of a bucket, within RELATIVE_ACCURACY of its bounds."""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+class LatencyDigest:
+    """
+    Mergeable response time histogram.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = {}
+        for index, count in (buckets or {}).items():
+            self.buckets[int(index)] = self.buckets.get(int(index), 0) + count
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data)
+
+    def to_dict(self):
+        # JSON object keys must be strings
+        return {str(index): count for index, count in sorted(self.buckets.items())}
+
+    @property
+    def count(self):
+        return sum(self.buckets.values())
+
+    def add(self, value, count=1):
+        index = bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        return self
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        return self
+
+    def quantile(self, q):
+        """
+        Estimated value at quantile ``q`` (0-1), or None for an empty digest.
+        """
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return bucket_value(index)
+        return bucket_value(max(self.buckets))
+
+    def percentiles(self, percents=(50, 95, 99)):
+        """Rounded values keyed ``p50``, ``p95``... ; None when empty."""
+        result = {}
+        for percent in percents:
+            value = self.quantile(percent / 100)
+            result[f'p{percent}'] = round(value) if value is not None else None
+        return result
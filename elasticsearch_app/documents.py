@@ -3,13 +3,40 @@ Elasticsearch Document Definitions
 
 Defines the document schema for indexing in Elasticsearch.
 """
-from elasticsearch_dsl import Document, Text, Keyword, Date, Integer, Boolean, Nested, InnerDoc
+from elasticsearch_dsl import (
+    Document, Text, Keyword, Date, Integer, Boolean, Nested, InnerDoc, Completion, analyzer, token_filter,
+)
 from django.conf import settings
 
 
 # Index name prefix for this project
 INDEX_PREFIX = getattr(settings, 'ELASTICSEARCH_INDEX_PREFIX', 'django_starter')
 
+# Synonyms file as Elasticsearch sees it, relative to its config directory
+# (see synonyms.py); unset leaves searches without synonyms
+SYNONYMS_PATH = getattr(settings, 'ELASTICSEARCH_SYNONYMS_PATH', '')
+
+
+def synonym_search_analyzer(path):
+    """
+    Search-time analyzer expanding the SearchSynonym rules in ``path``.
+    
+    The filter is updateable, so new rules are picked up by
+    reload_search_analyzers without closing or reindexing the index.
+    """
+    return analyzer(
+        'search_synonyms',
+        tokenizer='standard',
+        filter=[
+            'lowercase',
+            token_filter('search_synonym_graph', 'synonym_graph', synonyms_path=path, updateable=True, lenient=True),
+        ],
+    )
+
+
+# Synonyms apply only at search time; indexed terms stay as written
+CONTENT_SEARCH_ANALYZER = synonym_search_analyzer(SYNONYMS_PATH) if SYNONYMS_PATH else 'standard'
+
 
 class TagInnerDoc(InnerDoc):
     """Inner document for tags"""
@@ -20,9 +47,12 @@ class SearchableDocument(Document):
     """
     Base searchable document for general content indexing.
     """
-    title = Text(analyzer='standard', fields={'raw': Keyword()})
-    content = Text(analyzer='standard')
-    summary = Text(analyzer='standard')
+    title = Text(
+        analyzer='standard', search_analyzer=CONTENT_SEARCH_ANALYZER,
+        fields={'raw': Keyword(), 'suggest': Completion()},
+    )
+    content = Text(analyzer='standard', search_analyzer=CONTENT_SEARCH_ANALYZER)
+    summary = Text(analyzer='standard', search_analyzer=CONTENT_SEARCH_ANALYZER)
     doc_type = Keyword()
     author = Keyword()
     author_id = Integer()
@@ -50,8 +80,11 @@ class NoteDocument(Document):
     """
     Document mapping for Notes app.
     """
-    title = Text(analyzer='standard', fields={'raw': Keyword()})
-    content = Text(analyzer='standard')
+    title = Text(
+        analyzer='standard', search_analyzer=CONTENT_SEARCH_ANALYZER,
+        fields={'raw': Keyword(), 'suggest': Completion()},
+    )
+    content = Text(analyzer='standard', search_analyzer=CONTENT_SEARCH_ANALYZER)
     slug = Keyword()
     author = Keyword()
     author_id = Integer()
@@ -75,7 +108,7 @@ class UserDocument(Document):
     """
     Document mapping for User profiles.
     """
-    username = Text(analyzer='standard', fields={'raw': Keyword()})
+    username = Text(analyzer='standard', fields={'raw': Keyword(), 'suggest': Completion()})
     email = Keyword()
     first_name = Text(analyzer='standard')
     last_name = Text(analyzer='standard')
@@ -95,6 +128,9 @@ class UserDocument(Document):
 class LogDocument(Document):
     """
     Document mapping for application logs.
+    
+    Logs are written to one index per day (see log_handlers.py); the
+    mapping reaches them through an index template for the pattern.
     """
     level = Keyword()
     message = Text(analyzer='standard')
@@ -110,26 +146,58 @@ class LogDocument(Document):
     ip_address = Keyword()
     
     class Index:
-        name = f'{INDEX_PREFIX}_logs'
+        name = f'{INDEX_PREFIX}_logs-*'
         settings = {
             'number_of_shards': 1,
             'number_of_replicas': 0
         }
 
 
+# Daily log indices, {INDEX_PREFIX}_logs-YYYY.MM.DD
+LOG_INDEX_PATTERN = f'{INDEX_PREFIX}_logs-*'
+
+LOG_TEMPLATE_NAME = f'{INDEX_PREFIX}_logs'
+
+
+# Index names public searches go through; notes and users are aliases over
+# versioned indices (see versioning.py). Logs are staff-only and only
+# reached through search_logs and iter_logs.
+SEARCH_ALIASES = [
+    f'{INDEX_PREFIX}_documents',
+    f'{INDEX_PREFIX}_notes',
+    f'{INDEX_PREFIX}_users',
+]
+
+
+# Indices with a ``{field}.suggest`` completion subfield, by field
+SUGGEST_FIELDS = {
+    'title': [f'{INDEX_PREFIX}_documents', f'{INDEX_PREFIX}_notes'],
+    'username': [f'{INDEX_PREFIX}_users'],
+}
+
+
 def create_all_indices():
     """
     Create all defined indices in Elasticsearch.
     """
     from .client import get_elasticsearch_client
+    from .versioning import VERSIONED_DOCUMENTS, ensure_alias
+    
+    from .synonyms import write_synonyms_file
     
     client = get_elasticsearch_client()
     
+    # Indices using the synonym analyzer cannot be created without its file
+    write_synonyms_file()
+    
     # Initialize documents with client connection
     SearchableDocument.init(using=client)
-    NoteDocument.init(using=client)
-    UserDocument.init(using=client)
-    LogDocument.init(using=client)
+    # Daily log indices take their mapping from this template when created
+    LogDocument._index.as_template(LOG_TEMPLATE_NAME, order=0).save(using=client)
+    
+    # Versioned documents get {alias}_v1 behind their alias
+    for doc_type in VERSIONED_DOCUMENTS:
+        ensure_alias(doc_type, client=client)
     
     return True
 
@@ -144,9 +212,12 @@ def delete_all_indices():
     client = get_elasticsearch_client()
     indices = [
         f'{INDEX_PREFIX}_documents',
+        # Versions first; their aliases go with them
+        f'{INDEX_PREFIX}_notes_v*',
         f'{INDEX_PREFIX}_notes',
+        f'{INDEX_PREFIX}_users_v*',
         f'{INDEX_PREFIX}_users',
-        f'{INDEX_PREFIX}_logs',
+        LOG_INDEX_PATTERN,
     ]
     
     for index in indices:
@@ -154,5 +225,6 @@ def delete_all_indices():
             client.indices.delete(index=index, ignore=[404])
         except Exception as e:
             print(f"Error deleting {index}: {e}")
+    client.indices.delete_template(name=LOG_TEMPLATE_NAME, ignore=[404])
     
     return True
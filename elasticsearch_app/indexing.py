@@ -0,0 +1,406 @@
+"""
+Elasticsearch Bulk Indexing
+
+Streams model rows into Elasticsearch through the bulk API instead of one
+Celery task and one request per row. Rows are read with ``iterator()`` and
+their relations loaded per chunk, actions are sent in batches with
+``helpers.streaming_bulk`` (or ``parallel_bulk``), and the IndexedDocument
+tracking rows are upserted with one ``bulk_create`` per batch.
+"""
+import logging
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from elasticsearch import helpers
+
+from .cache import bump_generation
+from .client import get_elasticsearch_client
+from .documents import INDEX_PREFIX
+from .models import IndexedDocument
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+TRACKING_UPDATE_FIELDS = ['es_id', 'es_index', 'status', 'indexed_at', 'error_message', 'updated_at']
+
+
+def index_name(doc_type):
+    return f'{INDEX_PREFIX}_{doc_type}s'
+
+
+def document_id(doc_type, source_id):
+    return f'{doc_type}_{source_id}'
+
+
+# =============================================================================
+# SERIALIZERS
+# =============================================================================
+
+def serialize_user(user):
+    first_name = getattr(user, 'first_name', '')
+    last_name = getattr(user, 'last_name', '')
+    return {
+        'username': user.username,
+        'email': user.email,
+        'first_name': first_name,
+        'last_name': last_name,
+        'full_name': f'{first_name} {last_name}'.strip(),
+        'is_active': user.is_active,
+        'date_joined': user.date_joined.isoformat() if user.date_joined else None,
+        'last_login': user.last_login.isoformat() if user.last_login else None,
+    }
+
+
+def serialize_note(note):
+    """Note document; expects author and category selected and tags prefetched."""
+    return {
+        'title': note.title,
+        'content': note.content,
+        'slug': note.slug,
+        'author': note.author.username if note.author else None,
+        'author_id': note.author_id,
+        'category': note.category.name if note.category else None,
+        'category_id': note.category_id,
+        'tags': [tag.name for tag in note.tags.all()],
+        'status': note.status,
+        'is_pinned': note.is_pinned,
+        'created_at': note.created_at.isoformat() if note.created_at else None,
+        'updated_at': note.updated_at.isoformat() if note.updated_at else None,
+    }
+
+
+def user_queryset():
+    return get_user_model().objects.order_by('pk')
+
+
+def note_queryset():
+    from notes_app.models import Note
+    return Note.objects.select_related('author', 'category').prefetch_related('tags').order_by('pk')
+
+
+# Document types the bulk reindexer knows how to build
+INDEXABLE_TYPES = {
+    'user': (user_queryset, serialize_user),
+    'note': (note_queryset, serialize_note),
+}
+
+
+# =============================================================================
+# BULK INDEXING
+# =============================================================================
+
+def _index_action(doc_type, obj, serializer, index):
+    return {
+        '_op_type': 'index',
+        '_index': index,
+        '_id': document_id(doc_type, obj.pk),
+        '_source': serializer(obj),
+    }
+
+
+def _actions(doc_type, queryset, serializer, chunk_size, index):
+    # iterator() with a chunk size still runs prefetch_related per chunk
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield _index_action(doc_type, obj, serializer, index)
+
+
+def _record_results(doc_type, results):
+    """Upsert IndexedDocument rows for one batch of bulk responses."""
+    now = timezone.now()
+    records = []
+    for ok, item in results:
+        op_type, result = next(iter(item.items()))
+        if op_type == 'delete':
+            # Deleting a document that was never indexed still leaves it deleted
+            ok = ok or result.get('status') == 404
+            status = 'deleted' if ok else 'failed'
+        else:
+            status = 'indexed' if ok else 'failed'
+        source_id = str(result['_id']).split('_', 1)[-1]
+        error = None if ok else str(result.get('error') or result.get('exception') or result)
+        records.append(IndexedDocument(
+            doc_type=doc_type,
+            source_id=source_id,
+            es_id=result['_id'] if ok else None,
+            # Track the alias, not whichever version the document landed in
+            es_index=index_name(doc_type),
+            status=status,
+            indexed_at=now if status == 'indexed' else None,
+            error_message=error,
+        ))
+    IndexedDocument.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=['doc_type', 'source_id'],
+        update_fields=TRACKING_UPDATE_FIELDS,
+    )
+    return [record.status for record in records]
+
+
+def _send(doc_type, actions, client, chunk_size, parallel=False, thread_count=4, live=True):
+    """
+    Send actions through the bulk helpers, recording results per batch.
+
+    Writes to the live alias wait for a refresh, so cached searches are
+    invalidated only once searches can see the change. Loads into a new
+    index version (``live=False``) do neither; the alias swap bumps them.
+    """
+    options = {
+        'chunk_size': chunk_size,
+        'raise_on_error': False,
+        'raise_on_exception': False,
+    }
+    if live:
+        options['refresh'] = 'wait_for'
+    if parallel:
+        results = helpers.parallel_bulk(client, actions, thread_count=thread_count, **options)
+    else:
+        results = helpers.streaming_bulk(client, actions, **options)
+
+    counts = Counter()
+    batch = []
+    for result in results:
+        batch.append(result)
+        if len(batch) >= chunk_size:
+            counts.update(_record_results(doc_type, batch))
+            # Cached searches over this type are stale after every flush
+            if live:
+                bump_generation(index_name(doc_type))
+            batch = []
+    if batch:
+        counts.update(_record_results(doc_type, batch))
+        if live:
+            bump_generation(index_name(doc_type))
+    return counts
+
+
+def bulk_index(doc_type, queryset=None, client=None, chunk_size=DEFAULT_CHUNK_SIZE, parallel=False,
+               thread_count=4, index=None):
+    """
+    Index every row of a queryset with the bulk API.
+
+    Args:
+        doc_type: Key of INDEXABLE_TYPES
+        queryset: Rows to index (defaults to every row of the type)
+        client: Elasticsearch client (defaults to the shared client)
+        chunk_size: Documents per bulk request and per tracking upsert
+        parallel: Send chunks from a thread pool with ``parallel_bulk``
+        thread_count: Threads used when ``parallel`` is set
+        index: Target index (defaults to the type's alias)
+
+    Returns:
+        dict: indexed and failed counts
+    """
+    default_queryset, serializer = INDEXABLE_TYPES[doc_type]
+    if queryset is None:
+        queryset = default_queryset()
+    client = client or get_elasticsearch_client()
+    actions = _actions(doc_type, queryset, serializer, chunk_size, index or index_name(doc_type))
+    counts = _send(
+        doc_type, actions, client, chunk_size, parallel=parallel, thread_count=thread_count, live=index is None,
+    )
+    return {'indexed': counts['indexed'], 'failed': counts['failed']}
+
+
+def sync_documents(doc_type, source_ids, client=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bring the documents for some rows in line with the database.
+
+    Rows that exist are indexed as they are now; ids with no row left
+    are deleted from the index. Both go out in the same bulk requests.
+
+    Returns:
+        dict: indexed, deleted and failed counts
+    """
+    default_queryset, serializer = INDEXABLE_TYPES[doc_type]
+    client = client or get_elasticsearch_client()
+    index = index_name(doc_type)
+    source_ids = {int(source_id) for source_id in source_ids}
+
+    def actions():
+        found = set()
+        queryset = default_queryset().filter(pk__in=source_ids)
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            found.add(obj.pk)
+            yield _index_action(doc_type, obj, serializer, index)
+        for source_id in sorted(source_ids - found):
+            yield {'_op_type': 'delete', '_index': index, '_id': document_id(doc_type, source_id)}
+
+    counts = _send(doc_type, actions(), client, chunk_size)
+    return {'indexed': counts['indexed'], 'deleted': counts['deleted'], 'failed': counts['failed']}
+
+
+def delete_documents(doc_type, source_ids, client=None, chunk_size=DEFAULT_CHUNK_SIZE, index=None):
+    """
+    Delete the documents for some rows, whether or not they exist.
+
+    Args:
+        index: Target index (defaults to the type's alias)
+
+    Returns:
+        dict: deleted and failed counts
+    """
+    client = client or get_elasticsearch_client()
+    target = index or index_name(doc_type)
+    actions = (
+        {'_op_type': 'delete', '_index': target, '_id': document_id(doc_type, source_id)}
+        for source_id in source_ids
+    )
+    counts = _send(doc_type, actions, client, chunk_size, live=index is None)
+    return {'deleted': counts['deleted'], 'failed': counts['failed']}
+
+
+def reindex_all(doc_types=None, client=None, chunk_size=DEFAULT_CHUNK_SIZE, parallel=False):
+    """
+    Bulk reindex every indexable type.
+
+    Returns:
+        dict: Totals, per-type counts, elapsed seconds and docs per second
+    """
+    doc_types = doc_types or list(INDEXABLE_TYPES)
+    client = client or get_elasticsearch_client()
+
+    started = time.monotonic()
+    by_type = {}
+    for doc_type in doc_types:
+        by_type[doc_type] = bulk_index(doc_type, client=client, chunk_size=chunk_size, parallel=parallel)
+    elapsed = time.monotonic() - started
+
+    indexed = sum(counts['indexed'] for counts in by_type.values())
+    failed = sum(counts['failed'] for counts in by_type.values())
+    return {
+        'indexed_count': indexed,
+        'error_count': failed,
+        'by_type': by_type,
+        'seconds': round(elapsed, 3),
+        'docs_per_second': round((indexed + failed) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+# =============================================================================
+# RECONCILIATION
+# =============================================================================
+
+DEFAULT_RECONCILE_CHUNK_SIZE = 1000
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _missing_from_index(client, docs):
+    """
+    Check one chunk of tracking rows with a single mget.
+
+    Returns:
+        tuple: (rows whose document is gone, number of rows that errored)
+    """
+    response = client.mget(body={'docs': [
+        {'_index': doc.es_index, '_id': doc.es_id or document_id(doc.doc_type, doc.source_id)}
+        for doc in docs
+    ]}, _source=False)
+    missing, errors = [], 0
+    for doc, result in zip(docs, response['docs']):
+        error = result.get('error')
+        if error:
+            # A missing index means the document is missing too
+            if isinstance(error, dict) and error.get('type') == 'index_not_found_exception':
+                missing.append(doc)
+            else:
+                errors += 1
+        elif not result.get('found'):
+            missing.append(doc)
+    return missing, errors
+
+
+def _requeue(docs_by_type):
+    """Queue one process_index_batch task for a chunk of missing documents."""
+    from .tasks import process_index_batch
+    try:
+        process_index_batch.delay({
+            doc_type: [doc.source_id for doc in docs]
+            for doc_type, docs in docs_by_type.items()
+        })
+    except Exception:
+        logger.warning('Could not queue missing documents for reindexing', exc_info=True)
+        return False
+    return True
+
+
+def reconcile_index_status(client=None, chunk_size=DEFAULT_RECONCILE_CHUNK_SIZE, reindex_missing=False):
+    """
+    Check every 'indexed' tracking row against Elasticsearch.
+
+    Rows are walked with ``iterator()`` and checked with one ``mget`` per
+    chunk. Rows whose document is gone are marked 'deleted' with one
+    UPDATE per chunk, or, with ``reindex_missing``, marked 'pending' and
+    queued for process_index_batch, which re-reads the rows and indexes or
+    deletes them through the bulk API.
+
+    Returns:
+        dict: Drift report with checked, found, missing, errors,
+        missing_by_type, requeued and elapsed seconds
+    """
+    client = client or get_elasticsearch_client()
+    started = time.monotonic()
+    report = Counter()
+    missing_by_type = Counter()
+
+    rows = (
+        IndexedDocument.objects
+        .filter(status='indexed')
+        .only('pk', 'doc_type', 'source_id', 'es_id', 'es_index')
+        .order_by('pk')
+        .iterator(chunk_size=chunk_size)
+    )
+    for docs in _chunks(rows, chunk_size):
+        missing, errors = _missing_from_index(client, docs)
+        report['checked'] += len(docs)
+        report['errors'] += errors
+        report['missing'] += len(missing)
+        report['found'] += len(docs) - len(missing) - errors
+        if not missing:
+            continue
+
+        requeue = {}
+        deleted = []
+        for doc in missing:
+            missing_by_type[doc.doc_type] += 1
+            if reindex_missing and doc.doc_type in INDEXABLE_TYPES:
+                requeue.setdefault(doc.doc_type, []).append(doc)
+            else:
+                deleted.append(doc.pk)
+
+        now = timezone.now()
+        if deleted:
+            IndexedDocument.objects.filter(pk__in=deleted).update(status='deleted', updated_at=now)
+        if requeue:
+            requeued = [doc.pk for docs_of_type in requeue.values() for doc in docs_of_type]
+            if _requeue(requeue):
+                IndexedDocument.objects.filter(pk__in=requeued).update(status='pending', updated_at=now)
+                report['requeued'] += len(requeued)
+            else:
+                # Left as 'indexed' so the next run finds them again
+                report['requeue_failed'] += len(requeued)
+
+    elapsed = time.monotonic() - started
+    return {
+        'checked': report['checked'],
+        'found': report['found'],
+        'missing': report['missing'],
+        'errors': report['errors'],
+        'requeued': report['requeued'],
+        'requeue_failed': report['requeue_failed'],
+        'missing_by_type': dict(missing_by_type),
+        'seconds': round(elapsed, 3),
+    }
@@ -0,0 +1,268 @@
+"""
+Elasticsearch App Log Shipping
+
+ElasticsearchLogHandler turns log records into LogDocument entries and
+puts them on a bounded in-process queue; it never waits on the network.
+A background thread takes them off in batches and writes each batch with
+one bulk request to the day's index, ``{INDEX_PREFIX}_logs-YYYY.MM.DD``
+(UTC), which the index template from create_all_indices() maps.
+
+When the queue is full new records are dropped, and when a bulk request
+fails its batch is dropped; both are counted in the handler's stats().
+Records from the Elasticsearch client and from the shipping thread itself
+are never shipped, so a failing cluster cannot feed the queue.
+
+RequestLogContextMiddleware attaches the path, method, user and IP of the
+current request to records logged while it is handled.
+delete_expired_log_indices() drops indices older than
+ELASTICSEARCH_LOG_RETENTION_DAYS.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 2
+DEFAULT_RETENTION_DAYS = 14
+
+LOG_INDEX_DATE_FORMAT = '%Y.%m.%d'
+
+# Loggers (and their children) used while shipping; their records would ship themselves
+IGNORED_LOGGERS = ('elasticsearch', 'urllib3', 'elastic_transport')
+
+_request_context = ContextVar('elasticsearch_app_log_request', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def log_shipping_enabled():
+    return _setting('ELASTICSEARCH_LOG_SHIPPING', False)
+
+
+def log_index_prefix():
+    from .documents import INDEX_PREFIX
+    return f'{INDEX_PREFIX}_logs-'
+
+
+def log_index_name(created):
+    """Daily index for a record created at ``created`` (epoch seconds)."""
+    return log_index_prefix() + time.strftime(LOG_INDEX_DATE_FORMAT, time.gmtime(created))
+
+
+# =============================================================================
+# REQUEST CONTEXT
+# =============================================================================
+
+class RequestLogContextMiddleware:
+    """
+    Make the current request available to ElasticsearchLogHandler.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        token = _request_context.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request_context.reset(token)
+
+
+def request_fields(request):
+    """Request fields of a LogDocument; empty outside a request."""
+    if request is None:
+        return {}
+    fields = {
+        'request_path': request.path,
+        'request_method': request.method,
+        'ip_address': request.META.get('REMOTE_ADDR'),
+    }
+    # Only a user the request has already loaded; resolving it here would
+    # query the session from inside a log call
+    user = getattr(request, '_cached_user', None)
+    if user is not None and user.is_authenticated:
+        fields['user_id'] = user.pk
+    return fields
+
+
+# =============================================================================
+# HANDLER
+# =============================================================================
+
+class ElasticsearchLogHandler(logging.Handler):
+    """
+    Non-blocking handler bulk-shipping records to the daily log index.
+    """
+    
+    def __init__(self, level=logging.NOTSET, queue_size=None, batch_size=None, flush_interval=None):
+        super().__init__(level)
+        self.queue = queue.Queue(maxsize=queue_size or _setting('ELASTICSEARCH_LOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE))
+        self.batch_size = batch_size or _setting('ELASTICSEARCH_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.flush_interval = flush_interval or _setting('ELASTICSEARCH_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+    
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+    
+    def stats(self):
+        """Counters for this process: queued, shipped, dropped and waiting."""
+        with self._stats_lock:
+            return {
+                'queued': self._stats['queued'],
+                'shipped': self._stats['shipped'],
+                'dropped_full': self._stats['dropped_full'],
+                'dropped_failed': self._stats['dropped_failed'],
+                'waiting': self.queue.qsize(),
+            }
+    
+    def _ensure_worker(self):
+        # Started on first use, and again in a forked worker process
+        if self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self.lock:
+            if self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._stop.clear()
+                self._worker = threading.Thread(target=self._run, name='elasticsearch-log-shipper', daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+    
+    def emit(self, record):
+        if record.name.split('.')[0] in IGNORED_LOGGERS or (self._worker and record.thread == self._worker.ident):
+            return
+        if not log_shipping_enabled():
+            return
+        try:
+            action = self.to_action(record)
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self.queue.put_nowait(action)
+        except queue.Full:
+            self._count('dropped_full')
+            return
+        self._count('queued')
+        self._ensure_worker()
+    
+    def to_action(self, record):
+        """Bulk index action for a record, built on the logging thread."""
+        exception = ''
+        if record.exc_info:
+            exception = ''.join(traceback.format_exception(*record.exc_info))
+        source = {
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'logger_name': record.name,
+            'module': record.module,
+            'function_name': record.funcName,
+            'line_number': record.lineno,
+            'exception': exception,
+            'timestamp': datetime.fromtimestamp(record.created, dt_timezone.utc).isoformat(),
+            **request_fields(_request_context.get()),
+        }
+        return {'_index': log_index_name(record.created), '_source': source}
+    
+    def _take_batch(self):
+        """Actions queued within flush_interval, up to batch_size."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._take_batch()
+            if batch:
+                self.ship(batch)
+    
+    def ship(self, batch):
+        """Write one batch with a bulk request; failures drop the batch."""
+        from elasticsearch.helpers import bulk
+        from .client import get_elasticsearch_client
+        
+        try:
+            shipped, errors = bulk(get_elasticsearch_client(), batch, raise_on_error=False, stats_only=True)
+        except Exception:
+            self._count('dropped_failed', len(batch))
+            return 0
+        self._count('shipped', shipped)
+        if errors:
+            self._count('dropped_failed', errors)
+        return shipped
+    
+    def flush(self, timeout=None):
+        """Ship everything queued so far from the calling thread."""
+        deadline = time.monotonic() + (timeout if timeout is not None else self.flush_interval * 5)
+        while not self.queue.empty() and time.monotonic() < deadline:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self.ship(batch)
+    
+    def close(self):
+        # Runs at interpreter exit via logging.shutdown()
+        self._stop.set()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._worker.join(timeout=self.flush_interval * 2)
+        super().close()
+
+
+# =============================================================================
+# RETENTION
+# =============================================================================
+
+def delete_expired_log_indices(days=None, client=None, today=None):
+    """
+    Delete daily log indices older than ``days`` (UTC dates).
+
+    Returns:
+        list: Names of the deleted indices
+    """
+    if client is None:
+        from .client import get_elasticsearch_client
+        client = get_elasticsearch_client()
+    days = _setting('ELASTICSEARCH_LOG_RETENTION_DAYS', DEFAULT_RETENTION_DAYS) if days is None else days
+    today = today or datetime.now(dt_timezone.utc).date()
+    cutoff = today - timedelta(days=days)
+    prefix = log_index_prefix()
+
+    expired = []
+    for index in client.indices.get(index=f'{prefix}*', ignore_unavailable=True, allow_no_indices=True):
+        try:
+            day = datetime.strptime(index[len(prefix):], LOG_INDEX_DATE_FORMAT).date()
+        except ValueError:
+            continue
+        if day < cutoff:
+            expired.append(index)
+
+    for index in expired:
+        client.indices.delete(index=index, ignore=[404])
+    return sorted(expired)
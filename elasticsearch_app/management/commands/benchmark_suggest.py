@@ -0,0 +1,97 @@
+"""
+Management Command: benchmark_suggest
+
+Measures the latency of the autocomplete endpoint
+(/elasticsearch/api/suggest/) through the full middleware stack, with the
+in-process suggestion trie or, with --no-trie, through the result cache and
+the Elasticsearch completion suggester only.
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from elasticsearch_app.suggestions import get_suggestion_trie, popular_queries, reset_suggestion_trie
+
+DEFAULT_PREFIXES = ['dj', 'not', 'pyt', 'sea']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark /elasticsearch/api/suggest/ latency'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Number of timed requests',
+        )
+        parser.add_argument(
+            '--prefix',
+            action='append',
+            dest='prefixes',
+            help='Prefix to request (repeatable); defaults to prefixes of popular queries',
+        )
+        parser.add_argument(
+            '--no-trie',
+            action='store_true',
+            help='Bypass the suggestion trie and always ask Elasticsearch',
+        )
+        parser.add_argument(
+            '--host',
+            default=None,
+            help='Host header for the requests (defaults to the first ALLOWED_HOSTS entry)',
+        )
+    
+    def _prefixes(self):
+        prefixes = []
+        for query, _ in popular_queries(limit=25):
+            for length in (2, 3, 4):
+                if len(query) > length and query[:length] not in prefixes:
+                    prefixes.append(query[:length])
+        return prefixes or DEFAULT_PREFIXES
+    
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        prefixes = options['prefixes'] or self._prefixes()
+        host = options['host'] or next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost'
+        )
+        url = reverse('elasticsearch_app:api_suggest')
+        client = Client(HTTP_HOST=host)
+        use_trie = not options['no_trie']
+        
+        with override_settings(ELASTICSEARCH_SUGGEST_TRIE=use_trie):
+            reset_suggestion_trie()
+            # Warm up: builds the trie and the result cache entries
+            for prefix in prefixes:
+                client.get(url, {'q': prefix})
+            
+            timings = []
+            errors = 0
+            for i in range(options['requests']):
+                prefix = prefixes[i % len(prefixes)]
+                started = time.perf_counter()
+                response = client.get(url, {'q': prefix})
+                timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200 or 'error' in response.json():
+                    errors += 1
+        
+        answered = sum(1 for prefix in prefixes if get_suggestion_trie().suggest(prefix)) if use_trie else 0
+        quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+        
+        self.stdout.write(f"   Endpoint: {url} ({len(prefixes)} prefixes, {'trie' if use_trie else 'Elasticsearch only'})")
+        if use_trie:
+            self.stdout.write(f'   Trie: {get_suggestion_trie().size} queries, answers {answered}/{len(prefixes)} prefixes')
+        self.stdout.write(
+            f'   mean {statistics.mean(timings):.3f}ms  p50 {quantiles[49]:.3f}ms  '
+            f'p95 {quantiles[94]:.3f}ms  p99 {quantiles[98]:.3f}ms  max {max(timings):.3f}ms'
+        )
+        style = self.style.SUCCESS if not errors else self.style.WARNING
+        self.stdout.write(style(
+            f"{'✅' if not errors else '⚠️'} {len(timings)} requests, {errors} errors"
+        ))
@@ -0,0 +1,188 @@
+"""
+Management Command: loadtest_search
+
+Compares concurrent search throughput of SearchService on a thread pool
+(the sync views) with AsyncSearchService on one event loop (the async
+views). Both talk to a local stub Elasticsearch that answers every search
+after --delay-ms, so the numbers show how each path waits on the cluster
+rather than how fast the cluster is.
+
+The async path needs aiohttp; without it only the sync path runs.
+"""
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from elasticsearch_app.async_search import (
+    AsyncSearchService,
+    async_search_available,
+    close_async_elasticsearch_client,
+    reset_async_elasticsearch_clients,
+)
+from elasticsearch_app.client import reset_elasticsearch_client
+from elasticsearch_app.search import SearchService
+
+PATHS = ('sync', 'async')
+
+
+def _search_response(delay):
+    time.sleep(delay)
+    return {
+        'took': int(delay * 1000),
+        'timed_out': False,
+        '_shards': {'total': 1, 'successful': 1, 'skipped': 0, 'failed': 0},
+        'hits': {
+            'total': {'value': 1, 'relation': 'eq'},
+            'max_score': 1.0,
+            'hits': [{'_index': 'stub', '_id': '1', '_score': 1.0, 'sort': [1.0, '1'], '_source': {'title': 'stub'}}],
+        },
+    }
+
+
+class StubElasticsearch(ThreadingHTTPServer):
+    """
+    Minimal Elasticsearch 7.17 answering searches after a fixed delay.
+    """
+    daemon_threads = True
+    
+    def __init__(self, delay):
+        self.delay = delay
+        super().__init__(('127.0.0.1', 0), StubHandler)
+    
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def _answer(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        path = self.path.split('?')[0]
+        if path.endswith('/_msearch'):
+            body = {'responses': [_search_response(self.server.delay)]}
+        elif path.endswith('/_search'):
+            body = _search_response(self.server.delay)
+        elif path == '/':
+            body = {'version': {'number': '7.17.0', 'build_flavor': 'default'}, 'tagline': 'You Know, for Search'}
+        else:
+            body = {}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    do_GET = do_POST = _answer
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent search throughput of the sync and async search paths'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Searches per path',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Searches in flight at once',
+        )
+        parser.add_argument(
+            '--delay-ms',
+            type=int,
+            default=50,
+            help='Time the stub takes to answer each search',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            choices=PATHS,
+            help='Path to run (repeatable); defaults to both',
+        )
+    
+    def _run_sync(self, requests, concurrency):
+        service = SearchService(use_cache=False)
+        
+        def search(i):
+            started = time.perf_counter()
+            service.search_notes(f'query {i}')
+            return (time.perf_counter() - started) * 1000
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(search, range(requests)))
+    
+    def _run_async(self, requests, concurrency):
+        async def run():
+            service = AsyncSearchService(use_cache=False)
+            slots = asyncio.Semaphore(concurrency)
+            
+            async def search(i):
+                async with slots:
+                    started = time.perf_counter()
+                    await service.search_notes(f'query {i}')
+                    return (time.perf_counter() - started) * 1000
+            
+            try:
+                return await asyncio.gather(*(search(i) for i in range(requests)))
+            finally:
+                await close_async_elasticsearch_client()
+        
+        return asyncio.run(run())
+    
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1')
+        paths = options['paths'] or list(PATHS)
+        if 'async' in paths and not async_search_available():
+            self.stdout.write(self.style.WARNING('⚠️  aiohttp is not installed; skipping the async path'))
+            paths = [path for path in paths if path != 'async']
+        if not paths:
+            raise CommandError('No path to run')
+        
+        stub = StubElasticsearch(options['delay_ms'] / 1000)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        self.stdout.write(
+            f"   Stub Elasticsearch at {stub.url}, {options['delay_ms']}ms per search; "
+            f"{options['requests']} searches per path, {options['concurrency']} in flight"
+        )
+        
+        runners = {'sync': self._run_sync, 'async': self._run_async}
+        try:
+            with override_settings(ELASTICSEARCH_HOST=stub.url, ELASTICSEARCH_USER='', ELASTICSEARCH_PASSWORD=''):
+                for path in paths:
+                    reset_elasticsearch_client()
+                    reset_async_elasticsearch_clients()
+                    started = time.perf_counter()
+                    timings = runners[path](options['requests'], options['concurrency'])
+                    elapsed = time.perf_counter() - started
+                    quantiles = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+                    self.stdout.write(self.style.SUCCESS(
+                        f'✅ {path:5}  {len(timings) / elapsed:8.1f} searches/s  '
+                        f'p50 {quantiles[49]:.1f}ms  p95 {quantiles[94]:.1f}ms  ({elapsed:.2f}s)'
+                    ))
+        finally:
+            stub.shutdown()
+            stub.server_close()
+            reset_elasticsearch_client()
+            reset_async_elasticsearch_clients()
@@ -5,6 +5,7 @@ Models for tracking indexed documents and search analytics.
 """
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class IndexedDocument(models.Model):
@@ -71,7 +72,8 @@ class SearchQuery(models.Model):
     response_time_ms = models.IntegerField(default=0, help_text="Response time in milliseconds")
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     user_agent = models.CharField(max_length=500, blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the search ran, not when the buffered event was written
+    created_at = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     
     class Meta:
         verbose_name = 'Search Query'
@@ -82,6 +84,70 @@ class SearchQuery(models.Model):
         return f'"{self.query}" ({self.results_count} results)'
 
 
+ROLLUP_PERIODS = [
+    ('hour', 'Hour'),
+    ('day', 'Day'),
+]
+
+
+class SearchQueryRollup(models.Model):
+    """
+    Search counts per normalized query for one hour or one day.
+    """
+    period = models.CharField(max_length=10, choices=ROLLUP_PERIODS)
+    bucket_start = models.DateTimeField()
+    query = models.CharField(max_length=500)
+    count = models.PositiveIntegerField(default=0)
+    zero_result_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Search Query Rollup'
+        verbose_name_plural = 'Search Query Rollups'
+        unique_together = ['period', 'bucket_start', 'query']
+        indexes = [
+            models.Index(fields=['period', 'bucket_start']),
+        ]
+        ordering = ['-bucket_start', '-count']
+    
+    def __str__(self):
+        return f'"{self.query}" x{self.count} ({self.period} of {self.bucket_start:%Y-%m-%d %H:%M})'
+
+
+class SearchLatencyRollup(models.Model):
+    """
+    Search volume and a mergeable response time digest for one hour or one day.
+    """
+    period = models.CharField(max_length=10, choices=ROLLUP_PERIODS)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    zero_result_count = models.PositiveIntegerField(default=0)
+    total_response_time_ms = models.BigIntegerField(default=0)
+    latency_digest = models.JSONField(default=dict, blank=True, help_text="LatencyDigest buckets")
+    
+    class Meta:
+        verbose_name = 'Search Latency Rollup'
+        verbose_name_plural = 'Search Latency Rollups'
+        unique_together = ['period', 'bucket_start']
+        ordering = ['-bucket_start']
+    
+    def __str__(self):
+        return f"{self.count} searches ({self.period} of {self.bucket_start:%Y-%m-%d %H:%M})"
+
+
+class SearchRollupWatermark(models.Model):
+    """
+    Highest SearchQuery id already folded into the rollups.
+    """
+    last_query_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Search Rollup Watermark'
+    
+    def __str__(self):
+        return f"Rolled up to SearchQuery #{self.last_query_id}"
+
+
 class SearchSynonym(models.Model):
     """
     Store custom synonyms for search.
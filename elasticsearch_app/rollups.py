@@ -0,0 +1,230 @@
+"""
+Elasticsearch Search Analytics Rollups
+
+SearchQuery rows are folded into hourly and daily rollups so the analytics
+page never scans the raw table:
+
+- SearchQueryRollup: searches and zero-result searches per normalized query
+- SearchLatencyRollup: total searches plus a LatencyDigest of response times
+
+rollup_search_queries() walks new rows in id order from the watermark and
+adds their counts to the existing rollup rows, advancing the watermark in
+the same transaction. Ids are assigned before commit, so a row can become
+visible after a higher id was already rolled up; the walk therefore stops
+at the first row younger than ELASTICSEARCH_ROLLUP_LAG_SECONDS, which must
+exceed the longest transaction that logs searches. Raw rows at or below
+the watermark are no longer needed by the page and can be pruned early.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from itertools import takewhile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .cache import normalize_query
+from .digest import LatencyDigest
+from .models import SearchLatencyRollup, SearchQuery, SearchQueryRollup, SearchRollupWatermark
+
+PERIODS = ('hour', 'day')
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_SUMMARY_DAYS = 30
+DEFAULT_LAG_SECONDS = 120
+
+
+def get_summary_days():
+    return getattr(settings, 'ELASTICSEARCH_ANALYTICS_SUMMARY_DAYS', DEFAULT_SUMMARY_DAYS)
+
+
+def get_lag_seconds():
+    return getattr(settings, 'ELASTICSEARCH_ROLLUP_LAG_SECONDS', DEFAULT_LAG_SECONDS)
+
+
+def bucket_start(moment, period):
+    """Start of the local hour or day containing ``moment``."""
+    moment = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def get_watermark():
+    watermark = SearchRollupWatermark.objects.filter(pk=1).values_list('last_query_id', flat=True).first()
+    return watermark or 0
+
+
+def _fold(rows):
+    """Per-query and per-bucket totals for a batch of SearchQuery rows."""
+    queries = defaultdict(lambda: [0, 0])
+    latency = defaultdict(lambda: [0, 0, 0, LatencyDigest()])
+    for row in rows:
+        query = normalize_query(row['query'])[:500]
+        zero = 1 if row['results_count'] == 0 else 0
+        for period in PERIODS:
+            start = bucket_start(row['created_at'], period)
+            counts = queries[(period, start, query)]
+            counts[0] += 1
+            counts[1] += zero
+            bucket = latency[(period, start)]
+            bucket[0] += 1
+            bucket[1] += zero
+            bucket[2] += row['response_time_ms']
+            bucket[3].add(row['response_time_ms'])
+    return queries, latency
+
+
+def _save_query_rollups(queries):
+    existing = {}
+    for period in PERIODS:
+        keys = [key for key in queries if key[0] == period]
+        if not keys:
+            continue
+        rollups = SearchQueryRollup.objects.filter(
+            period=period,
+            bucket_start__in={key[1] for key in keys},
+            query__in={key[2] for key in keys},
+        )
+        for rollup in rollups:
+            existing[(rollup.period, rollup.bucket_start, rollup.query)] = rollup
+
+    objects = []
+    for key, (count, zero) in queries.items():
+        current = existing.get(key)
+        objects.append(SearchQueryRollup(
+            period=key[0],
+            bucket_start=key[1],
+            query=key[2],
+            count=count + (current.count if current else 0),
+            zero_result_count=zero + (current.zero_result_count if current else 0),
+        ))
+    SearchQueryRollup.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=['period', 'bucket_start', 'query'],
+        update_fields=['count', 'zero_result_count'],
+    )
+
+
+def _save_latency_rollups(latency):
+    existing = {}
+    for period in PERIODS:
+        starts = {key[1] for key in latency if key[0] == period}
+        for rollup in SearchLatencyRollup.objects.filter(period=period, bucket_start__in=starts):
+            existing[(rollup.period, rollup.bucket_start)] = rollup
+
+    objects = []
+    for key, (count, zero, total_ms, digest) in latency.items():
+        current = existing.get(key)
+        if current:
+            count += current.count
+            zero += current.zero_result_count
+            total_ms += current.total_response_time_ms
+            digest.merge(LatencyDigest.from_dict(current.latency_digest))
+        objects.append(SearchLatencyRollup(
+            period=key[0],
+            bucket_start=key[1],
+            count=count,
+            zero_result_count=zero,
+            total_response_time_ms=total_ms,
+            latency_digest=digest.to_dict(),
+        ))
+    SearchLatencyRollup.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=['period', 'bucket_start'],
+        update_fields=['count', 'zero_result_count', 'total_response_time_ms', 'latency_digest'],
+    )
+
+
+def rollup_search_queries(batch_size=DEFAULT_BATCH_SIZE, max_batches=None, lag=None):
+    """
+    Fold SearchQuery rows newer than the watermark into the rollups.
+
+    Each batch is applied in one transaction holding a lock on the
+    watermark row, so concurrent runs cannot count a row twice. Rows from
+    the last ``lag`` seconds, and every row after the first of them, wait
+    for a later run.
+
+    Returns:
+        dict: Rows processed and the new watermark
+    """
+    processed = 0
+    batches = 0
+    horizon = timezone.now() - timedelta(seconds=get_lag_seconds() if lag is None else lag)
+    SearchRollupWatermark.objects.get_or_create(pk=1)
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            watermark = SearchRollupWatermark.objects.select_for_update().get(pk=1)
+            rows = list(
+                SearchQuery.objects
+                .filter(pk__gt=watermark.last_query_id)
+                .order_by('pk')
+                .values('pk', 'query', 'results_count', 'response_time_ms', 'created_at')[:batch_size]
+            )
+            fetched = len(rows)
+            rows = list(takewhile(lambda row: row['created_at'] < horizon, rows))
+            if not rows:
+                break
+            queries, latency = _fold(rows)
+            _save_query_rollups(queries)
+            _save_latency_rollups(latency)
+            watermark.last_query_id = rows[-1]['pk']
+            watermark.save(update_fields=['last_query_id', 'updated_at'])
+        processed += len(rows)
+        batches += 1
+        if len(rows) < fetched or fetched < batch_size:
+            break
+    return {'processed': processed, 'watermark': get_watermark()}
+
+
+def summarize(days=None):
+    """
+    Analytics page figures for the last ``days`` days, from the rollups only.
+
+    Returns:
+        dict: Top and zero-result queries, totals, average and percentile
+        response times, and hourly volume for the last 24 hours
+    """
+    days = get_summary_days() if days is None else days
+    now = timezone.now()
+    since = bucket_start(now - timedelta(days=days - 1), 'day')
+    daily = SearchQueryRollup.objects.filter(period='day', bucket_start__gte=since)
+
+    top_queries = list(
+        daily.values('query').annotate(count=Sum('count')).order_by('-count', 'query')[:20]
+    )
+    zero_result_queries = list(
+        daily.filter(zero_result_count__gt=0)
+        .values('query')
+        .annotate(count=Sum('zero_result_count'))
+        .order_by('-count', 'query')[:20]
+    )
+
+    total = zero = total_ms = 0
+    digest = LatencyDigest()
+    for rollup in SearchLatencyRollup.objects.filter(period='day', bucket_start__gte=since):
+        total += rollup.count
+        zero += rollup.zero_result_count
+        total_ms += rollup.total_response_time_ms
+        digest.merge(LatencyDigest.from_dict(rollup.latency_digest))
+
+    hourly = list(
+        SearchLatencyRollup.objects
+        .filter(period='hour', bucket_start__gte=bucket_start(now - timedelta(hours=23), 'hour'))
+        .order_by('bucket_start')
+        .values('bucket_start', 'count', 'zero_result_count')
+    )
+
+    return {
+        'days': days,
+        'top_queries': top_queries,
+        'zero_result_queries': zero_result_queries,
+        'total_searches': total,
+        'zero_result_searches': zero,
+        'avg_response_time': total_ms / total if total else None,
+        'percentiles': digest.percentiles(),
+        'hourly': hourly,
+    }
@@ -3,9 +3,96 @@ Elasticsearch Search Service
 
 Provides search functionality across indexed documents.
 """
-from elasticsearch_dsl import Search, Q
+import math
+
+from django.conf import settings
+from elasticsearch import NotFoundError
+from elasticsearch_dsl import MultiSearch, Search, Q
+
+from notes_app.pagination import InvalidCursor, decode_cursor, encode_cursor
+from .cache import cached_search, normalize_query
 from .client import get_elasticsearch_client
-from .documents import INDEX_PREFIX
+from .documents import INDEX_PREFIX, LOG_INDEX_PATTERN, SEARCH_ALIASES, SUGGEST_FIELDS
+from .suggestions import get_suggestion_trie, trie_enabled
+
+# How long a point-in-time stays open between cursor pages
+PIT_KEEP_ALIVE = '2m'
+
+EXPORT_BATCH_SIZE = 1000
+
+DEFAULT_MAX_RESULT_WINDOW = 10000
+
+
+# search_all sends one query per index in a single _msearch, each over the
+# fields that index has: (index, query fields, highlight fields). Logs are
+# staff-only and never part of it.
+FEDERATED_SOURCES = [
+    (f'{INDEX_PREFIX}_documents', ['title^3', 'content^2', 'summary'], ['title', 'content']),
+    (f'{INDEX_PREFIX}_notes', ['title^3', 'content^2'], ['title', 'content']),
+    (f'{INDEX_PREFIX}_users', ['username^3', 'email^2', 'first_name', 'last_name', 'full_name'],
+     ['username', 'email', 'full_name']),
+]
+
+# First element of a search_all cursor, which holds per-index offsets
+FEDERATED_CURSOR = 'federated'
+
+
+class DeepPaginationError(ValueError):
+    """Raised when an offset page would pass index.max_result_window"""
+
+
+def get_max_result_window():
+    return getattr(settings, 'ELASTICSEARCH_MAX_RESULT_WINDOW', DEFAULT_MAX_RESULT_WINDOW)
+
+
+def _normalize_filters(filters):
+    """Drop empty filters and order list values so equal filters share a key."""
+    return {
+        key: sorted(value) if isinstance(value, (list, tuple)) else value
+        for key, value in (filters or {}).items()
+        if value not in (None, '', [], ())
+    }
+
+
+def _page_offset(page, per_page):
+    """
+    Raises:
+        DeepPaginationError: If the page reaches past max_result_window
+    """
+    offset = (page - 1) * per_page
+    if offset + per_page > get_max_result_window():
+        raise DeepPaginationError(
+            f'Page {page} is past the first {get_max_result_window()} results; use the cursor instead'
+        )
+    return offset
+
+
+def _decode_search_after(cursor, sort):
+    """Point-in-time id (None before the first cursor page) and search_after values."""
+    values = decode_cursor(cursor)
+    if len(values) != len(sort) + 1:
+        raise InvalidCursor('Cursor does not match this search')
+    return values[0], values[1:]
+
+
+def _decode_federated_cursor(cursor, sources, per_page):
+    """Per-index offsets and top scores from a search_all cursor."""
+    values = decode_cursor(cursor)
+    try:
+        marker, starts, max_scores = values
+        starts = [int(start) for start in starts]
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor('Cursor does not match this search') from e
+    if marker != FEDERATED_CURSOR or len(starts) != len(sources) or len(max_scores) != len(sources):
+        raise InvalidCursor('Cursor does not match this search')
+    if max(starts) + per_page > get_max_result_window():
+        raise DeepPaginationError(f'Each index can only be paged to its first {get_max_result_window()} results')
+    return starts, max_scores
+
+
+def _federated_sources(doc_type):
+    # Only the general documents index has a doc_type field
+    return FEDERATED_SOURCES[:1] if doc_type else FEDERATED_SOURCES
 
 
 class SearchService:
@@ -13,53 +100,206 @@ class SearchService:
     Service class for performing searches across Elasticsearch indices.
     """
     
-    def __init__(self):
+    def __init__(self, use_cache=True):
         self.client = get_elasticsearch_client()
+        self.use_cache = use_cache
+    
+    def _cached(self, endpoint, indices, params, compute):
+        """Serve a search from the result cache (see cache.py) when enabled."""
+        if not self.use_cache:
+            return compute()
+        return cached_search(endpoint, indices, params, compute)
+    
+    # =========================================================================
+    # PAGINATION
+    # =========================================================================
+    
+    def _base_search(self, indices):
+        return Search(using=self.client, index=indices).params(ignore_unavailable=True, allow_no_indices=True)
+    
+    def _paginate(self, endpoint, indices, build, sort, params, page, per_page, cursor, cache=True):
+        """
+        Run a search as one page, by offset or by cursor.
+        
+        Offset pages (``page``) are cached and limited to the index's
+        max_result_window. Cursor pages continue with search_after from the
+        previous page's last sort values inside a point-in-time, so they
+        cost the same at any depth and see a consistent snapshot.
+        
+        Args:
+            build: Callable applying the query, filters and highlighting to a Search
+            sort: Sort fields; ``_id`` is appended as the tiebreaker
+            cache: Cache offset pages
+        """
+        sort = [*sort, {'_id': 'asc'}]
+        if cursor:
+            return self._cursor_page(indices, build, sort, per_page, cursor)
+        
+        offset = _page_offset(page, per_page)
+        
+        def compute():
+            s = build(self._base_search(indices)).sort(*sort)
+            response = s[offset:offset + per_page].execute()
+            return self._format_response(response, page, per_page)
+        
+        if not cache:
+            return compute()
+        return self._cached(endpoint, indices, {**params, 'page': page, 'per_page': per_page}, compute)
+    
+    def _cursor_page(self, indices, build, sort, per_page, cursor):
+        pit_id, search_after = _decode_search_after(cursor, sort)
+        if pit_id is None:
+            # First page followed by cursor: pin the snapshot from here on
+            pit_id = self.client.open_point_in_time(
+                index=','.join(indices), keep_alive=PIT_KEEP_ALIVE, ignore_unavailable=True
+            )['id']
+        
+        try:
+            response = self._pit_search(build, sort, pit_id, search_after, per_page).execute()
+        except NotFoundError as e:
+            raise InvalidCursor('Cursor has expired') from e
+        
+        # The id can change between requests; always continue with the latest
+        pit_id = response.to_dict().get('pit_id', pit_id)
+        results = self._format_response(response, None, per_page, pit_id=pit_id)
+        if not results['next_cursor']:
+            self.close_point_in_time(pit_id)
+        return results
+    
+    def _pit_search(self, build, sort, pit_id, search_after, per_page):
+        # Searches against a point-in-time must not name indices
+        s = build(Search(using=self.client)).sort(*sort)
+        s = s.extra(pit={'id': pit_id, 'keep_alive': PIT_KEEP_ALIVE}, search_after=search_after)
+        return s[:per_page]
+    
+    def close_point_in_time(self, pit_id):
+        try:
+            self.client.close_point_in_time(body={'id': pit_id})
+        except Exception:
+            # It expires on its own after PIT_KEEP_ALIVE
+            pass
     
-    def search_all(self, query_string, page=1, per_page=10, doc_type=None):
+    # =========================================================================
+    # SEARCHES
+    # =========================================================================
+    
+    def search_all(self, query_string, page=1, per_page=10, doc_type=None, cursor=None):
         """
         Search across all indices.
         
+        Each index gets its own query over the fields it has, sent together
+        in one ``_msearch`` that the cluster runs concurrently. Scores are
+        divided by each index's top score before the hits are merged, so
+        one index's scoring scale does not crowd out the others.
+        
         Args:
             query_string: The search query
             page: Page number (1-indexed)
             per_page: Results per page
             doc_type: Optional filter by document type
+            cursor: ``next_cursor`` of the previous page; replaces ``page``
             
         Returns:
-            dict: Search results with metadata
+            dict: Search results with metadata; ``score`` is normalized and
+            ``raw_score`` is the index's own score
+            
+        Raises:
+            DeepPaginationError: If a page reaches past max_result_window
+            InvalidCursor: If the cursor is malformed
         """
-        # Calculate offset
-        offset = (page - 1) * per_page
-        
-        # Build search across all project indices
-        s = Search(using=self.client, index=f'{INDEX_PREFIX}_*')
-        
-        if query_string:
-            # Multi-match query across multiple fields
-            s = s.query(
-                'multi_match',
-                query=query_string,
-                fields=['title^3', 'content^2', 'summary', 'message', 'username', 'email'],
-                type='best_fields',
-                fuzziness='AUTO'
-            )
+        query_string = normalize_query(query_string)
+        sources = _federated_sources(doc_type)
+        
+        if cursor:
+            starts, max_scores = _decode_federated_cursor(cursor, sources, per_page)
+            responses = self._msearch(query_string, doc_type, sources, starts, per_page)
+            return self._blend(responses, max_scores, starts, 0, None, per_page)
+        
+        offset = _page_offset(page, per_page)
+        
+        def compute():
+            # Any of the first offset + per_page hits can come from any index
+            starts = [0] * len(sources)
+            responses = self._msearch(query_string, doc_type, sources, starts, offset + per_page)
+            max_scores = [response.hits.max_score if response else None for response in responses]
+            return self._blend(responses, max_scores, starts, offset, page, per_page)
+        
+        return self._cached(
+            'search_all', [index for index, _, _ in sources],
+            {'q': query_string, 'doc_type': doc_type, 'page': page, 'per_page': per_page}, compute,
+        )
+    
+    def _msearch(self, query_string, doc_type, sources, starts, size):
+        """
+        Run every source's query in one _msearch.
         
-        if doc_type:
-            s = s.filter('term', doc_type=doc_type)
+        Returns:
+            list: One Response per source, None where that search failed
+        """
+        return self._multi_search(query_string, doc_type, sources, starts, size).execute(raise_on_error=False)
+    
+    def _multi_search(self, query_string, doc_type, sources, starts, size):
+        ms = MultiSearch(using=self.client)
+        for (index, fields, highlight), start in zip(sources, starts):
+            s = self._base_search([index])
+            if query_string:
+                s = s.query(
+                    'multi_match',
+                    query=query_string,
+                    fields=fields,
+                    type='best_fields',
+                    fuzziness='AUTO'
+                )
+            if doc_type:
+                s = s.filter('term', doc_type=doc_type)
+            s = s.highlight(*highlight, fragment_size=150)
+            ms = ms.add(s[start:start + size])
+        return ms
+    
+    def _blend(self, responses, max_scores, starts, skip, page, per_page):
+        """
+        Merge per-index hits by normalized score and take one page.
         
-        # Add pagination
-        s = s[offset:offset + per_page]
+        ``next_cursor`` records how far into each index the merged results
+        have reached, along with the top scores used to normalize them.
+        """
+        total = 0
+        ranked = []
+        for position, response in enumerate(responses):
+            if response is None:
+                continue
+            total += response.hits.total.value if hasattr(response.hits.total, 'value') else response.hits.total
+            max_score = max_scores[position]
+            for rank, hit in enumerate(response):
+                score = hit.meta.score / max_score if hit.meta.score and max_score else 0.0
+                ranked.append((-score, position, rank, hit))
+        ranked.sort(key=lambda entry: entry[:3])
+        
+        consumed = list(starts)
+        for _, position, _, _ in ranked[:skip + per_page]:
+            consumed[position] += 1
         
-        # Add highlighting
-        s = s.highlight('title', 'content', 'message', fragment_size=150)
+        hits = []
+        for negative_score, _, _, hit in ranked[skip:skip + per_page]:
+            item = self._format_hit(hit)
+            item['raw_score'] = item['score']
+            item['score'] = -negative_score
+            hits.append(item)
         
-        # Execute search
-        response = s.execute()
+        next_cursor = None
+        if len(hits) == per_page and sum(consumed) < total:
+            next_cursor = encode_cursor([FEDERATED_CURSOR, consumed, max_scores])
         
-        return self._format_response(response, page, per_page)
+        return {
+            'hits': hits,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': math.ceil(total / per_page),
+            'next_cursor': next_cursor,
+        }
     
-    def search_notes(self, query_string, page=1, per_page=10, filters=None):
+    def search_notes(self, query_string, page=1, per_page=10, filters=None, cursor=None):
         """
         Search notes index.
         
@@ -68,25 +308,27 @@ class SearchService:
             page: Page number
             per_page: Results per page
             filters: Optional dict of filters (category, status, tags)
+            cursor: ``next_cursor`` of the previous page; replaces ``page``
             
         Returns:
             dict: Search results
         """
-        offset = (page - 1) * per_page
-        
-        s = Search(using=self.client, index=f'{INDEX_PREFIX}_notes')
-        
-        if query_string:
-            s = s.query(
-                'multi_match',
-                query=query_string,
-                fields=['title^3', 'content^2'],
-                type='best_fields',
-                fuzziness='AUTO'
-            )
-        
-        # Apply filters
-        if filters:
+        return self._paginate(*self._notes_spec(query_string, filters), page, per_page, cursor)
+    
+    def _notes_spec(self, query_string, filters):
+        """Endpoint, indices, build, sort and cache params of a notes search."""
+        query_string = normalize_query(query_string)
+        filters = _normalize_filters(filters)
+        
+        def build(s):
+            if query_string:
+                s = s.query(
+                    'multi_match',
+                    query=query_string,
+                    fields=['title^3', 'content^2'],
+                    type='best_fields',
+                    fuzziness='AUTO'
+                )
             if filters.get('category'):
                 s = s.filter('term', category=filters['category'])
             if filters.get('status'):
@@ -95,44 +337,33 @@ class SearchService:
                 s = s.filter('terms', tags=filters['tags'])
             if filters.get('author_id'):
                 s = s.filter('term', author_id=filters['author_id'])
+            return s.highlight('title', 'content', fragment_size=150)
         
-        s = s[offset:offset + per_page]
-        s = s.highlight('title', 'content', fragment_size=150)
-        
-        response = s.execute()
-        return self._format_response(response, page, per_page)
+        return 'search_notes', [f'{INDEX_PREFIX}_notes'], build, ['_score'], {'q': query_string, 'filters': filters}
     
-    def search_users(self, query_string, page=1, per_page=10):
+    def search_users(self, query_string, page=1, per_page=10, cursor=None):
         """
         Search users index.
         """
-        offset = (page - 1) * per_page
-        
-        s = Search(using=self.client, index=f'{INDEX_PREFIX}_users')
-        
-        if query_string:
-            s = s.query(
-                'multi_match',
-                query=query_string,
-                fields=['username^3', 'email^2', 'first_name', 'last_name', 'full_name'],
-                type='best_fields',
-                fuzziness='AUTO'
-            )
-        
-        s = s[offset:offset + per_page]
-        s = s.highlight('username', 'email', 'full_name', fragment_size=100)
-        
-        response = s.execute()
-        return self._format_response(response, page, per_page)
+        return self._paginate(*self._users_spec(query_string), page, per_page, cursor)
     
-    def search_logs(self, query_string, page=1, per_page=20, filters=None):
-        """
-        Search logs index.
-        """
-        offset = (page - 1) * per_page
-        
-        s = Search(using=self.client, index=f'{INDEX_PREFIX}_logs')
-        
+    def _users_spec(self, query_string):
+        query_string = normalize_query(query_string)
+        
+        def build(s):
+            if query_string:
+                s = s.query(
+                    'multi_match',
+                    query=query_string,
+                    fields=['username^3', 'email^2', 'first_name', 'last_name', 'full_name'],
+                    type='best_fields',
+                    fuzziness='AUTO'
+                )
+            return s.highlight('username', 'email', 'full_name', fragment_size=100)
+        
+        return 'search_users', [f'{INDEX_PREFIX}_users'], build, ['_score'], {'q': query_string}
+    
+    def _logs_query(self, s, query_string, filters):
         if query_string:
             s = s.query(
                 'multi_match',
@@ -151,34 +382,98 @@ class SearchService:
                 s = s.filter('range', timestamp={'gte': filters['date_from']})
             if filters.get('date_to'):
                 s = s.filter('range', timestamp={'lte': filters['date_to']})
+        return s
+    
+    def search_logs(self, query_string, page=1, per_page=20, filters=None, cursor=None):
+        """
+        Search logs index, newest first.
+        
+        Log searches change with every write, so they are not cached.
+        """
+        return self._paginate(*self._logs_spec(query_string, filters), page, per_page, cursor, cache=False)
+    
+    def _logs_spec(self, query_string, filters):
+        return (
+            'search_logs', [LOG_INDEX_PATTERN],
+            lambda s: self._logs_query(s, query_string, filters),
+            [{'timestamp': 'desc'}], {},
+        )
+    
+    def iter_logs(self, query_string='', filters=None, batch_size=None):
+        """
+        Stream every matching log entry, oldest first.
         
-        # Sort by timestamp descending
-        s = s.sort('-timestamp')
-        s = s[offset:offset + per_page]
+        Walks the logs index in batches with search_after inside one
+        point-in-time, so an export of any size holds one batch in memory
+        and is not disturbed by logs written while it runs.
         
-        response = s.execute()
-        return self._format_response(response, page, per_page)
+        Yields:
+            dict: Log entry source documents
+        """
+        batch_size = batch_size or EXPORT_BATCH_SIZE
+        pit_id = self.client.open_point_in_time(
+            index=LOG_INDEX_PATTERN, keep_alive=PIT_KEEP_ALIVE, ignore_unavailable=True
+        )['id']
+        search_after = None
+        try:
+            while True:
+                s = self._logs_query(Search(using=self.client), query_string, filters)
+                s = s.sort({'timestamp': 'asc'}, {'_id': 'asc'})
+                extra = {'pit': {'id': pit_id, 'keep_alive': PIT_KEEP_ALIVE}}
+                if search_after is not None:
+                    extra['search_after'] = search_after
+                response = s.extra(**extra)[:batch_size].execute()
+                pit_id = response.to_dict().get('pit_id', pit_id)
+                
+                hits = list(response)
+                for hit in hits:
+                    yield hit.to_dict()
+                if len(hits) < batch_size:
+                    return
+                search_after = list(hits[-1].meta.sort)
+        finally:
+            self.close_point_in_time(pit_id)
     
-    def suggest(self, query_string, field='title', index=None):
+    def suggest(self, query_string, field='title', index=None, size=5):
         """
         Get search suggestions (autocomplete).
+        
+        Title suggestions for popular searches come from the in-process
+        prefix trie (see suggestions.py); other prefixes use the
+        completion suggester on ``{field}.suggest``.
         """
         if index is None:
-            index = f'{INDEX_PREFIX}_*'
-        
+            if field == 'title' and trie_enabled():
+                suggestions = get_suggestion_trie().suggest(query_string, limit=size)
+                if suggestions:
+                    return suggestions
+            index = SUGGEST_FIELDS.get(field, SEARCH_ALIASES)
+        indices = [index] if isinstance(index, str) else list(index)
+        query_string = normalize_query(query_string)
+        params = {'q': query_string, 'field': field, 'index': indices, 'size': size}
+        return self._cached(
+            'suggest', indices, params,
+            lambda: self._suggest(query_string, field, indices, size),
+        )
+    
+    def _suggest(self, query_string, field, index, size=5):
+        return self._suggestions(self._suggest_search(query_string, field, index, size).execute())
+    
+    def _suggest_search(self, query_string, field, index, size):
         s = Search(using=self.client, index=index)
-        s = s.suggest(
+        s = s.params(ignore_unavailable=True, allow_no_indices=True)
+        return s.suggest(
             'suggestions',
             query_string,
             completion={
                 'field': f'{field}.suggest',
                 'fuzzy': {'fuzziness': 'AUTO'},
-                'size': 5
+                'skip_duplicates': True,
+                'size': size
             }
         )
-        
-        response = s.execute()
-        
+    
+    def _suggestions(self, response):
         suggestions = []
         if hasattr(response, 'suggest') and 'suggestions' in response.suggest:
             for option in response.suggest.suggestions[0].options:
@@ -191,9 +486,10 @@ class SearchService:
         Get aggregations/facets for a field.
         """
         if index is None:
-            index = f'{INDEX_PREFIX}_*'
+            index = SEARCH_ALIASES
         
         s = Search(using=self.client, index=index)
+        s = s.params(ignore_unavailable=True, allow_no_indices=True)
         s.aggs.bucket('by_field', 'terms', field=field, size=size)
         s = s[:0]  # Don't return documents
         
@@ -209,32 +505,49 @@ class SearchService:
         
         return buckets
     
-    def _format_response(self, response, page, per_page):
+    def _format_hit(self, hit):
+        item = {
+            'id': hit.meta.id,
+            'index': hit.meta.index,
+            'score': hit.meta.score,
+        }
+        
+        # Add document fields
+        for field in hit.to_dict():
+            item[field] = hit.to_dict()[field]
+        
+        # Add highlights if present
+        if hasattr(hit.meta, 'highlight'):
+            # Plain lists so results can be cached and serialized
+            item['highlights'] = {key: list(value) for key, value in hit.meta.highlight.to_dict().items()}
+        
+        return item
+    
+    def _format_response(self, response, page, per_page, pit_id=None):
         """
         Format Elasticsearch response to consistent structure.
+        
+        ``next_cursor`` continues after the last hit of a full page, inside
+        ``pit_id`` when the page came from a point-in-time.
         """
         hits = []
+        last_hit = None
         for hit in response:
-            item = {
-                'id': hit.meta.id,
-                'index': hit.meta.index,
-                'score': hit.meta.score,
-            }
-            
-            # Add document fields
-            for field in hit.to_dict():
-                item[field] = hit.to_dict()[field]
-            
-            # Add highlights if present
-            if hasattr(hit.meta, 'highlight'):
-                item['highlights'] = dict(hit.meta.highlight)
-            
-            hits.append(item)
+            last_hit = hit
+            hits.append(self._format_hit(hit))
+        
+        total = response.hits.total.value if hasattr(response.hits.total, 'value') else response.hits.total
+        
+        # A full page may have more after it; continue from its last sort values
+        next_cursor = None
+        if len(hits) == per_page and hasattr(last_hit.meta, 'sort'):
+            next_cursor = encode_cursor([pit_id, *last_hit.meta.sort])
         
         return {
             'hits': hits,
-            'total': response.hits.total.value if hasattr(response.hits.total, 'value') else response.hits.total,
+            'total': total,
             'page': page,
             'per_page': per_page,
-            'pages': (response.hits.total.value if hasattr(response.hits.total, 'value') else response.hits.total) // per_page + 1
+            'pages': math.ceil(total / per_page),
+            'next_cursor': next_cursor,
         }
@@ -0,0 +1,168 @@
+"""
+Elasticsearch App Signals
+
+Keeps the note and user indices current as rows change. Saves, deletes
+and tag changes only record the affected ids; once the transaction
+commits they are handed to one process_index_batch task, which re-reads
+the rows and sends index and delete actions through the bulk API.
+
+Each document has a pending marker in the cache while a task for it is
+queued, so a burst of saves to the same note within the debounce window
+enqueues it once. The task clears the markers before reading the rows,
+so a change made while it runs is queued again rather than lost.
+
+SearchSynonym changes queue a debounced synonym sync (synonyms.py).
+
+Buffered search analytics (analytics.py) are flushed after each response.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from notes_app.models import Note
+from .models import SearchSynonym
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+DEFAULT_DEBOUNCE_SECONDS = 2
+
+# Markers outlive the countdown so a slow worker does not cause duplicates
+PENDING_GRACE_SECONDS = 60
+
+# Saves limited to these fields do not change the indexed document
+UNINDEXED_NOTE_FIELDS = {'view_count', 'rendered_content', 'word_count', 'excerpt', 'related_score_floor'}
+
+_state = threading.local()
+
+
+def auto_index_enabled():
+    return getattr(settings, 'ELASTICSEARCH_AUTO_INDEX', True)
+
+
+def get_debounce_seconds():
+    return getattr(settings, 'ELASTICSEARCH_INDEX_DEBOUNCE', DEFAULT_DEBOUNCE_SECONDS)
+
+
+def pending_key(doc_type, source_id):
+    return f'elasticsearch_app:index_pending:{doc_type}:{source_id}'
+
+
+def reset_pending_documents():
+    """Drop ids recorded on this thread but not yet flushed."""
+    _state.pending = {}
+
+
+def queue_documents(doc_type, source_ids):
+    """
+    Mark documents for re-indexing once the current transaction commits.
+
+    Also used for changes made with ``update()``, which sends no signals.
+    """
+    if not auto_index_enabled():
+        return
+    source_ids = [source_id for source_id in source_ids if source_id is not None]
+    if not source_ids:
+        return
+
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        pending = _state.pending = {}
+    pending.setdefault(doc_type, set()).update(source_ids)
+    # The first flush after commit takes everything; later ones find nothing.
+    # Ids left over from a rolled-back transaction are harmless: the task
+    # re-reads the rows before indexing.
+    transaction.on_commit(flush_pending)
+
+
+def flush_pending():
+    """Enqueue one task for every document not already waiting for one."""
+    pending = getattr(_state, 'pending', None)
+    _state.pending = {}
+    if not pending:
+        return
+
+    timeout = get_debounce_seconds() + PENDING_GRACE_SECONDS
+    batch = {}
+    for doc_type, source_ids in pending.items():
+        queued = [
+            source_id for source_id in sorted(source_ids)
+            if cache.add(pending_key(doc_type, source_id), True, timeout)
+        ]
+        if queued:
+            batch[doc_type] = queued
+    if not batch:
+        return
+
+    from .tasks import process_index_batch
+    try:
+        process_index_batch.apply_async(args=[batch], countdown=get_debounce_seconds())
+    except Exception:
+        # Let the next change retry instead of waiting out the markers
+        cache.delete_many([
+            pending_key(doc_type, source_id)
+            for doc_type, source_ids in batch.items()
+            for source_id in source_ids
+        ])
+        logger.warning('Could not queue search index update for %s', batch, exc_info=True)
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= UNINDEXED_NOTE_FIELDS:
+        return
+    queue_documents('note', [instance.pk])
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted(sender, instance, **kwargs):
+    queue_documents('note', [instance.pk])
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def note_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Clears are handled before they happen, while the affected rows still exist
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        note_ids = [instance.pk]
+    elif action == 'pre_clear':
+        note_ids = list(instance.notes.values_list('pk', flat=True))
+    else:
+        note_ids = pk_set
+    queue_documents('note', note_ids)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    queue_documents('user', [instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    queue_documents('user', [instance.pk])
+
+
+@receiver(post_save, sender=SearchSynonym)
+@receiver(post_delete, sender=SearchSynonym)
+def search_synonym_changed(sender, instance, **kwargs):
+    from .synonyms import queue_synonym_sync
+    queue_synonym_sync()
+
+
+@receiver(request_finished)
+def flush_search_analytics(sender, **kwargs):
+    from .analytics import flush_search_events
+    try:
+        flush_search_events()
+    except Exception:
+        # Never let analytics break the request cycle
+        logger.warning('Search analytics flush failed', exc_info=True)
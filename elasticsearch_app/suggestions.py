@@ -0,0 +1,128 @@
+"""
+Elasticsearch App Suggestion Trie
+
+Autocomplete for popular searches is answered from an in-process prefix
+trie before Elasticsearch is asked. The trie holds the top
+ELASTICSEARCH_SUGGEST_TRIE_SIZE queries from the daily analytics rollups
+that returned results, weighted by how often they were searched. Every
+node keeps its best completions already ranked, so a lookup is one walk
+down the prefix.
+
+Each process builds its own trie on first use and rebuilds it once it is
+older than ELASTICSEARCH_SUGGEST_TRIE_TTL seconds. Prefixes the trie
+cannot answer fall back to the completion suggester.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .cache import normalize_query
+
+DEFAULT_TRIE_SIZE = 1000
+DEFAULT_TRIE_TTL = 300
+
+# Completions stored per node, and the deepest prefix indexed
+MAX_SUGGESTIONS = 10
+MAX_PREFIX_LENGTH = 20
+
+_lock = threading.Lock()
+_state = {'trie': None, 'built_at': 0.0}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def trie_enabled():
+    return _setting('ELASTICSEARCH_SUGGEST_TRIE', True)
+
+
+class PrefixTrie:
+    """
+    Prefix trie returning the highest weighted completions for a prefix.
+    """
+
+    def __init__(self, entries=()):
+        self.root = {}
+        self.size = 0
+        # Inserting heaviest first leaves every node's list in rank order
+        for text, weight in sorted(entries, key=lambda entry: (-entry[1], entry[0])):
+            self._insert(text)
+
+    def _insert(self, text):
+        text = normalize_query(text)
+        if not text:
+            return
+        node = self.root
+        for char in text[:MAX_PREFIX_LENGTH]:
+            node = node.setdefault(char, {'': []})
+            completions = node['']
+            if len(completions) < MAX_SUGGESTIONS:
+                completions.append(text)
+        self.size += 1
+
+    def suggest(self, prefix, limit=5):
+        """
+        Best completions for ``prefix``, or an empty list when the trie
+        has none (including prefixes longer than MAX_PREFIX_LENGTH).
+        """
+        prefix = normalize_query(prefix)
+        if not prefix or len(prefix) > MAX_PREFIX_LENGTH:
+            return []
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node[''][:limit]
+
+
+def popular_queries(limit=None, days=None):
+    """
+    Most searched queries that returned results, with their search counts.
+    """
+    from .models import SearchQueryRollup
+    from .rollups import bucket_start, get_summary_days
+
+    limit = _setting('ELASTICSEARCH_SUGGEST_TRIE_SIZE', DEFAULT_TRIE_SIZE) if limit is None else limit
+    days = get_summary_days() if days is None else days
+    since = bucket_start(timezone.now() - timedelta(days=days - 1), 'day')
+    rows = (
+        SearchQueryRollup.objects
+        .filter(period='day', bucket_start__gte=since)
+        .values('query')
+        .annotate(hits=Sum(F('count') - F('zero_result_count')))
+        .filter(hits__gt=0)
+        .order_by('-hits', 'query')[:limit]
+    )
+    return [(row['query'], row['hits']) for row in rows]
+
+
+def peek_suggestion_trie():
+    """This process's trie if it is built and fresh, else None; never queries."""
+    trie = _state['trie']
+    if trie is not None and time.monotonic() - _state['built_at'] <= _setting('ELASTICSEARCH_SUGGEST_TRIE_TTL', DEFAULT_TRIE_TTL):
+        return trie
+    return None
+
+
+def get_suggestion_trie():
+    """This process's trie, rebuilt when older than the TTL."""
+    trie = peek_suggestion_trie()
+    if trie is None:
+        with _lock:
+            trie = peek_suggestion_trie()
+            if trie is None:
+                trie = _state['trie'] = PrefixTrie(popular_queries())
+                _state['built_at'] = time.monotonic()
+    return trie
+
+
+def reset_suggestion_trie():
+    with _lock:
+        _state['trie'] = None
+        _state['built_at'] = 0.0
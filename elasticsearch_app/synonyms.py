@@ -0,0 +1,167 @@
+"""
+Elasticsearch App Synonyms
+
+Active SearchSynonym rows are compiled into a Solr-format synonyms file
+that the ``search_synonyms`` analyzer (documents.py) reads through an
+updateable ``synonym_graph`` filter. Synonyms are applied to queries only,
+so a change needs no reindex: the file is rewritten and the
+reload-search-analyzers API makes every node read it again.
+
+The file is written to ELASTICSEARCH_SYNONYMS_FILE, which must be the
+file Elasticsearch reads as ELASTICSEARCH_SYNONYMS_PATH (for example a
+volume mounted into each node's config directory).
+
+Saving or deleting a SearchSynonym queues one sync_search_synonyms task
+after the transaction commits; further changes within the debounce window
+are picked up by that same task.
+"""
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import bump_generation
+from .documents import INDEX_PREFIX
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEBOUNCE_SECONDS = 5
+
+# Marker outlives the countdown so a slow worker does not cause duplicates
+PENDING_GRACE_SECONDS = 60
+
+SYNC_PENDING_KEY = 'elasticsearch_app:synonyms_pending'
+
+# Indices whose fields search with the synonym analyzer
+SYNONYM_INDICES = [f'{INDEX_PREFIX}_documents', f'{INDEX_PREFIX}_notes']
+
+
+def get_synonyms_file():
+    return getattr(settings, 'ELASTICSEARCH_SYNONYMS_FILE', '')
+
+
+def get_debounce_seconds():
+    return getattr(settings, 'ELASTICSEARCH_SYNONYMS_DEBOUNCE', DEFAULT_DEBOUNCE_SECONDS)
+
+
+def _clean(term):
+    # Commas, "=>" and "#" are syntax in the Solr format
+    term = term.replace(',', ' ').replace('=>', ' ').replace('#', ' ').replace('\\', ' ')
+    return ' '.join(term.split()).lower()
+
+
+def compile_synonyms(synonyms=None):
+    """
+    Solr-format rules, one line of equivalent terms per active SearchSynonym.
+
+    Returns:
+        str: File contents, sorted so unchanged rows give identical output
+    """
+    from .models import SearchSynonym
+
+    if synonyms is None:
+        synonyms = SearchSynonym.objects.filter(is_active=True)
+    lines = []
+    for synonym in synonyms:
+        terms = []
+        for term in [synonym.term, *synonym.get_synonyms_list()]:
+            term = _clean(term)
+            if term and term not in terms:
+                terms.append(term)
+        if len(terms) > 1:
+            lines.append(', '.join(terms))
+    return ''.join(f'{line}\n' for line in sorted(lines))
+
+
+def write_synonyms_file(content=None):
+    """
+    Replace the synonyms file if its contents changed.
+
+    Returns:
+        bool: Whether the file was written; False when unchanged or when
+        ELASTICSEARCH_SYNONYMS_FILE is not set
+    """
+    path = get_synonyms_file()
+    if not path:
+        return False
+    content = compile_synonyms() if content is None else content
+    try:
+        with open(path, encoding='utf-8') as current:
+            if current.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # Nodes must never read a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.synonyms-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            tmp.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def reload_search_analyzers(client=None):
+    """
+    Make every node re-read the synonyms file.
+
+    Returns:
+        list: Concrete indices whose analyzers were reloaded
+    """
+    if client is None:
+        from .client import get_elasticsearch_client
+        client = get_elasticsearch_client()
+    response = client.indices.reload_search_analyzers(
+        index=','.join(SYNONYM_INDICES), ignore_unavailable=True, allow_no_indices=True,
+    )
+    # Cached results were computed with the old rules
+    bump_generation(*SYNONYM_INDICES)
+    return sorted(detail['index'] for detail in response.get('reload_details', []))
+
+
+def sync_synonyms(client=None, force=False):
+    """
+    Write the current rules and reload the analyzers when they changed.
+
+    Returns:
+        dict: Rule count, whether the file changed and the reloaded indices
+    """
+    if not get_synonyms_file():
+        return {'success': False, 'error': 'ELASTICSEARCH_SYNONYMS_FILE is not set'}
+    content = compile_synonyms()
+    changed = write_synonyms_file(content)
+    reloaded = reload_search_analyzers(client) if changed or force else []
+    return {
+        'success': True,
+        'rules': content.count('\n'),
+        'changed': changed,
+        'reloaded': reloaded,
+    }
+
+
+def queue_synonym_sync():
+    """Sync the synonyms once the current transaction commits."""
+    transaction.on_commit(_enqueue_sync)
+
+
+def _enqueue_sync():
+    timeout = get_debounce_seconds() + PENDING_GRACE_SECONDS
+    if not cache.add(SYNC_PENDING_KEY, True, timeout):
+        return
+
+    from .tasks import sync_search_synonyms
+    try:
+        sync_search_synonyms.apply_async(countdown=get_debounce_seconds())
+    except Exception:
+        # Let the next change retry instead of waiting out the marker
+        cache.delete(SYNC_PENDING_KEY)
+        logger.warning('Could not queue search synonym sync', exc_info=True)
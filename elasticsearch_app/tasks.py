@@ -3,9 +3,13 @@ Elasticsearch Celery Tasks
 
 Background tasks for indexing and maintenance.
 """
+import logging
+
 from celery import shared_task
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 
 @shared_task(bind=True)
 def index_document(self, doc_type, source_id, data):
@@ -17,6 +21,7 @@ def index_document(self, doc_type, source_id, data):
         source_id: ID from the source system
         data: Document data to index
     """
+    from .cache import bump_generation
     from .client import get_elasticsearch_client
     from .documents import INDEX_PREFIX
     from .models import IndexedDocument
@@ -29,7 +34,9 @@ def index_document(self, doc_type, source_id, data):
         response = client.index(
             index=index_name,
             id=f'{doc_type}_{source_id}',
-            body=data
+            body=data,
+            # Searches must see the document before cached results are dropped
+            refresh='wait_for'
         )
         
         # Update or create tracking record
@@ -44,6 +51,7 @@ def index_document(self, doc_type, source_id, data):
                 'error_message': None
             }
         )
+        bump_generation(index_name)
         
         return {'success': True, 'es_id': response['_id']}
         
@@ -66,6 +74,7 @@ def delete_document(self, doc_type, source_id):
     """
     Delete a document from Elasticsearch.
     """
+    from .cache import bump_generation
     from .client import get_elasticsearch_client
     from .documents import INDEX_PREFIX
     from .models import IndexedDocument
@@ -77,14 +86,17 @@ def delete_document(self, doc_type, source_id):
         client.delete(
             index=index_name,
             id=f'{doc_type}_{source_id}',
-            ignore=[404]
+            ignore=[404],
+            refresh='wait_for'
         )
         
-        # Update tracking record
+        # Update tracking record; update() skips auto_now, and rebuild_index
+        # finds deletions to replay by updated_at
         IndexedDocument.objects.filter(
             doc_type=doc_type,
             source_id=str(source_id)
-        ).update(status='deleted')
+        ).update(status='deleted', updated_at=timezone.now())
+        bump_generation(index_name)
         
         return {'success': True}
         
@@ -93,112 +105,145 @@ def delete_document(self, doc_type, source_id):
 
 
 @shared_task(bind=True)
-def reindex_all_documents(self):
+def process_index_batch(self, batch):
+    """
+    Sync a batch of changed documents queued by elasticsearch_app.signals.
+    
+    Args:
+        batch: Mapping of doc_type to source ids
+    """
+    from django.core.cache import cache
+    from .indexing import sync_documents
+    from .signals import pending_key
+    
+    # Clear the markers first: a change made from here on queues a new batch
+    cache.delete_many([
+        pending_key(doc_type, source_id)
+        for doc_type, source_ids in batch.items()
+        for source_id in source_ids
+    ])
+    
+    results = {}
+    for doc_type, source_ids in batch.items():
+        results[doc_type] = sync_documents(doc_type, source_ids)
+    return {'success': True, 'results': results}
+
+
+@shared_task(bind=True)
+def reindex_all_documents(self, chunk_size=500, parallel=False):
     """
     Reindex all documents from Django models to Elasticsearch.
+    
+    Rows are streamed and sent through the bulk API in chunks; see
+    elasticsearch_app.indexing.
     """
-    from .client import get_elasticsearch_client
-    from .documents import INDEX_PREFIX, NoteDocument, UserDocument
-    from django.contrib.auth import get_user_model
+    from .indexing import reindex_all
     
-    client = get_elasticsearch_client()
-    User = get_user_model()
-    
-    indexed_count = 0
-    error_count = 0
-    
-    # Index all users
-    for user in User.objects.all():
-        try:
-            data = {
-                'username': user.username,
-                'email': user.email,
-                'first_name': getattr(user, 'first_name', ''),
-                'last_name': getattr(user, 'last_name', ''),
-                'full_name': f"{getattr(user, 'first_name', '')} {getattr(user, 'last_name', '')}".strip(),
-                'is_active': user.is_active,
-                'date_joined': user.date_joined.isoformat() if user.date_joined else None,
-                'last_login': user.last_login.isoformat() if user.last_login else None,
-            }
-            
-            index_document.delay('user', user.id, data)
-            indexed_count += 1
-            
-        except Exception as e:
-            error_count += 1
-    
-    # Try to index notes if notes_app exists
-    try:
-        from notes_app.models import Note
-        
-        for note in Note.objects.all():
-            try:
-                data = {
-                    'title': note.title,
-                    'content': note.content,
-                    'slug': note.slug,
-                    'author': note.author.username if note.author else None,
-                    'author_id': note.author.id if note.author else None,
-                    'category': note.category.name if hasattr(note, 'category') and note.category else None,
-                    'category_id': note.category.id if hasattr(note, 'category') and note.category else None,
-                    'status': getattr(note, 'status', 'active'),
-                    'is_pinned': getattr(note, 'is_pinned', False),
-                    'created_at': note.created_at.isoformat() if note.created_at else None,
-                    'updated_at': note.updated_at.isoformat() if note.updated_at else None,
-                }
-                
-                # Add tags if available
-                if hasattr(note, 'tags'):
-                    data['tags'] = [tag.name for tag in note.tags.all()]
-                
-                index_document.delay('note', note.id, data)
-                indexed_count += 1
-                
-            except Exception as e:
-                error_count += 1
-                
-    except ImportError:
-        pass  # notes_app not installed
-    
-    return {
-        'success': True,
-        'indexed_count': indexed_count,
-        'error_count': error_count
-    }
+    result = reindex_all(chunk_size=chunk_size, parallel=parallel)
+    return {'success': True, **result}
+
+
+@shared_task(bind=True)
+def rebuild_search_indices(self, doc_types=None, chunk_size=500):
+    """
+    Rebuild versioned indices and swap their aliases without downtime.
+    """
+    from .versioning import VERSIONED_DOCUMENTS, rebuild_index
+    
+    results = {}
+    for doc_type in doc_types or list(VERSIONED_DOCUMENTS):
+        results[doc_type] = rebuild_index(doc_type, chunk_size=chunk_size)
+    return {'success': True, 'results': results}
 
 
 @shared_task
-def cleanup_old_search_queries(days=30):
+def rollup_search_queries(batch_size=5000):
     """
-    Remove old search query logs.
+    Fold new search query logs into the hourly and daily analytics rollups.
     """
-    from .models import SearchQuery
+    from .rollups import rollup_search_queries as run_rollup
+    
+    result = run_rollup(batch_size=batch_size)
+    return {'success': True, **result}
+
+
+@shared_task
+def cleanup_old_search_queries(days=None, hourly_days=None):
+    """
+    Remove old search query logs and hourly rollups.
+    
+    Raw rows are only needed until they are rolled up, so they are kept
+    for ELASTICSEARCH_SEARCH_QUERY_RETENTION_DAYS and never deleted past
+    the rollup watermark. Daily rollups are kept.
+    """
+    from django.conf import settings
+    from .models import SearchLatencyRollup, SearchQuery, SearchQueryRollup
+    from .rollups import get_watermark
     from datetime import timedelta
     
+    if days is None:
+        days = getattr(settings, 'ELASTICSEARCH_SEARCH_QUERY_RETENTION_DAYS', 7)
+    if hourly_days is None:
+        hourly_days = getattr(settings, 'ELASTICSEARCH_HOURLY_ROLLUP_RETENTION_DAYS', 30)
+    
     cutoff_date = timezone.now() - timedelta(days=days)
-    deleted_count = SearchQuery.objects.filter(created_at__lt=cutoff_date).delete()[0]
+    deleted_count = SearchQuery.objects.filter(
+        created_at__lt=cutoff_date,
+        pk__lte=get_watermark(),
+    ).delete()[0]
+    
+    hourly_cutoff = timezone.now() - timedelta(days=hourly_days)
+    rollups_deleted = (
+        SearchQueryRollup.objects.filter(period='hour', bucket_start__lt=hourly_cutoff).delete()[0]
+        + SearchLatencyRollup.objects.filter(period='hour', bucket_start__lt=hourly_cutoff).delete()[0]
+    )
     
-    return {'deleted_count': deleted_count}
+    return {'deleted_count': deleted_count, 'rollups_deleted': rollups_deleted}
 
 
 @shared_task
-def sync_index_status():
+def cleanup_old_log_indices(days=None):
     """
-    Sync index status between Django and Elasticsearch.
+    Delete daily log indices older than ELASTICSEARCH_LOG_RETENTION_DAYS.
     """
-    from .client import get_elasticsearch_client
-    from .models import IndexedDocument
+    from .log_handlers import delete_expired_log_indices
     
-    client = get_elasticsearch_client()
+    deleted = delete_expired_log_indices(days=days)
+    if deleted:
+        logger.info('Deleted expired log indices: %s', ', '.join(deleted))
+    return {'success': True, 'deleted': deleted}
+
+
+@shared_task
+def sync_search_synonyms(force=False):
+    """
+    Push SearchSynonym changes to the search analyzers.
+    
+    Queued (debounced) by SearchSynonym saves and deletes; see synonyms.py.
+    """
+    from django.core.cache import cache
+    from .synonyms import SYNC_PENDING_KEY, sync_synonyms
+    
+    # Cleared first so a change made while this runs queues another sync
+    cache.delete(SYNC_PENDING_KEY)
+    result = sync_synonyms(force=force)
+    if result.get('reloaded'):
+        logger.info('Reloaded search analyzers of %s (%d synonym rules)', ', '.join(result['reloaded']), result['rules'])
+    return result
+
+
+@shared_task
+def sync_index_status(chunk_size=1000, reindex_missing=False):
+    """
+    Sync index status between Django and Elasticsearch.
+    
+    Args:
+        chunk_size: Tracking rows checked per mget request
+        reindex_missing: Queue documents missing from the index for
+            bulk reindexing instead of marking them deleted
+    """
+    from .indexing import reconcile_index_status
     
-    # Check each indexed document
-    for doc in IndexedDocument.objects.filter(status='indexed'):
-        try:
-            exists = client.exists(index=doc.es_index, id=doc.es_id)
-            if not exists:
-                doc.status = 'deleted'
-                doc.save()
-        except Exception:
-            pass
-    
-    return {'success': True}
+    report = reconcile_index_status(chunk_size=chunk_size, reindex_missing=reindex_missing)
+    logger.info('Index status drift: %s', report)
+    return {'success': True, **report}
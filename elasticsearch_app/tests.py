@@ -1,13 +1,15 @@
 """
 Elasticsearch App Tests
 """
-from django.test import TestCase, Client
+from django.test import TestCase, Client, RequestFactory
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from unittest.mock import patch, MagicMock
+from .analytics import flush_search_events, get_sink_stats, record_search, reset_search_sink
 from .models import IndexedDocument, SearchQuery, SearchSynonym
 from .client import check_elasticsearch_connection, get_cluster_health
-from .documents import INDEX_PREFIX
+from .documents import INDEX_PREFIX, SEARCH_ALIASES
 
 
 User = get_user_model()
@@ -237,6 +239,7 @@ class ElasticsearchTasksTest(TestCase):
         
         result = index_document('note', '1', {'title': 'Test Note'})
         self.assertTrue(result['success'])
+        self.assertEqual(mock_es.index.call_args.kwargs['refresh'], 'wait_for')
     
     @patch('elasticsearch_app.client.Elasticsearch')
     def test_delete_document_task(self, mock_es_class):
@@ -260,6 +263,7 @@ class ElasticsearchTasksTest(TestCase):
         
         result = delete_document('note', '1')
         self.assertTrue(result['success'])
+        self.assertEqual(mock_es.delete.call_args.kwargs['refresh'], 'wait_for')
 
 
 
@@ -400,29 +404,31 @@ class SearchServiceTests(TestCase):
     
     @patch('elasticsearch_app.search.get_elasticsearch_client')
     def test_search_all_with_query(self, mock_get_client):
-        """Test search_all with a query string"""
-        mock_client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.hits.total.value = 1
-        mock_response.__iter__ = MagicMock(return_value=iter([]))
+        """Test search_all sends one tailored query per index in one msearch"""
+        from .search import FEDERATED_SOURCES
         
+        mock_client = MagicMock()
+        mock_client.msearch.return_value = {'responses': [
+            {'hits': {'total': {'value': 0, 'relation': 'eq'}, 'max_score': None, 'hits': []}}
+            for _ in FEDERATED_SOURCES
+        ]}
         mock_get_client.return_value = mock_client
         
-        with patch('elasticsearch_app.search.Search') as mock_search_class:
-            mock_search = MagicMock()
-            mock_search.query.return_value = mock_search
-            mock_search.filter.return_value = mock_search
-            mock_search.highlight.return_value = mock_search
-            mock_search.__getitem__ = MagicMock(return_value=mock_search)
-            mock_search.execute.return_value = mock_response
-            mock_search_class.return_value = mock_search
-            
-            service = SearchService()
-            results = service.search_all('test query')
-            
-            self.assertIn('hits', results)
-            self.assertIn('total', results)
-            self.assertIn('page', results)
+        service = SearchService(use_cache=False)
+        results = service.search_all('test query')
+        
+        mock_client.msearch.assert_called_once()
+        body = mock_client.msearch.call_args.kwargs['body']
+        headers, queries = body[::2], body[1::2]
+        # Aliases only, never the versioned indices behind them
+        self.assertEqual([header['index'] for header in headers], [[alias] for alias in SEARCH_ALIASES])
+        notes_fields = queries[1]['query']['multi_match']['fields']
+        self.assertNotIn('username', notes_fields)
+        self.assertNotIn('message', notes_fields)
+        
+        self.assertIn('hits', results)
+        self.assertIn('total', results)
+        self.assertIn('page', results)
     
     @patch('elasticsearch_app.search.get_elasticsearch_client')
     def test_search_notes(self, mock_get_client):
@@ -436,9 +442,11 @@ class SearchServiceTests(TestCase):
         
         with patch('elasticsearch_app.search.Search') as mock_search_class:
             mock_search = MagicMock()
+            mock_search.params.return_value = mock_search
             mock_search.query.return_value = mock_search
             mock_search.filter.return_value = mock_search
             mock_search.highlight.return_value = mock_search
+            mock_search.sort.return_value = mock_search
             mock_search.__getitem__ = MagicMock(return_value=mock_search)
             mock_search.execute.return_value = mock_response
             mock_search_class.return_value = mock_search
@@ -460,8 +468,10 @@ class SearchServiceTests(TestCase):
         
         with patch('elasticsearch_app.search.Search') as mock_search_class:
             mock_search = MagicMock()
+            mock_search.params.return_value = mock_search
             mock_search.query.return_value = mock_search
             mock_search.highlight.return_value = mock_search
+            mock_search.sort.return_value = mock_search
             mock_search.__getitem__ = MagicMock(return_value=mock_search)
             mock_search.execute.return_value = mock_response
             mock_search_class.return_value = mock_search
@@ -484,6 +494,7 @@ class SearchServiceTests(TestCase):
         with patch('elasticsearch_app.search.Search') as mock_search_class:
             mock_search = MagicMock()
             mock_search.query.return_value = mock_search
+            mock_search.params.return_value = mock_search
             mock_search.filter.return_value = mock_search
             mock_search.sort.return_value = mock_search
             mock_search.__getitem__ = MagicMock(return_value=mock_search)
@@ -620,7 +631,8 @@ class ElasticsearchDocumentsExtendedTests(TestCase):
         self.assertEqual(SearchableDocument.Index.name, f'{INDEX_PREFIX}_documents')
         self.assertEqual(NoteDocument.Index.name, f'{INDEX_PREFIX}_notes')
         self.assertEqual(UserDocument.Index.name, f'{INDEX_PREFIX}_users')
-        self.assertEqual(LogDocument.Index.name, f'{INDEX_PREFIX}_logs')
+        # Logs go to daily indices matching this pattern
+        self.assertEqual(LogDocument.Index.name, f'{INDEX_PREFIX}_logs-*')
 
 
 class ElasticsearchTasksExtendedTests(TestCase):
@@ -657,9 +669,539 @@ class ElasticsearchTasksExtendedTests(TestCase):
         self.assertFalse(result['success'])
 
 
+class BulkIndexingTests(TestCase):
+    """Test bulk reindexing through the Elasticsearch bulk helpers"""
+    
+    def setUp(self):
+        from notes_app.models import Category, Note, Tag
+        
+        self.user = User.objects.create_user(email='bulk@example.com', username='bulkuser', password='pass')
+        category = Category.objects.create(name='Bulk Category', slug='bulk-category')
+        tag = Tag.objects.create(name='bulk', slug='bulk')
+        for i in range(5):
+            note = Note.objects.create(
+                title=f'Bulk Note {i}', slug=f'bulk-note-{i}', content='Content',
+                author=self.user, category=category,
+            )
+            note.tags.add(tag)
+    
+    def _fake_bulk(self, failing_ids=()):
+        sent = []
+        
+        def streaming_bulk(client, actions, chunk_size, **kwargs):
+            for action in actions:
+                sent.append(action)
+                ok = action['_id'] not in failing_ids
+                result = {'_id': action['_id'], '_index': action['_index']}
+                if not ok:
+                    result['error'] = {'type': 'mapper_parsing_exception'}
+                yield ok, {'index': result}
+        return sent, streaming_bulk
+    
+    def test_bulk_index_notes_without_per_row_queries(self):
+        """Test notes are serialized with related rows loaded per chunk"""
+        from .indexing import bulk_index
+        
+        sent, fake = self._fake_bulk()
+        with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=fake):
+            # one note query, a tag prefetch and an upsert per chunk of two
+            with self.assertNumQueries(7):
+                counts = bulk_index('note', client=MagicMock(), chunk_size=2)
+        
+        self.assertEqual(counts, {'indexed': 5, 'failed': 0})
+        self.assertEqual(len(sent), 5)
+        self.assertEqual(sent[0]['_index'], f'{INDEX_PREFIX}_notes')
+        self.assertEqual(sent[0]['_source']['author'], 'bulkuser')
+        self.assertEqual(sent[0]['_source']['category'], 'Bulk Category')
+        self.assertEqual(sent[0]['_source']['tags'], ['bulk'])
+    
+    def test_bulk_index_upserts_tracking_records(self):
+        """Test existing tracking rows are updated and failures recorded"""
+        from notes_app.models import Note
+        from .indexing import bulk_index
+        
+        first, second = Note.objects.order_by('pk')[:2]
+        IndexedDocument.objects.create(
+            doc_type='note', source_id=str(first.pk), es_index='old', status='failed',
+            error_message='previous failure',
+        )
+        
+        _, fake = self._fake_bulk(failing_ids={f'note_{second.pk}'})
+        with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=fake):
+            counts = bulk_index('note', client=MagicMock())
+        
+        self.assertEqual(counts, {'indexed': 4, 'failed': 1})
+        self.assertEqual(IndexedDocument.objects.filter(doc_type='note').count(), 5)
+        
+        updated = IndexedDocument.objects.get(doc_type='note', source_id=str(first.pk))
+        self.assertEqual(updated.status, 'indexed')
+        self.assertEqual(updated.es_id, f'note_{first.pk}')
+        self.assertIsNone(updated.error_message)
+        self.assertIsNotNone(updated.indexed_at)
+        
+        failed = IndexedDocument.objects.get(doc_type='note', source_id=str(second.pk))
+        self.assertEqual(failed.status, 'failed')
+        self.assertIn('mapper_parsing_exception', failed.error_message)
+    
+    def test_only_live_writes_wait_for_refresh(self):
+        """Test alias writes wait for a refresh before bumping the cache generation"""
+        from .indexing import bulk_index
+        
+        options = []
+        
+        def streaming_bulk(client, actions, chunk_size, **kwargs):
+            options.append(kwargs)
+            for action in actions:
+                yield True, {'index': {'_id': action['_id'], '_index': action['_index']}}
+        
+        with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=streaming_bulk), \
+                patch('elasticsearch_app.indexing.bump_generation') as bump:
+            bulk_index('note', client=MagicMock())
+            self.assertEqual(options[0]['refresh'], 'wait_for')
+            bump.assert_called_once_with(f'{INDEX_PREFIX}_notes')
+            
+            bump.reset_mock()
+            bulk_index('note', client=MagicMock(), index=f'{INDEX_PREFIX}_notes_v2')
+            self.assertNotIn('refresh', options[1])
+            bump.assert_not_called()
+    
+    def test_reindex_all_documents_reports_throughput(self):
+        """Test reindex task indexes users and notes in bulk"""
+        from .tasks import reindex_all_documents
+        
+        _, fake = self._fake_bulk()
+        with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=fake), \
+                patch('elasticsearch_app.indexing.get_elasticsearch_client'), \
+                patch('elasticsearch_app.tasks.index_document.delay') as mock_delay:
+            result = reindex_all_documents()
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['indexed_count'], 6)
+        self.assertEqual(result['by_type']['user'], {'indexed': 1, 'failed': 0})
+        self.assertIn('docs_per_second', result)
+        mock_delay.assert_not_called()
+
+
+class IndexVersioningTests(TestCase):
+    """Test versioned indices behind swappable aliases"""
+    
+    def _client(self, versions, live):
+        alias = f'{INDEX_PREFIX}_notes'
+        client = MagicMock()
+        client.indices.get.return_value = {f'{alias}_v{n}': {} for n in versions}
+        client.indices.get_alias.return_value = {f'{alias}_v{n}': {'aliases': {alias: {}}} for n in live}
+        client.indices.exists.return_value = True
+        client.indices.exists_alias.return_value = True
+        return client
+    
+    def test_rebuild_loads_new_version_and_swaps_alias(self):
+        """Test rebuild creates the next version and moves the alias atomically"""
+        from .versioning import rebuild_index
+        
+        client = self._client(versions=[1], live=[1])
+        
+        def streaming_bulk(client, actions, chunk_size, **kwargs):
+            for action in actions:
+                yield True, {'index': {'_id': action['_id'], '_index': action['_index']}}
+        
+        with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=streaming_bulk):
+            result = rebuild_index('note', client=client)
+        
+        new_index = f'{INDEX_PREFIX}_notes_v2'
+        self.assertEqual(result['index'], new_index)
+        create_kwargs = client.indices.create.call_args.kwargs
+        self.assertEqual(create_kwargs['index'], new_index)
+        self.assertEqual(create_kwargs['body']['settings']['refresh_interval'], '-1')
+        self.assertIn('title', create_kwargs['body']['mappings']['properties'])
+        
+        client.indices.put_settings.assert_called_once()
+        client.indices.forcemerge.assert_called_once_with(index=new_index, max_num_segments=1)
+        client.indices.update_aliases.assert_called_once_with(body={'actions': [
+            {'remove': {'index': f'{INDEX_PREFIX}_notes_v1', 'alias': f'{INDEX_PREFIX}_notes'}},
+            {'add': {'index': new_index, 'alias': f'{INDEX_PREFIX}_notes'}},
+        ]})
+    
+    def test_rebuild_replays_deletions_before_swap(self):
+        """Test rows deleted during the build are deleted from the new version before the swap"""
+        from .versioning import rebuild_index
+        
+        client = self._client(versions=[1], live=[1])
+        deletes = []
+        
+        def streaming_bulk(client, actions, chunk_size, **kwargs):
+            for action in actions:
+                if action['_op_type'] == 'delete':
+                    deletes.append((action['_index'], action['_id'], client.indices.update_aliases.called))
+                    yield False, {'delete': {'_id': action['_id'], 'status': 404}}
+        
+        def load(*args, **kwargs):
+            # A note deleted while the new version was loading
+            IndexedDocument.objects.get_or_create(
+                doc_type='note', source_id='42', es_index=f'{INDEX_PREFIX}_notes', status='deleted',
+            )
+            return {'indexed': 0, 'failed': 0}
+        
+        with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=streaming_bulk), \
+                patch('elasticsearch_app.versioning.bulk_index', side_effect=load):
+            result = rebuild_index('note', client=client)
+        
+        self.assertEqual(deletes[0], (f'{INDEX_PREFIX}_notes_v2', 'note_42', False))
+        self.assertGreaterEqual(result['deleted'], 1)
+    
+    def test_rebuild_failure_keeps_live_version(self):
+        """Test a failed load deletes the new version without touching the alias"""
+        from .versioning import rebuild_index
+        
+        client = self._client(versions=[1], live=[1])
+        with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=ConnectionError('down')):
+            with self.assertRaises(ConnectionError):
+                rebuild_index('note', client=client)
+        
+        client.indices.delete.assert_called_once_with(index=f'{INDEX_PREFIX}_notes_v2', ignore=[404])
+        client.indices.update_aliases.assert_not_called()
+    
+    def test_swap_replaces_unversioned_index(self):
+        """Test a concrete index using the alias name is removed in the swap"""
+        from .versioning import swap_alias
+        
+        alias = f'{INDEX_PREFIX}_notes'
+        client = self._client(versions=[1], live=[])
+        client.indices.exists_alias.return_value = False
+        
+        swap_alias(client, alias, f'{alias}_v1')
+        
+        actions = client.indices.update_aliases.call_args.kwargs['body']['actions']
+        self.assertEqual(actions, [
+            {'remove_index': {'index': alias}},
+            {'add': {'index': f'{alias}_v1', 'alias': alias}},
+        ])
+    
+    def test_rollback_and_prune(self):
+        """Test rollback targets the previous version and pruning keeps recent ones"""
+        from .versioning import IndexVersionError, prune_versions, rollback_index
+        
+        alias = f'{INDEX_PREFIX}_notes'
+        client = self._client(versions=[1, 2, 3, 4], live=[4])
+        self.assertEqual(rollback_index('note', client=client), f'{alias}_v3')
+        
+        self.assertEqual(prune_versions(client, alias, keep=2), [f'{alias}_v1', f'{alias}_v2'])
+        
+        client = self._client(versions=[1], live=[1])
+        with self.assertRaises(IndexVersionError):
+            rollback_index('note', client=client)
+
+
+class IncrementalIndexingTests(TestCase):
+    """Test signal-driven, debounced index updates"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from notes_app.models import Tag
+        from .signals import reset_pending_documents
+        
+        self.user = User.objects.create_user(email='live@example.com', username='liveuser', password='pass')
+        self.tag = Tag.objects.create(name='live', slug='live')
+        cache.clear()
+        reset_pending_documents()
+    
+    def _create_note(self, title):
+        from notes_app.models import Note
+        return Note.objects.create(title=title, slug=title.lower().replace(' ', '-'), content='Body', author=self.user)
+    
+    def test_changes_coalesce_into_one_task(self):
+        """Test saves and tag changes in a transaction enqueue one batch"""
+        with patch('elasticsearch_app.tasks.process_index_batch.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                note = self._create_note('Live Note')
+                note.title = 'Live Note edited'
+                note.save()
+                note.tags.add(self.tag)
+                self.user.save()
+        
+        apply_async.assert_called_once_with(
+            args=[{'note': [note.pk], 'user': [self.user.pk]}], countdown=2
+        )
+    
+    def test_pending_documents_are_debounced(self):
+        """Test a document already waiting for a task is not queued again"""
+        note = self._create_note('Debounced Note')
+        with patch('elasticsearch_app.tasks.process_index_batch.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                note.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                note.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                note.increment_view_count()
+        apply_async.assert_called_once()
+    
+    def test_update_calls_are_queued(self):
+        """Test bulk actions done with update() still reach the index"""
+        from notes_app.tasks import apply_bulk_action
+        from notes_app.models import Note
+        
+        note = self._create_note('Bulk Archived')
+        with patch('elasticsearch_app.tasks.process_index_batch.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                apply_bulk_action(Note.objects.filter(pk=note.pk), 'archive')
+        self.assertEqual(apply_async.call_args.kwargs['args'], [{'note': [note.pk]}])
+    
+    def test_disabled_setting_skips_queueing(self):
+        """Test ELASTICSEARCH_AUTO_INDEX=False turns the receivers off"""
+        with self.settings(ELASTICSEARCH_AUTO_INDEX=False):
+            with patch('elasticsearch_app.tasks.process_index_batch.apply_async') as apply_async:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self._create_note('Quiet Note')
+        apply_async.assert_not_called()
+    
+    def test_process_index_batch_indexes_and_deletes(self):
+        """Test the batch task indexes live rows and deletes removed ones"""
+        from django.core.cache import cache
+        from .signals import pending_key
+        from .tasks import process_index_batch
+        
+        note = self._create_note('Kept Note')
+        note.tags.add(self.tag)
+        removed = self._create_note('Removed Note')
+        removed_id = removed.pk
+        removed.delete()
+        cache.set(pending_key('note', note.pk), True)
+        
+        sent = []
+        
+        def streaming_bulk(client, actions, chunk_size, **kwargs):
+            for action in actions:
+                sent.append(action)
+                if action['_op_type'] == 'delete':
+                    yield False, {'delete': {'_id': action['_id'], 'status': 404}}
+                else:
+                    yield True, {'index': {'_id': action['_id'], 'status': 200}}
+        
+        with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=streaming_bulk), \
+                patch('elasticsearch_app.indexing.get_elasticsearch_client'):
+            result = process_index_batch({'note': [note.pk, removed_id]})
+        
+        self.assertEqual(result['results']['note'], {'indexed': 1, 'deleted': 1, 'failed': 0})
+        self.assertEqual([action['_op_type'] for action in sent], ['index', 'delete'])
+        self.assertEqual(sent[0]['_source']['tags'], ['live'])
+        self.assertIsNone(cache.get(pending_key('note', note.pk)))
+        self.assertEqual(
+            IndexedDocument.objects.get(doc_type='note', source_id=str(removed_id)).status, 'deleted'
+        )
+
+
+class SearchResultCacheTests(TestCase):
+    """Test cached search results and generation-based invalidation"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        reset_elasticsearch_client()
+    
+    def _mock_search(self, mock_search_class, total=2):
+        mock_response = MagicMock()
+        mock_response.hits.total.value = total
+        mock_response.__iter__ = MagicMock(side_effect=lambda: iter([]))
+        mock_search = MagicMock()
+        for method in ('params', 'query', 'filter', 'highlight', 'sort', 'suggest'):
+            getattr(mock_search, method).return_value = mock_search
+        mock_search.__getitem__ = MagicMock(return_value=mock_search)
+        mock_search.execute.return_value = mock_response
+        mock_search_class.return_value = mock_search
+        return mock_search
+    
+    @patch('elasticsearch_app.search.get_elasticsearch_client')
+    def test_repeated_search_is_served_from_cache(self, mock_get_client):
+        """Test equivalent queries and filters hit the cache"""
+        from .cache import get_search_cache_stats
+        
+        with patch('elasticsearch_app.search.Search') as mock_search_class:
+            mock_search = self._mock_search(mock_search_class)
+            service = SearchService()
+            first = service.search_notes('Django  Tips', filters={'tags': ['b', 'a'], 'status': ''})
+            second = service.search_notes('django tips', filters={'tags': ['a', 'b']})
+        
+        self.assertEqual(first, second)
+        self.assertEqual(mock_search.execute.call_count, 1)
+        stats = {row['endpoint']: row for row in get_search_cache_stats()}
+        self.assertEqual(stats['search_notes']['hits'], 1)
+        self.assertEqual(stats['search_notes']['misses'], 1)
+        self.assertEqual(stats['search_notes']['hit_rate'], 50.0)
+        self.assertIsNone(stats['search_users']['hit_rate'])
+    
+    @patch('elasticsearch_app.search.get_elasticsearch_client')
+    def test_bulk_flush_invalidates_cached_results(self, mock_get_client):
+        """Test indexing into an index bumps its generation"""
+        from .indexing import sync_documents
+        
+        with patch('elasticsearch_app.search.Search') as mock_search_class:
+            mock_search = self._mock_search(mock_search_class)
+            service = SearchService()
+            service.search_users('alice')
+            service.search_notes('alice')
+            
+            def streaming_bulk(client, actions, chunk_size, **kwargs):
+                for action in actions:
+                    yield True, {'delete': {'_id': action['_id'], 'status': 200}}
+            
+            with patch('elasticsearch_app.indexing.helpers.streaming_bulk', side_effect=streaming_bulk):
+                sync_documents('user', [999], client=MagicMock())
+            
+            service.search_users('alice')
+            service.search_notes('alice')
+        
+        # Only the users search runs again
+        self.assertEqual(mock_search.execute.call_count, 3)
+    
+    @patch('elasticsearch_app.search.get_elasticsearch_client')
+    def test_cache_can_be_bypassed(self, mock_get_client):
+        """Test use_cache=False always queries Elasticsearch"""
+        mock_get_client.return_value.msearch.return_value = {'responses': []}
+        service = SearchService(use_cache=False)
+        service.search_all('uncached')
+        service.search_all('uncached')
+        self.assertEqual(mock_get_client.return_value.msearch.call_count, 2)
+
+
+class DeepPaginationTests(TestCase):
+    """Test search_after cursors, point-in-time and log export"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        reset_elasticsearch_client()
+        self.client_mock = MagicMock()
+        self.client_mock.open_point_in_time.return_value = {'id': 'pit-1'}
+        patcher = patch('elasticsearch_app.search.get_elasticsearch_client', return_value=self.client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _response(self, ids, total, pit_id=None):
+        response = {
+            'hits': {
+                'total': {'value': total, 'relation': 'eq'},
+                'hits': [
+                    {'_id': doc_id, '_index': 'django_starter_notes', '_score': 1.0,
+                     '_source': {'title': doc_id}, 'sort': [1.0, doc_id]}
+                    for doc_id in ids
+                ],
+            },
+        }
+        if pit_id:
+            response['pit_id'] = pit_id
+        return response
+    
+    def _body(self, call):
+        # elasticsearch-dsl passes the body as one argument or as named fields
+        return call.kwargs.get('body', call.kwargs)
+    
+    def test_pages_rounds_up(self):
+        """Test pages is the ceiling of total / per_page"""
+        service = SearchService(use_cache=False)
+        for total, pages in ((0, 0), (20, 2), (21, 3)):
+            self.client_mock.search.return_value = self._response([], total)
+            self.assertEqual(service.search_notes('x', per_page=10)['pages'], pages)
+    
+    def test_offset_past_result_window_is_rejected(self):
+        """Test from/size pages past max_result_window ask for a cursor"""
+        from .search import DeepPaginationError
+        
+        with self.settings(ELASTICSEARCH_MAX_RESULT_WINDOW=100):
+            with self.assertRaises(DeepPaginationError):
+                SearchService().search_notes('x', page=11, per_page=10)
+        self.client_mock.search.assert_not_called()
+    
+    def test_cursor_pages_use_point_in_time(self):
+        """Test following next_cursor opens a PIT and continues with search_after"""
+        service = SearchService(use_cache=False)
+        self.client_mock.search.return_value = self._response(['a', 'b'], 3)
+        first = service.search_notes('x', per_page=2)
+        body = self._body(self.client_mock.search.call_args)
+        self.assertEqual(body['sort'], ['_score', {'_id': 'asc'}])
+        self.assertIsNotNone(first['next_cursor'])
+        
+        self.client_mock.search.return_value = self._response(['c'], 3, pit_id='pit-2')
+        second = service.search_notes('x', per_page=2, cursor=first['next_cursor'])
+        
+        self.client_mock.open_point_in_time.assert_called_once()
+        call = self.client_mock.search.call_args
+        body = self._body(call)
+        self.assertIsNone(call.kwargs.get('index'))
+        self.assertEqual(body['pit']['id'], 'pit-1')
+        self.assertEqual(body['search_after'], [1.0, 'b'])
+        # search_after only allows from=0
+        self.assertEqual(body.get('from_', body.get('from', 0)), 0)
+        self.assertEqual([hit['id'] for hit in second['hits']], ['c'])
+        
+        # Last page: no cursor, and the point-in-time is released
+        self.assertIsNone(second['next_cursor'])
+        self.client_mock.close_point_in_time.assert_called_once_with(body={'id': 'pit-2'})
+    
+    def test_expired_or_malformed_cursor(self):
+        """Test bad cursors raise InvalidCursor and the API answers 400"""
+        from elasticsearch import NotFoundError
+        from notes_app.pagination import encode_cursor
+        from .search import InvalidCursor
+        
+        service = SearchService(use_cache=False)
+        self.client_mock.search.side_effect = NotFoundError(404, 'search_context_missing_exception', {})
+        with self.assertRaises(InvalidCursor):
+            service.search_notes('x', cursor=encode_cursor(['pit-old', 1.0, 'a']))
+        with self.assertRaises(InvalidCursor):
+            service.search_notes('x', cursor=encode_cursor(['pit-old']))
+        
+        response = Client().get(reverse('elasticsearch_app:api_search'), {'q': 'x', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_log_export_streams_batches(self):
+        """Test the NDJSON export walks every batch inside one PIT"""
+        import json
+        
+        staff = User.objects.create_user(email='export@example.com', username='exporter', password='pass')
+        staff.is_staff = True
+        staff.save()
+        self.client_mock.search.side_effect = [
+            self._response(['l1', 'l2'], 3, pit_id='pit-1'),
+            self._response(['l3'], 3, pit_id='pit-1'),
+        ]
+        client = Client()
+        client.login(email='export@example.com', password='pass')
+        with patch('elasticsearch_app.search.EXPORT_BATCH_SIZE', 2):
+            response = client.get(reverse('elasticsearch_app:api_logs_export'), {'level': 'ERROR'})
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['l1', 'l2', 'l3'])
+        second_body = self._body(self.client_mock.search.call_args_list[1])
+        self.assertEqual(second_body['search_after'], [1.0, 'l2'])
+        self.client_mock.close_point_in_time.assert_called_once_with(body={'id': 'pit-1'})
+
+
+    def test_logs_are_staff_only(self):
+        """Test log search and export refuse non-staff users and search_all skips logs"""
+        User.objects.create_user(email='member@example.com', username='member', password='pass')
+        client = Client()
+        client.login(email='member@example.com', password='pass')
+        
+        response = client.get(reverse('elasticsearch_app:api_search'), {'q': 'error', 'index': 'logs'})
+        self.assertEqual(response.status_code, 403)
+        response = client.get(reverse('elasticsearch_app:search'), {'q': 'error', 'index': 'logs'})
+        self.assertEqual(response.status_code, 403)
+        response = client.get(reverse('elasticsearch_app:api_logs_export'))
+        self.assertEqual(response.status_code, 403)
+        self.client_mock.search.assert_not_called()
+        
+        self.client_mock.msearch.return_value = {'responses': []}
+        SearchService(use_cache=False).search_all('error')
+        indices = [header['index'] for header in self.client_mock.msearch.call_args.kwargs['body'][::2]]
+        self.assertNotIn([f'{INDEX_PREFIX}_logs-*'], indices)
+
+
 class SearchQueryLoggingTests(TestCase):
     """Tests for search query logging"""
     
+    def setUp(self):
+        reset_search_sink()
+    
     def test_search_query_logging(self):
         """Test that search queries are logged"""
         with patch('elasticsearch_app.views.SearchService') as mock_service_class:
@@ -677,4 +1219,913 @@ class SearchQueryLoggingTests(TestCase):
                 {'q': 'logged query'}
             )
             
+            # Events are buffered and written after the response
+            flush_search_events(force=True)
             self.assertEqual(SearchQuery.objects.count(), initial_count + 1)
+    
+    def test_api_search_is_logged(self):
+        """Test the JSON search API records queries too"""
+        with patch('elasticsearch_app.views.SearchService') as mock_service_class:
+            mock_service_class.return_value.search_notes.return_value = {
+                'hits': [], 'total': 2, 'page': 1, 'per_page': 10, 'pages': 1
+            }
+            Client().get(reverse('elasticsearch_app:api_search'), {'q': 'api query', 'index': 'notes'})
+        
+        flush_search_events(force=True)
+        logged = SearchQuery.objects.get(query='api query')
+        self.assertEqual(logged.index, 'notes')
+        self.assertEqual(logged.results_count, 2)
+    
+    def test_flush_waits_for_batch_or_interval(self):
+        """Test events are written in batches rather than per request"""
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        with self.settings(ELASTICSEARCH_ANALYTICS_FLUSH_BATCH=3, ELASTICSEARCH_ANALYTICS_FLUSH_INTERVAL=3600):
+            for i in range(2):
+                record_search(request, f'batched {i}', 'all', 0, 5)
+            self.assertEqual(flush_search_events(), 0)
+            record_search(request, 'batched 2', 'all', 0, 5)
+            with self.assertNumQueries(1):
+                self.assertEqual(flush_search_events(), 3)
+    
+    def test_sink_degrades_under_pressure(self):
+        """Test full buffers and failed writes drop events with counters"""
+        from django.db import OperationalError
+        
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        with self.settings(ELASTICSEARCH_ANALYTICS_BUFFER_SIZE=2):
+            results = [record_search(request, f'q{i}', 'all', 0, 5) for i in range(3)]
+        self.assertEqual(results, [True, True, False])
+        
+        with patch('elasticsearch_app.analytics.SearchQuery.objects.bulk_create', side_effect=OperationalError('busy')):
+            self.assertEqual(flush_search_events(force=True), 0)
+        
+        stats = get_sink_stats()
+        self.assertEqual(stats['dropped_full'], 1)
+        self.assertEqual(stats['dropped_failed'], 2)
+        self.assertEqual(stats['buffered'], 0)
+        
+        # Backing off: a due flush is skipped until the backoff passes
+        record_search(request, 'after failure', 'all', 0, 5)
+        with self.settings(ELASTICSEARCH_ANALYTICS_FLUSH_BATCH=1):
+            self.assertEqual(flush_search_events(), 0)
+
+
+class SearchAnalyticsRollupTests(TestCase):
+    """Tests for the hourly/daily search analytics rollups"""
+    
+    def _log(self, query, results_count=1, response_time_ms=10, **kwargs):
+        from datetime import timedelta
+        from django.utils import timezone
+        # Older than the rollup lag
+        kwargs.setdefault('created_at', timezone.now() - timedelta(minutes=5))
+        return SearchQuery.objects.create(
+            query=query, results_count=results_count, response_time_ms=response_time_ms, **kwargs
+        )
+    
+    def test_latency_digest_is_mergeable(self):
+        """Test merged digests give the same percentiles as one digest"""
+        from .digest import RELATIVE_ACCURACY, LatencyDigest
+        
+        values = list(range(1, 1001))
+        whole = LatencyDigest()
+        low, high = LatencyDigest(), LatencyDigest()
+        for value in values:
+            whole.add(value)
+            (low if value <= 500 else high).add(value)
+        merged = LatencyDigest.from_dict(low.to_dict()).merge(LatencyDigest.from_dict(high.to_dict()))
+        
+        self.assertEqual(merged.buckets, whole.buckets)
+        self.assertEqual(merged.count, 1000)
+        self.assertLessEqual(abs(merged.quantile(0.99) - 990) / 990, RELATIVE_ACCURACY)
+        self.assertIsNone(LatencyDigest().quantile(0.5))
+    
+    def test_rollup_is_incremental(self):
+        """Test rows are counted once and later rows add to the same buckets"""
+        from .models import SearchLatencyRollup, SearchQueryRollup
+        from .rollups import get_watermark, rollup_search_queries
+        
+        self._log('Django', response_time_ms=20)
+        self._log('django ', results_count=0, response_time_ms=40)
+        self._log('celery')
+        self.assertEqual(rollup_search_queries()['processed'], 3)
+        self.assertEqual(rollup_search_queries()['processed'], 0)
+        
+        latest = self._log('django', response_time_ms=60)
+        result = rollup_search_queries(batch_size=1)
+        self.assertEqual(result['processed'], 1)
+        self.assertEqual(get_watermark(), latest.pk)
+        
+        rollup = SearchQueryRollup.objects.get(period='day', query='django')
+        self.assertEqual((rollup.count, rollup.zero_result_count), (3, 1))
+        self.assertEqual(SearchQueryRollup.objects.get(period='hour', query='django').count, 3)
+        day = SearchLatencyRollup.objects.get(period='day')
+        self.assertEqual((day.count, day.zero_result_count, day.total_response_time_ms), (4, 1, 130))
+        self.assertEqual(sum(day.latency_digest.values()), 4)
+    
+    def test_rollup_waits_for_recent_rows(self):
+        """Test a recent row holds back the watermark for every later id"""
+        from django.utils import timezone
+        from .models import SearchQueryRollup
+        from .rollups import get_watermark, rollup_search_queries
+        
+        settled = self._log('settled')
+        # Its id was taken before the next row's, but it could still commit later
+        recent = self._log('recent', created_at=timezone.now())
+        self._log('later')
+        
+        self.assertEqual(rollup_search_queries(lag=60)['processed'], 1)
+        self.assertEqual(get_watermark(), settled.pk)
+        self.assertFalse(SearchQueryRollup.objects.filter(query='later').exists())
+        
+        self.assertEqual(rollup_search_queries(lag=0)['processed'], 2)
+        self.assertGreater(get_watermark(), recent.pk)
+    
+    def test_analytics_view_reads_rollups(self):
+        """Test the analytics page aggregates rollups, not raw rows"""
+        from .rollups import rollup_search_queries
+        
+        for _ in range(3):
+            self._log('popular', response_time_ms=100)
+        self._log('missing', results_count=0, response_time_ms=300)
+        rollup_search_queries()
+        # Not rolled up yet, so not counted
+        self._log('popular')
+        
+        user = User.objects.create_user(email='rollups@example.com', username='rollups', password='pass')
+        self.client.force_login(user)
+        with patch('elasticsearch_app.views.get_sink_stats', return_value={
+            'flushed': 0, 'buffered': 0, 'dropped_full': 0, 'dropped_failed': 0,
+        }):
+            response = self.client.get(reverse('elasticsearch_app:analytics'))
+        
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        self.assertEqual(context['top_queries'][0], {'query': 'popular', 'count': 3})
+        self.assertEqual(list(context['zero_result_queries']), [{'query': 'missing', 'count': 1}])
+        self.assertEqual(context['total_searches'], 4)
+        self.assertEqual(context['avg_response_time'], 150)
+        self.assertAlmostEqual(context['percentiles']['p50'], 100, delta=2)
+    
+    def test_cleanup_keeps_rows_not_rolled_up(self):
+        """Test raw rows are only pruned once the rollup has seen them"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .rollups import rollup_search_queries
+        from .tasks import cleanup_old_search_queries
+        
+        old = timezone.now() - timedelta(days=10)
+        self._log('rolled up', created_at=old)
+        rollup_search_queries()
+        pending = self._log('pending', created_at=old)
+        
+        result = cleanup_old_search_queries(days=7)
+        self.assertEqual(result['deleted_count'], 1)
+        self.assertEqual(list(SearchQuery.objects.values_list('pk', flat=True)), [pending.pk])
+
+
+class IndexStatusReconcileTests(TestCase):
+    """Tests for the batched sync_index_status reconciler"""
+    
+    def setUp(self):
+        for source_id in range(1, 6):
+            IndexedDocument.objects.create(
+                doc_type='note', source_id=str(source_id), es_id=f'note_{source_id}',
+                es_index=f'{INDEX_PREFIX}_notes', status='indexed',
+            )
+        IndexedDocument.objects.create(
+            doc_type='log', source_id='9', es_id='log_9', es_index=f'{INDEX_PREFIX}_logs', status='indexed',
+        )
+        self.client_mock = MagicMock()
+        self.client_mock.mget.side_effect = self._mget
+    
+    def _mget(self, body, **kwargs):
+        docs = []
+        for doc in body['docs']:
+            if doc['_index'].endswith('_logs'):
+                docs.append({'_index': doc['_index'], '_id': doc['_id'],
+                             'error': {'type': 'index_not_found_exception'}})
+            else:
+                docs.append({'_index': doc['_index'], '_id': doc['_id'], 'found': doc['_id'] not in ('note_2', 'note_4')})
+        return {'docs': docs}
+    
+    def test_checks_in_chunks_and_reports_drift(self):
+        """Test one mget per chunk and bulk status updates"""
+        from .indexing import reconcile_index_status
+        
+        report = reconcile_index_status(client=self.client_mock, chunk_size=4)
+        
+        self.assertEqual(self.client_mock.mget.call_count, 2)
+        self.client_mock.exists.assert_not_called()
+        self.assertEqual(report['checked'], 6)
+        self.assertEqual(report['found'], 3)
+        self.assertEqual(report['missing'], 3)
+        self.assertEqual(report['missing_by_type'], {'note': 2, 'log': 1})
+        self.assertEqual(
+            sorted(IndexedDocument.objects.filter(status='deleted').values_list('es_id', flat=True)),
+            ['log_9', 'note_2', 'note_4'],
+        )
+    
+    def test_reindex_missing_requeues_documents(self):
+        """Test missing indexable documents are queued instead of deleted"""
+        from .indexing import reconcile_index_status
+        
+        with patch('elasticsearch_app.tasks.process_index_batch.delay') as mock_delay:
+            report = reconcile_index_status(client=self.client_mock, reindex_missing=True)
+        
+        mock_delay.assert_called_once_with({'note': ['2', '4']})
+        self.assertEqual(report['requeued'], 2)
+        self.assertEqual(
+            sorted(IndexedDocument.objects.filter(status='pending').values_list('source_id', flat=True)),
+            ['2', '4'],
+        )
+        # Log documents cannot be rebuilt from the database
+        self.assertEqual(IndexedDocument.objects.get(doc_type='log').status, 'deleted')
+    
+    @patch('elasticsearch_app.client.Elasticsearch')
+    def test_sync_index_status_task(self, mock_es_class):
+        """Test the task returns the drift report"""
+        from .client import reset_elasticsearch_client
+        from .tasks import sync_index_status
+        
+        reset_elasticsearch_client()
+        mock_es_class.return_value = self.client_mock
+        
+        result = sync_index_status()
+        
+        self.assertTrue(result['success'])
+        self.assertEqual(result['missing'], 3)
+
+
+class SuggestionTests(TestCase):
+    """Tests for completion mappings and the suggestion trie"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from .suggestions import reset_suggestion_trie
+        cache.clear()
+        reset_suggestion_trie()
+        reset_elasticsearch_client()
+    
+    def _popular(self, query, count, zero=0):
+        from django.utils import timezone
+        from .models import SearchQueryRollup
+        from .rollups import bucket_start
+        SearchQueryRollup.objects.create(
+            period='day', bucket_start=bucket_start(timezone.now(), 'day'),
+            query=query, count=count, zero_result_count=zero,
+        )
+    
+    def test_documents_define_completion_subfields(self):
+        """Test the fields suggest() targets exist in the mappings"""
+        from .documents import NoteDocument, SearchableDocument, UserDocument
+        
+        for document, field in ((NoteDocument, 'title'), (SearchableDocument, 'title'), (UserDocument, 'username')):
+            mapping = document._doc_type.mapping.to_dict()['properties'][field]
+            self.assertEqual(mapping['fields']['suggest'], {'type': 'completion'})
+    
+    def test_prefix_trie_ranks_by_weight(self):
+        """Test completions come back heaviest first"""
+        from .suggestions import PrefixTrie
+        
+        trie = PrefixTrie([('django tips', 5), ('Django ORM', 9), ('docker', 7)])
+        self.assertEqual(trie.suggest('Dj'), ['django orm', 'django tips'])
+        self.assertEqual(trie.suggest('d', limit=2), ['django orm', 'docker'])
+        self.assertEqual(trie.suggest('x'), [])
+    
+    @patch('elasticsearch_app.search.get_elasticsearch_client')
+    def test_popular_prefix_served_from_trie(self, mock_get_client):
+        """Test popular searches never reach Elasticsearch"""
+        self._popular('python celery', 10)
+        self._popular('python dead end', 10, zero=10)
+        
+        with patch('elasticsearch_app.search.Search') as mock_search_class:
+            suggestions = SearchService().suggest('pyth')
+        
+        self.assertEqual(suggestions, ['python celery'])
+        mock_search_class.assert_not_called()
+    
+    @patch('elasticsearch_app.search.get_elasticsearch_client')
+    def test_unknown_prefix_falls_back_to_completion_suggester(self, mock_get_client):
+        """Test the completion suggester runs against indices with the subfield"""
+        from .documents import SUGGEST_FIELDS
+        
+        with patch('elasticsearch_app.search.Search') as mock_search_class:
+            mock_search = MagicMock()
+            mock_search.params.return_value = mock_search
+            mock_search.suggest.return_value = mock_search
+            option = MagicMock(text='Rare Title')
+            response = MagicMock()
+            response.suggest = MagicMock(**{'__contains__.return_value': True})
+            response.suggest.suggestions = [MagicMock(options=[option])]
+            mock_search.execute.return_value = response
+            mock_search_class.return_value = mock_search
+            
+            suggestions = SearchService().suggest('rare')
+        
+        self.assertEqual(suggestions, ['Rare Title'])
+        self.assertEqual(mock_search_class.call_args.kwargs['index'], SUGGEST_FIELDS['title'])
+        completion = mock_search.suggest.call_args.kwargs['completion']
+        self.assertEqual(completion['field'], 'title.suggest')
+    
+    def test_benchmark_suggest_command(self):
+        """Test the benchmark reports latency for the suggest endpoint"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        self._popular('notes app', 4)
+        out = StringIO()
+        call_command('benchmark_suggest', requests=5, prefixes=['no'], stdout=out)
+        
+        output = out.getvalue()
+        self.assertIn('/elasticsearch/api/suggest/', output)
+        self.assertIn('answers 1/1 prefixes', output)
+        self.assertIn('5 requests, 0 errors', output)
+
+
+class FederatedSearchTests(TestCase):
+    """Tests for search_all blending per-index msearch results"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        reset_elasticsearch_client()
+        self.client_mock = MagicMock()
+        patcher = patch('elasticsearch_app.search.get_elasticsearch_client', return_value=self.client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _responses(self, *per_index):
+        """One msearch response per FEDERATED_SOURCES entry from (id, score) lists"""
+        from .search import FEDERATED_SOURCES
+        responses = []
+        for (index, _, _), hits in zip(FEDERATED_SOURCES, per_index):
+            responses.append({'hits': {
+                'total': {'value': len(hits), 'relation': 'eq'},
+                'max_score': max((score for _, score in hits), default=None),
+                'hits': [{'_id': doc_id, '_index': index, '_score': score, '_source': {}} for doc_id, score in hits],
+            }})
+        return {'responses': responses}
+    
+    def test_scores_are_normalized_per_index(self):
+        """Test a low-scoring index still places its best hit at the top"""
+        self.client_mock.msearch.return_value = self._responses(
+            [],
+            [('note-1', 24.0), ('note-2', 12.0)],
+            [('user-1', 2.0), ('user-2', 0.5)],
+            [],
+        )
+        
+        results = SearchService().search_all('alice', per_page=3)
+        
+        self.assertEqual([hit['id'] for hit in results['hits']], ['note-1', 'user-1', 'note-2'])
+        self.assertEqual([hit['score'] for hit in results['hits']], [1.0, 1.0, 0.5])
+        self.assertEqual(results['hits'][1]['raw_score'], 2.0)
+        self.assertEqual(results['total'], 4)
+        # Top-k from each index: enough hits for the page from any one of them
+        body = self.client_mock.msearch.call_args.kwargs['body']
+        self.assertTrue(all(query['size'] == 3 for query in body[1::2]))
+    
+    def test_cursor_continues_from_per_index_offsets(self):
+        """Test next_cursor resumes each index where the merged page stopped"""
+        self.client_mock.msearch.return_value = self._responses(
+            [], [('note-1', 10.0), ('note-2', 9.0)], [('user-1', 1.0), ('user-2', 0.2)], [],
+        )
+        service = SearchService(use_cache=False)
+        first = service.search_all('alice', per_page=2)
+        self.assertEqual([hit['id'] for hit in first['hits']], ['note-1', 'user-1'])
+        
+        self.client_mock.msearch.return_value = self._responses([], [('note-2', 9.0)], [('user-2', 0.2)], [])
+        second = service.search_all('alice', per_page=2, cursor=first['next_cursor'])
+        
+        body = self.client_mock.msearch.call_args.kwargs['body']
+        self.assertEqual([query.get('from', 0) for query in body[1::2]], [0, 1, 1])
+        # Normalized against the first page's top scores
+        self.assertEqual([hit['score'] for hit in second['hits']], [0.9, 0.2])
+    
+    def test_failed_index_search_is_skipped(self):
+        """Test one index erroring does not fail the whole search"""
+        responses = self._responses([], [('note-1', 3.0)], [])
+        responses['responses'][0] = {'error': {'type': 'index_not_found_exception'}, 'status': 404}
+        self.client_mock.msearch.return_value = responses
+        
+        results = SearchService().search_all('alice')
+        
+        self.assertEqual([hit['id'] for hit in results['hits']], ['note-1'])
+
+
+class ResilientClientTests(TestCase):
+    """Tests for per-operation timeouts and the circuit breaker"""
+    
+    def setUp(self):
+        reset_elasticsearch_client()
+        self.addCleanup(reset_elasticsearch_client)
+    
+    def _transport(self):
+        from .client import ResilientTransport
+        return ResilientTransport([{'host': 'localhost'}])
+    
+    def test_timeouts_depend_on_the_operation(self):
+        """Test searches get the short timeout and bulk loads the long one"""
+        from elasticsearch import Transport
+        
+        transport = self._transport()
+        with self.settings(ELASTICSEARCH_SEARCH_TIMEOUT=3, ELASTICSEARCH_INDEXING_TIMEOUT=300), \
+                patch.object(Transport, 'perform_request', return_value={}) as mock_request:
+            transport.perform_request('POST', '/django_starter_notes/_search')
+            transport.perform_request('POST', '/_bulk')
+            transport.perform_request('GET', '/_cluster/health', params={'request_timeout': 1})
+        
+        timeouts = [call.kwargs['params']['request_timeout'] for call in mock_request.call_args_list]
+        self.assertEqual(timeouts, [3, 300, 1])
+    
+    def test_breaker_opens_fails_fast_and_recovers(self):
+        """Test closed -> open -> half-open -> closed"""
+        from elasticsearch import ConnectionTimeout, NotFoundError, Transport
+        from .client import CircuitOpenError, get_circuit_breaker
+        
+        transport = self._transport()
+        with self.settings(ELASTICSEARCH_BREAKER_FAILURES=2, ELASTICSEARCH_BREAKER_RESET=30):
+            breaker = get_circuit_breaker()
+            with patch.object(Transport, 'perform_request', side_effect=NotFoundError(404, 'missing')):
+                with self.assertRaises(NotFoundError):
+                    transport.perform_request('GET', '/x/_doc/1')
+            self.assertEqual(breaker.state, 'closed')
+            
+            with patch.object(Transport, 'perform_request', side_effect=ConnectionTimeout('TIMEOUT', 'slow', None)) as mock_request:
+                for _ in range(2):
+                    with self.assertRaises(ConnectionTimeout):
+                        transport.perform_request('POST', '/_search')
+                with self.assertRaises(CircuitOpenError):
+                    transport.perform_request('POST', '/_search')
+                self.assertEqual(mock_request.call_count, 2)
+            self.assertEqual(breaker.snapshot()['state'], 'open')
+            
+            # After the reset timeout one trial request goes through
+            breaker._opened_at -= 30
+            self.assertEqual(breaker.state, 'half_open')
+            with patch.object(Transport, 'perform_request', return_value={}):
+                transport.perform_request('POST', '/_search')
+            self.assertEqual(breaker.state, 'closed')
+    
+    def test_interrupted_or_stuck_trial_does_not_wedge_breaker(self):
+        """Test a trial ending in a non-transport error, or never ending, frees the probe"""
+        from elasticsearch import SerializationError, Transport
+        from .client import CircuitOpenError, get_circuit_breaker
+        
+        transport = self._transport()
+        with self.settings(ELASTICSEARCH_BREAKER_FAILURES=1, ELASTICSEARCH_BREAKER_RESET=30, ELASTICSEARCH_SEARCH_TIMEOUT=5):
+            breaker = get_circuit_breaker()
+            breaker.record_failure()
+            breaker._opened_at -= 30
+            
+            with patch.object(Transport, 'perform_request', side_effect=SerializationError('bad body')):
+                with self.assertRaises(SerializationError):
+                    transport.perform_request('POST', '/_search')
+            with patch.object(Transport, 'perform_request', return_value={}):
+                transport.perform_request('POST', '/_search')
+            self.assertEqual(breaker.state, 'closed')
+            
+            # A trial still in flight blocks others only until its timeout passes
+            breaker.record_failure()
+            breaker._opened_at -= 30
+            breaker.before_request(timeout=5)
+            with self.assertRaises(CircuitOpenError):
+                breaker.before_request()
+            breaker._probe_deadline -= 60
+            breaker.before_request()
+            self.assertTrue(breaker._probing)
+    
+    @patch('elasticsearch_app.client.Elasticsearch')
+    def test_connection_check_is_cached_and_time_boxed(self, mock_es_class):
+        """Test the info() call is bounded and its answer reused"""
+        mock_es_class.return_value.info.return_value = {
+            'cluster_name': 'c', 'version': {'number': '7.17.0'}, 'tagline': 't',
+        }
+        with self.settings(ELASTICSEARCH_HEALTH_TIMEOUT=2):
+            self.assertTrue(check_elasticsearch_connection()['connected'])
+            self.assertTrue(check_elasticsearch_connection()['connected'])
+        
+        mock_es_class.return_value.info.assert_called_once_with(request_timeout=2)
+        self.assertEqual(mock_es_class.call_args.kwargs['maxsize'], 25)
+    
+    def test_dashboard_renders_degraded_state(self):
+        """Test an open breaker skips cluster calls and shows a warning"""
+        from .client import get_circuit_breaker
+        
+        breaker = get_circuit_breaker()
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        
+        user = User.objects.create_user(email='breaker@example.com', username='breaker', password='pass')
+        self.client.force_login(user)
+        with patch('elasticsearch_app.views.check_elasticsearch_connection', return_value={'connected': True}), \
+                patch('elasticsearch_app.views.get_cluster_health') as mock_health:
+            response = self.client.get(reverse('elasticsearch_app:dashboard'))
+        
+        self.assertContains(response, 'Degraded')
+        mock_health.assert_not_called()
+    
+    def test_search_api_returns_503_while_open(self):
+        """Test the search API fails fast with 503 while the breaker is open"""
+        from .client import CircuitOpenError
+        
+        with patch('elasticsearch_app.views.SearchService') as mock_service_class:
+            mock_service_class.return_value.search_all.side_effect = CircuitOpenError('N/A', 'open', None)
+            response = Client().get(reverse('elasticsearch_app:api_search'), {'q': 'x'})
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'open')
+
+
+class AsyncSearchTests(TestCase):
+    """Tests for AsyncSearchService and the async views"""
+    
+    def setUp(self):
+        from unittest.mock import AsyncMock
+        from django.core.cache import cache
+        cache.clear()
+        reset_search_sink()
+        self.addCleanup(reset_search_sink)
+        self.client_mock = AsyncMock()
+    
+    def _response(self, ids):
+        return {'hits': {
+            'total': {'value': len(ids), 'relation': 'eq'},
+            'max_score': 1.0,
+            'hits': [
+                {'_id': doc_id, '_index': f'{INDEX_PREFIX}_notes', '_score': 1.0, '_source': {'title': doc_id}}
+                for doc_id in ids
+            ],
+        }}
+    
+    def test_search_notes_matches_sync_service(self):
+        """Test the async search sends the sync service's query and shares its cache"""
+        from asgiref.sync import async_to_sync
+        from .async_search import AsyncSearchService
+        
+        self.client_mock.search.return_value = self._response(['n1', 'n2'])
+        results = async_to_sync(AsyncSearchService(client=self.client_mock).search_notes)('Django', page=2, per_page=2)
+        
+        self.assertEqual([hit['id'] for hit in results['hits']], ['n1', 'n2'])
+        call = self.client_mock.search.call_args
+        self.assertEqual(call.kwargs['index'], [f'{INDEX_PREFIX}_notes'])
+        self.assertEqual((call.kwargs['body']['from'], call.kwargs['body']['size']), (2, 2))
+        self.assertTrue(call.kwargs['ignore_unavailable'])
+        
+        # Same cache key as SearchService: the sync path is served from it
+        sync_client = MagicMock()
+        with patch('elasticsearch_app.search.get_elasticsearch_client', return_value=sync_client):
+            self.assertEqual(SearchService().search_notes('django', page=2, per_page=2), results)
+        sync_client.search.assert_not_called()
+    
+    def test_search_all_uses_one_msearch(self):
+        """Test federated search blends the async msearch responses"""
+        from asgiref.sync import async_to_sync
+        from .async_search import AsyncSearchService
+        
+        error = {'error': {'type': 'index_not_found_exception'}, 'status': 404}
+        self.client_mock.msearch.return_value = {
+            'responses': [error, self._response(['n1']), self._response([])],
+        }
+        results = async_to_sync(AsyncSearchService(client=self.client_mock, use_cache=False).search_all)('django')
+        
+        self.assertEqual([hit['id'] for hit in results['hits']], ['n1'])
+        self.assertEqual(results['total'], 1)
+        self.client_mock.msearch.assert_awaited_once()
+    
+    def test_suggest_falls_back_to_completion_suggester(self):
+        """Test prefixes missing from the trie go to the completion suggester"""
+        from asgiref.sync import async_to_sync
+        from .async_search import AsyncSearchService
+        from .suggestions import reset_suggestion_trie
+        
+        reset_suggestion_trie()
+        self.addCleanup(reset_suggestion_trie)
+        self.client_mock.search.return_value = {
+            'hits': {'total': {'value': 0, 'relation': 'eq'}, 'hits': []},
+            'suggest': {'suggestions': [{'text': 'dj', 'offset': 0, 'length': 2, 'options': [{'text': 'Django'}]}]},
+        }
+        suggestions = async_to_sync(AsyncSearchService(client=self.client_mock).suggest)('dj')
+        
+        self.assertEqual(suggestions, ['Django'])
+        body = self.client_mock.search.call_args.kwargs['body']
+        self.assertEqual(body['suggest']['suggestions']['completion']['field'], 'title.suggest')
+    
+    async def test_async_api_flushes_analytics_and_records_search(self):
+        """Test the async API searches, flushes buffered analytics and records the search"""
+        from unittest.mock import AsyncMock
+        
+        with patch('elasticsearch_app.views.AsyncSearchService') as mock_service_class, \
+                patch('elasticsearch_app.views.flush_search_events') as mock_flush:
+            mock_service_class.return_value.search_notes = AsyncMock(return_value={'hits': [], 'total': 3})
+            response = await self.async_client.get(
+                reverse('elasticsearch_app:api_search_async'), {'q': 'django', 'index': 'notes'}
+            )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 3)
+        mock_flush.assert_called_once_with()
+        self.assertEqual(get_sink_stats()['recorded'], 1)
+    
+    async def test_async_log_search_is_staff_only(self):
+        """Test the async search views refuse log searches from non-staff users"""
+        with patch('elasticsearch_app.views.AsyncSearchService') as mock_service_class:
+            response = await self.async_client.get(
+                reverse('elasticsearch_app:api_search_async'), {'q': 'error', 'index': 'logs'}
+            )
+            self.assertEqual(response.status_code, 403)
+            response = await self.async_client.get(
+                reverse('elasticsearch_app:search_async'), {'q': 'error', 'index': 'logs'}
+            )
+            self.assertEqual(response.status_code, 403)
+        mock_service_class.assert_not_called()
+    
+    async def test_async_api_without_aiohttp_returns_503(self):
+        """Test the async API answers 503 when the async client is unavailable"""
+        with patch('elasticsearch_app.async_search.AsyncElasticsearch', None):
+            response = await self.async_client.get(reverse('elasticsearch_app:api_search_async'), {'q': 'x'})
+        
+        self.assertEqual(response.status_code, 503)
+    
+    def test_loadtest_runs_against_stub(self):
+        """Test the load test drives the sync path against its stub server"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        out = StringIO()
+        call_command('loadtest_search', '--path', 'sync', '--requests', '4', '--concurrency', '2',
+                     '--delay-ms', '1', stdout=out)
+        
+        self.assertIn('searches/s', out.getvalue())
+    
+    def test_loadtest_compares_async_path(self):
+        """Test the load test reports both paths when aiohttp is installed"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .async_search import async_search_available
+        
+        if not async_search_available():
+            self.skipTest('aiohttp is not installed')
+        out = StringIO()
+        call_command('loadtest_search', '--requests', '4', '--concurrency', '2', '--delay-ms', '1', stdout=out)
+        
+        self.assertIn('async', out.getvalue())
+
+
+class LogShippingTests(TestCase):
+    """Tests for the queued Elasticsearch log handler"""
+    
+    def setUp(self):
+        import logging
+        from .log_handlers import ElasticsearchLogHandler
+        self.handler = ElasticsearchLogHandler(queue_size=100, batch_size=10, flush_interval=0.05)
+        self.logger = logging.getLogger('elasticsearch_app.tests.shipping')
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.addCleanup(self.logger.removeHandler, self.handler)
+        self.addCleanup(self.handler.close)
+        shipping = self.settings(ELASTICSEARCH_LOG_SHIPPING=True)
+        shipping.enable()
+        self.addCleanup(shipping.disable)
+    
+    def test_records_are_bulk_shipped_to_daily_index(self):
+        """Test the shipping thread bulk-writes records to today's index"""
+        import time
+        
+        shipped = []
+        
+        def fake_bulk(client, actions, **kwargs):
+            shipped.extend(actions)
+            return len(actions), 0
+        
+        with patch('elasticsearch.helpers.bulk', side_effect=fake_bulk), \
+                patch('elasticsearch_app.client.get_elasticsearch_client'):
+            self.logger.warning('disk %s', 'full')
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                self.logger.exception('failed')
+            deadline = time.monotonic() + 5
+            while self.handler.stats()['shipped'] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        
+        self.assertEqual([action['_source']['message'] for action in shipped], ['disk full', 'failed'])
+        today = time.strftime('%Y.%m.%d', time.gmtime())
+        self.assertEqual({action['_index'] for action in shipped}, {f'{INDEX_PREFIX}_logs-{today}'})
+        self.assertIn('ValueError: boom', shipped[1]['_source']['exception'])
+        self.assertEqual(shipped[0]['_source']['level'], 'WARNING')
+    
+    def test_full_queue_drops_and_counts(self):
+        """Test records past the queue bound are dropped, not blocked on"""
+        from .log_handlers import ElasticsearchLogHandler
+        
+        handler = ElasticsearchLogHandler(queue_size=2)
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+        with patch.object(handler, '_ensure_worker'):
+            for i in range(5):
+                self.logger.error('record %d', i)
+        
+        stats = handler.stats()
+        self.assertEqual((stats['queued'], stats['dropped_full'], stats['waiting']), (2, 3, 2))
+    
+    def test_failed_bulk_drops_batch(self):
+        """Test a failed bulk request counts its batch as dropped"""
+        with patch('elasticsearch.helpers.bulk', side_effect=ConnectionError('down')), \
+                patch('elasticsearch_app.client.get_elasticsearch_client'):
+            self.assertEqual(self.handler.ship([{'_index': 'x', '_source': {}}] * 3), 0)
+        
+        self.assertEqual(self.handler.stats()['dropped_failed'], 3)
+    
+    def test_client_records_are_not_shipped(self):
+        """Test the Elasticsearch client's own logs never reach the queue"""
+        import logging
+        
+        client_logger = logging.getLogger('elasticsearch')
+        client_logger.addHandler(self.handler)
+        self.addCleanup(client_logger.removeHandler, self.handler)
+        client_logger.warning('POST /_bulk [status:N/A]')
+        
+        self.assertEqual(self.handler.stats()['queued'], 0)
+    
+    def test_request_context_is_attached(self):
+        """Test records logged during a request carry its path, method, user and IP"""
+        from django.http import HttpResponse
+        from .log_handlers import RequestLogContextMiddleware
+        
+        user = User.objects.create_user(email='logs@example.com', username='logs', password='pass')
+        
+        def view(request):
+            self.logger.warning('inside')
+            return HttpResponse()
+        
+        request = RequestFactory().post('/notes/create/', REMOTE_ADDR='10.0.0.7')
+        request._cached_user = user
+        with patch.object(self.handler, '_ensure_worker'):
+            RequestLogContextMiddleware(view)(request)
+            self.logger.warning('outside')
+        
+        inside = self.handler.queue.get_nowait()['_source']
+        outside = self.handler.queue.get_nowait()['_source']
+        self.assertEqual(
+            (inside['request_path'], inside['request_method'], inside['user_id'], inside['ip_address']),
+            ('/notes/create/', 'POST', user.pk, '10.0.0.7'),
+        )
+        self.assertNotIn('request_path', outside)
+    
+    def test_retention_deletes_expired_daily_indices(self):
+        """Test only daily indices older than the retention are deleted"""
+        from datetime import date
+        from .log_handlers import delete_expired_log_indices
+        
+        client = MagicMock()
+        client.indices.get.return_value = {
+            f'{INDEX_PREFIX}_logs-2026.10.01': {},
+            f'{INDEX_PREFIX}_logs-2026.10.05': {},
+            f'{INDEX_PREFIX}_logs-2026.10.19': {},
+            f'{INDEX_PREFIX}_logs-archive': {},
+        }
+        
+        deleted = delete_expired_log_indices(days=14, client=client, today=date(2026, 10, 19))
+        
+        self.assertEqual(deleted, [f'{INDEX_PREFIX}_logs-2026.10.01'])
+        client.indices.delete.assert_called_once_with(index=f'{INDEX_PREFIX}_logs-2026.10.01', ignore=[404])
+    
+    def test_log_searches_cover_daily_indices(self):
+        """Test log search and the index template use the daily index pattern"""
+        from .documents import LOG_INDEX_PATTERN, create_all_indices
+        from .search import SearchService
+        
+        client = MagicMock()
+        client.search.return_value = {'hits': {'total': {'value': 0, 'relation': 'eq'}, 'hits': []}}
+        with patch('elasticsearch_app.search.get_elasticsearch_client', return_value=client):
+            SearchService().search_logs('error')
+        self.assertEqual(client.search.call_args.kwargs['index'], [LOG_INDEX_PATTERN])
+        
+        with patch('elasticsearch_app.client.get_elasticsearch_client', return_value=client), \
+                patch('elasticsearch_app.versioning.ensure_alias'), \
+                patch('elasticsearch_app.documents.SearchableDocument.init'):
+            create_all_indices()
+        template = client.indices.put_template.call_args.kwargs
+        self.assertEqual(template['body']['index_patterns'], [LOG_INDEX_PATTERN])
+
+
+class SynonymSearchStandIn:
+    """
+    Local stand-in for a node using the synonym analyzer: reads the
+    synonyms file on reload_search_analyzers and expands query terms.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.rules = []
+        self.indices = MagicMock()
+        self.indices.reload_search_analyzers.side_effect = self._reload
+    
+    def _reload(self, index, **params):
+        with open(self.path, encoding='utf-8') as synonyms_file:
+            self.rules = [[term.strip() for term in line.split(',')] for line in synonyms_file if line.strip()]
+        return {'reload_details': [
+            {'index': f'{name}_v1', 'reloaded_analyzers': ['search_synonyms']} for name in index.split(',')
+        ]}
+    
+    def search(self, documents, query):
+        terms = set(query.lower().split())
+        for rule in self.rules:
+            if terms & set(rule):
+                terms.update(rule)
+        return [doc for doc in documents if terms & set(doc.lower().split())]
+
+
+class SearchSynonymSyncTests(TestCase):
+    """Tests for compiling SearchSynonym rows into the reloadable synonym analyzer"""
+    
+    def setUp(self):
+        import tempfile
+        from django.core.cache import cache
+        cache.clear()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = f'{tmp_dir.name}/analysis/synonyms.txt'
+        synonyms_file = self.settings(ELASTICSEARCH_SYNONYMS_FILE=self.path)
+        synonyms_file.enable()
+        self.addCleanup(synonyms_file.disable)
+    
+    def test_compile_synonyms(self):
+        """Test active rows become sorted, cleaned Solr-format lines"""
+        from .synonyms import compile_synonyms
+        
+        SearchSynonym.objects.create(term='TV', synonyms='television, telly')
+        SearchSynonym.objects.create(term='Laptop', synonyms='notebook,  Laptop , portable # pc')
+        SearchSynonym.objects.create(term='car', synonyms='automobile', is_active=False)
+        SearchSynonym.objects.create(term='alone', synonyms='')
+        
+        self.assertEqual(
+            compile_synonyms(),
+            'laptop, notebook, portable pc\ntv, television, telly\n',
+        )
+    
+    def test_sync_reloads_analyzers_without_reindex(self):
+        """Test a new synonym reaches searches through a reload alone"""
+        from .synonyms import sync_synonyms
+        
+        stand_in = SynonymSearchStandIn(self.path)
+        documents = ['Notebook buying guide', 'Desk setup']
+        sync_synonyms(client=stand_in)
+        self.assertEqual(stand_in.search(documents, 'laptop'), [])
+        
+        SearchSynonym.objects.create(term='laptop', synonyms='notebook')
+        result = sync_synonyms(client=stand_in)
+        
+        self.assertEqual(stand_in.search(documents, 'laptop'), ['Notebook buying guide'])
+        self.assertEqual(result['rules'], 1)
+        self.assertEqual(result['reloaded'], [f'{INDEX_PREFIX}_documents_v1', f'{INDEX_PREFIX}_notes_v1'])
+        
+        # Unchanged rules do not reload again
+        stand_in.indices.reload_search_analyzers.reset_mock()
+        self.assertFalse(sync_synonyms(client=stand_in)['changed'])
+        stand_in.indices.reload_search_analyzers.assert_not_called()
+    
+    def test_sync_requires_synonyms_file(self):
+        """Test syncing reports the missing setting instead of failing"""
+        from .synonyms import sync_synonyms
+        
+        with self.settings(ELASTICSEARCH_SYNONYMS_FILE=''):
+            self.assertFalse(sync_synonyms(client=MagicMock())['success'])
+    
+    def test_changes_queue_one_debounced_sync(self):
+        """Test a burst of synonym changes queues a single delayed sync"""
+        from django.core.cache import cache
+        from .synonyms import SYNC_PENDING_KEY
+        from .tasks import sync_search_synonyms
+        
+        with patch('elasticsearch_app.tasks.sync_search_synonyms.apply_async') as mock_apply, \
+                self.settings(ELASTICSEARCH_SYNONYMS_DEBOUNCE=5):
+            with self.captureOnCommitCallbacks(execute=True):
+                synonym = SearchSynonym.objects.create(term='laptop', synonyms='notebook')
+            with self.captureOnCommitCallbacks(execute=True):
+                synonym.synonyms = 'notebook, ultrabook'
+                synonym.save()
+                SearchSynonym.objects.create(term='tv', synonyms='television')
+        
+        mock_apply.assert_called_once_with(countdown=5)
+        
+        # The task clears the marker so the next change queues again
+        with patch('elasticsearch_app.synonyms.reload_search_analyzers', return_value=[]):
+            result = sync_search_synonyms()
+        self.assertIsNone(cache.get(SYNC_PENDING_KEY))
+        self.assertEqual(result['rules'], 2)
+    
+    def test_search_analyzer_is_updateable(self):
+        """Test the synonym filter can be reloaded in place"""
+        from .documents import synonym_search_analyzer
+        
+        definition = synonym_search_analyzer('analysis/synonyms.txt').get_analysis_definition()
+        
+        graph = definition['filter']['search_synonym_graph']
+        self.assertEqual(graph['type'], 'synonym_graph')
+        self.assertTrue(graph['updateable'])
+        self.assertEqual(graph['synonyms_path'], 'analysis/synonyms.txt')
+        self.assertEqual(definition['analyzer']['search_synonyms']['filter'], ['lowercase', 'search_synonym_graph'])
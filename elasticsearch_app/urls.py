@@ -19,6 +19,13 @@ urlpatterns = [
     path('api/suggest/', views.SuggestAPIView.as_view(), name='api_suggest'),
     path('api/health/', views.ClusterHealthAPIView.as_view(), name='api_health'),
     path('api/indices/', views.IndicesAPIView.as_view(), name='api_indices'),
+    path('api/search-cache/', views.SearchCacheStatsAPIView.as_view(), name='api_search_cache'),
+    path('api/logs/export/', views.LogExportView.as_view(), name='api_logs_export'),
+    
+    # Async variants for ASGI deployments
+    path('search/async/', views.AsyncSearchView.as_view(), name='search_async'),
+    path('api/search/async/', views.AsyncSearchAPIView.as_view(), name='api_search_async'),
+    path('api/suggest/async/', views.AsyncSuggestAPIView.as_view(), name='api_suggest_async'),
     
     # Management
     path('manage/', views.IndexManagementView.as_view(), name='manage'),
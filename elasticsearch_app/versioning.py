@@ -0,0 +1,244 @@
+"""
+Elasticsearch Index Versioning
+
+Searchable indices live behind aliases. Each alias (``{INDEX_PREFIX}_notes``,
+``{INDEX_PREFIX}_users``) points at one concrete ``{alias}_v{N}`` index, so a
+mapping change is rolled out by building the next version next to the live
+one and swapping the alias in a single atomic ``update_aliases`` call:
+
+1. create ``{alias}_v{N+1}`` with refresh disabled and no replicas
+2. bulk-load it from the database
+3. restore the index settings, refresh and force-merge
+4. delete documents whose rows were deleted while the build ran
+5. move the alias, then re-send rows changed while the build ran and
+   replay deletions made since step 4
+
+Previous versions are kept (ELASTICSEARCH_INDEX_VERSIONS_TO_KEEP) so the
+alias can be rolled back without a rebuild.
+"""
+import re
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import bump_generation
+from .client import get_elasticsearch_client
+from .documents import NoteDocument, UserDocument
+from .indexing import DEFAULT_CHUNK_SIZE, INDEXABLE_TYPES, bulk_index, delete_documents
+
+# Document types served through a versioned alias
+VERSIONED_DOCUMENTS = {
+    'note': NoteDocument,
+    'user': UserDocument,
+}
+
+# Applied while a new version is bulk-loaded
+BULK_LOAD_SETTINGS = {'refresh_interval': '-1', 'number_of_replicas': 0}
+
+
+class IndexVersionError(Exception):
+    """Raised when an alias cannot be moved"""
+
+
+def get_versions_to_keep():
+    return getattr(settings, 'ELASTICSEARCH_INDEX_VERSIONS_TO_KEEP', 2)
+
+
+def alias_name(doc_type):
+    return VERSIONED_DOCUMENTS[doc_type]._index._name
+
+
+def version_name(alias, version):
+    return f'{alias}_v{version}'
+
+
+def list_versions(client, alias):
+    """Version numbers of the concrete indices behind an alias, oldest first."""
+    pattern = re.compile(rf'^{re.escape(alias)}_v(\d+)$')
+    indices = client.indices.get(index=f'{alias}_v*', allow_no_indices=True, ignore=[404])
+    versions = []
+    for name in indices or {}:
+        match = pattern.match(name)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def current_indices(client, alias):
+    """Concrete indices the alias currently points at."""
+    response = client.indices.get_alias(name=alias, ignore=[404])
+    return sorted(name for name in response or {} if name != 'error' and name != 'status')
+
+
+def _index_body(doc_type, overrides=None):
+    body = VERSIONED_DOCUMENTS[doc_type]._index.to_dict()
+    body['settings'] = {**body.get('settings', {}), **(overrides or {})}
+    return body
+
+
+def create_version(doc_type, client=None, bulk_load=False):
+    """
+    Create the next ``{alias}_v{N}`` index for a document type.
+
+    Returns:
+        str: Name of the new index
+    """
+    from .synonyms import write_synonyms_file
+
+    client = client or get_elasticsearch_client()
+    alias = alias_name(doc_type)
+    versions = list_versions(client, alias)
+    name = version_name(alias, (versions[-1] if versions else 0) + 1)
+    # The synonym analyzer's file has to exist before the index is created
+    write_synonyms_file()
+    client.indices.create(
+        index=name,
+        body=_index_body(doc_type, BULK_LOAD_SETTINGS if bulk_load else None),
+    )
+    return name
+
+
+def swap_alias(client, alias, index):
+    """
+    Point the alias at ``index`` and nothing else in one atomic call.
+
+    A concrete index still using the alias name (from before versioning)
+    is removed in the same call, since the alias cannot be added while it
+    exists.
+    """
+    actions = [{'remove': {'index': name, 'alias': alias}}
+               for name in current_indices(client, alias) if name != index]
+    if client.indices.exists(index=alias) and not client.indices.exists_alias(name=alias):
+        actions.append({'remove_index': {'index': alias}})
+    actions.append({'add': {'index': index, 'alias': alias}})
+    client.indices.update_aliases(body={'actions': actions})
+    bump_generation(alias)
+
+
+def prune_versions(client, alias, keep=None):
+    """Delete the oldest versions not served by the alias, keeping ``keep`` in total."""
+    keep = get_versions_to_keep() if keep is None else keep
+    live = set(current_indices(client, alias))
+    names = [version_name(alias, version) for version in list_versions(client, alias)]
+    removable = [name for name in names[:max(len(names) - keep, 0)] if name not in live]
+    for name in removable:
+        client.indices.delete(index=name, ignore=[404])
+    return removable
+
+
+def ensure_alias(doc_type, client=None):
+    """
+    Create ``{alias}_v1`` and its alias when the document type has no index.
+
+    An existing concrete index with the alias name is left serving
+    searches until the first rebuild replaces it.
+    """
+    client = client or get_elasticsearch_client()
+    alias = alias_name(doc_type)
+    if client.indices.exists(index=alias):
+        return None
+    name = create_version(doc_type, client=client)
+    swap_alias(client, alias, name)
+    return name
+
+
+def _replay_deletions(doc_type, client, since, chunk_size, index=None):
+    """
+    Delete documents for rows deleted since ``since``.
+
+    sync_documents and delete_document mark the IndexedDocument row of a
+    deleted source row ``deleted``, so those rows are the deletions to replay.
+    """
+    from .models import IndexedDocument
+
+    source_ids = IndexedDocument.objects.filter(
+        doc_type=doc_type, status='deleted', updated_at__gte=since,
+    ).values_list('source_id', flat=True)
+    return delete_documents(doc_type, source_ids.iterator(), client=client, chunk_size=chunk_size, index=index)
+
+
+def rebuild_index(doc_type, client=None, chunk_size=DEFAULT_CHUNK_SIZE, parallel=False):
+    """
+    Build a new version of a document type's index and swap it in.
+
+    Searches keep hitting the previous version until the alias moves.
+    Rows deleted while the new version was loading are deleted from it
+    before the swap; rows saved meanwhile are indexed again through the
+    alias once it has moved.
+
+    Returns:
+        dict: New index name, counts, pruned versions and timings
+    """
+    client = client or get_elasticsearch_client()
+    alias = alias_name(doc_type)
+    body = _index_body(doc_type)
+
+    started_at = timezone.now()
+    started = time.monotonic()
+    index = create_version(doc_type, client=client, bulk_load=True)
+    try:
+        counts = bulk_index(doc_type, client=client, chunk_size=chunk_size, parallel=parallel, index=index)
+        client.indices.put_settings(index=index, body={'index': {
+            'refresh_interval': body['settings'].get('refresh_interval'),
+            'number_of_replicas': body['settings'].get('number_of_replicas', 1),
+        }})
+        client.indices.refresh(index=index)
+        client.indices.forcemerge(index=index, max_num_segments=1)
+        # Deletes so far went to the previous version only
+        replayed_at = timezone.now()
+        deleted = _replay_deletions(doc_type, client, started_at, chunk_size, index=index)
+        client.indices.refresh(index=index)
+    except Exception:
+        # Leave the live version untouched
+        client.indices.delete(index=index, ignore=[404])
+        raise
+
+    previous = current_indices(client, alias)
+    swap_alias(client, alias, index)
+    # ...as did any made between the replay and the swap
+    deleted['deleted'] += _replay_deletions(doc_type, client, replayed_at, chunk_size)['deleted']
+
+    queryset = INDEXABLE_TYPES[doc_type][0]()
+    if any(field.name == 'updated_at' for field in queryset.model._meta.fields):
+        changed = queryset.filter(updated_at__gte=started_at)
+        catch_up = bulk_index(doc_type, queryset=changed, client=client, chunk_size=chunk_size)
+    else:
+        catch_up = None
+
+    elapsed = time.monotonic() - started
+    total = counts['indexed'] + counts['failed']
+    return {
+        'alias': alias,
+        'index': index,
+        'previous': previous,
+        'indexed': counts['indexed'],
+        'failed': counts['failed'],
+        'catch_up': catch_up,
+        'deleted': deleted['deleted'],
+        'pruned': prune_versions(client, alias),
+        'seconds': round(elapsed, 3),
+        'docs_per_second': round(total / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def rollback_index(doc_type, client=None):
+    """
+    Point the alias back at the newest version older than the live one.
+
+    Raises:
+        IndexVersionError: If there is no older version to go back to
+
+    Returns:
+        str: Name of the index now behind the alias
+    """
+    client = client or get_elasticsearch_client()
+    alias = alias_name(doc_type)
+    pattern = re.compile(rf'^{re.escape(alias)}_v(\d+)$')
+    live = [int(match.group(1)) for match in map(pattern.match, current_indices(client, alias)) if match]
+    older = [version for version in list_versions(client, alias) if not live or version < min(live)]
+    if not older:
+        raise IndexVersionError(f'No earlier version of {alias} to roll back to')
+    index = version_name(alias, older[-1])
+    swap_alias(client, alias, index)
+    return index
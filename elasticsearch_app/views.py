@@ -3,18 +3,38 @@ Elasticsearch App Views
 
 Views for search UI and Elasticsearch management.
 """
+import asyncio
+import json
 import time
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
 from django.views.generic import TemplateView, View
-from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import render
 from django.core.paginator import Paginator
 
-from .client import get_elasticsearch_client, check_elasticsearch_connection, get_cluster_health, get_index_stats
-from .search import SearchService
+from .client import (
+    CircuitOpenError, get_circuit_breaker, get_elasticsearch_client, check_elasticsearch_connection,
+    get_cluster_health, get_index_stats,
+)
+from .search import DeepPaginationError, InvalidCursor, SearchService
+from .async_search import AsyncSearchService
+from .analytics import flush_search_events, get_sink_stats, record_search
+from .cache import get_search_cache_stats
 from .models import SearchQuery
+from .rollups import summarize
 from .documents import create_all_indices, delete_all_indices, INDEX_PREFIX
 
+LOG_SEARCH_FORBIDDEN = 'Log search is restricted to staff'
+
+
+def can_search(user, index_filter):
+    """Log entries carry request paths, user ids and IPs, so only staff search them."""
+    return index_filter != 'logs' or user.is_staff
+
 
 class ElasticsearchDashboardView(LoginRequiredMixin, TemplateView):
     """
@@ -25,11 +45,13 @@ class ElasticsearchDashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get connection status
+        # Get connection status; cached and time-boxed
         context['connection'] = check_elasticsearch_connection()
+        context['breaker'] = get_circuit_breaker().snapshot()
+        context['degraded'] = context['breaker']['state'] != 'closed'
         
-        # Get cluster health
-        if context['connection']['connected']:
+        # Get cluster health; skipped while requests are failing fast
+        if context['connection']['connected'] and not context['degraded']:
             context['health'] = get_cluster_health()
             context['indices'] = get_index_stats()
         
@@ -52,6 +74,9 @@ class SearchView(TemplateView):
         index_filter = self.request.GET.get('index', '')
         page = int(self.request.GET.get('page', 1))
         
+        if not can_search(self.request.user, index_filter):
+            raise PermissionDenied(LOG_SEARCH_FORBIDDEN)
+        
         context['query'] = query
         context['index_filter'] = index_filter
         context['results'] = None
@@ -73,16 +98,13 @@ class SearchView(TemplateView):
                 
                 context['results'] = results
                 
-                # Log the search query
-                response_time = int((time.time() - start_time) * 1000)
-                SearchQuery.objects.create(
-                    query=query,
-                    user=self.request.user if self.request.user.is_authenticated else None,
-                    index=index_filter or 'all',
-                    results_count=results.get('total', 0),
-                    response_time_ms=response_time,
-                    ip_address=self.request.META.get('REMOTE_ADDR'),
-                    user_agent=self.request.META.get('HTTP_USER_AGENT', '')[:500]
+                # Log the search query; written in bulk after the response
+                record_search(
+                    self.request,
+                    query,
+                    index_filter or 'all',
+                    results.get('total', 0),
+                    int((time.time() - start_time) * 1000),
                 )
                 
             except Exception as e:
@@ -101,24 +123,41 @@ class SearchAPIView(View):
         index_filter = request.GET.get('index', '')
         page = int(request.GET.get('page', 1))
         per_page = int(request.GET.get('per_page', 10))
+        # Continue from a previous page's next_cursor instead of by page number
+        cursor = request.GET.get('cursor') or None
         
         if not query:
             return JsonResponse({'error': 'Query parameter "q" is required'}, status=400)
+        if not can_search(request.user, index_filter):
+            return JsonResponse({'error': LOG_SEARCH_FORBIDDEN}, status=403)
         
+        start_time = time.time()
         try:
             search_service = SearchService()
+            options = {'page': page, 'per_page': per_page, 'cursor': cursor}
             
             if index_filter == 'notes':
-                results = search_service.search_notes(query, page=page, per_page=per_page)
+                results = search_service.search_notes(query, **options)
             elif index_filter == 'users':
-                results = search_service.search_users(query, page=page, per_page=per_page)
+                results = search_service.search_users(query, **options)
             elif index_filter == 'logs':
-                results = search_service.search_logs(query, page=page, per_page=per_page)
+                results = search_service.search_logs(query, **options)
             else:
-                results = search_service.search_all(query, page=page, per_page=per_page)
+                results = search_service.search_all(query, **options)
             
+            record_search(
+                request,
+                query,
+                index_filter or 'all',
+                results.get('total', 0),
+                int((time.time() - start_time) * 1000),
+            )
             return JsonResponse(results)
             
+        except (InvalidCursor, DeepPaginationError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except CircuitOpenError as e:
+            return JsonResponse({'error': str(e)}, status=503)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
@@ -142,6 +181,120 @@ class SuggestAPIView(View):
             return JsonResponse({'suggestions': [], 'error': str(e)})
 
 
+# =============================================================================
+# ASYNC VIEWS (ASGI)
+# =============================================================================
+
+def _run_search(search_service, index_filter, query, **options):
+    if index_filter == 'notes':
+        return search_service.search_notes(query, **options)
+    if index_filter == 'users':
+        return search_service.search_users(query, **options)
+    if index_filter == 'logs':
+        return search_service.search_logs(query, **options)
+    return search_service.search_all(query, **options)
+
+
+async def _search_with_flush(request, query, index_filter, **options):
+    """
+    Run a search and write buffered analytics concurrently, then record it.
+    
+    The flush runs in the thread pool while the search waits on
+    Elasticsearch, instead of after the response.
+    """
+    start_time = time.time()
+    search_service = AsyncSearchService()
+    results, _ = await asyncio.gather(
+        _run_search(search_service, index_filter, query, **options),
+        sync_to_async(flush_search_events)(),
+        # A failed flush must not fail the search
+        return_exceptions=True,
+    )
+    if isinstance(results, Exception):
+        raise results
+    record_search(
+        request,
+        query,
+        index_filter or 'all',
+        results.get('total', 0),
+        int((time.time() - start_time) * 1000),
+        user=await request.auser(),
+    )
+    return results
+
+
+class AsyncSearchView(View):
+    """
+    Main search interface on AsyncSearchService.
+    """
+    template_name = 'elasticsearch_app/search.html'
+    
+    async def get(self, request):
+        query = request.GET.get('q', '').strip()
+        index_filter = request.GET.get('index', '')
+        page = int(request.GET.get('page', 1))
+        
+        if not can_search(await request.auser(), index_filter):
+            raise PermissionDenied(LOG_SEARCH_FORBIDDEN)
+        
+        context = {'query': query, 'index_filter': index_filter, 'results': None}
+        if query:
+            try:
+                context['results'] = await _search_with_flush(request, query, index_filter, page=page)
+            except Exception as e:
+                context['error'] = str(e)
+        
+        return await sync_to_async(render)(request, self.template_name, context)
+
+
+class AsyncSearchAPIView(View):
+    """
+    API endpoint for AJAX search on AsyncSearchService.
+    """
+    
+    async def get(self, request):
+        query = request.GET.get('q', '').strip()
+        index_filter = request.GET.get('index', '')
+        page = int(request.GET.get('page', 1))
+        per_page = int(request.GET.get('per_page', 10))
+        cursor = request.GET.get('cursor') or None
+        
+        if not query:
+            return JsonResponse({'error': 'Query parameter "q" is required'}, status=400)
+        if not can_search(await request.auser(), index_filter):
+            return JsonResponse({'error': LOG_SEARCH_FORBIDDEN}, status=403)
+        
+        try:
+            results = await _search_with_flush(
+                request, query, index_filter, page=page, per_page=per_page, cursor=cursor
+            )
+            return JsonResponse(results)
+        except (InvalidCursor, DeepPaginationError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except (CircuitOpenError, ImproperlyConfigured) as e:
+            return JsonResponse({'error': str(e)}, status=503)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+class AsyncSuggestAPIView(View):
+    """
+    API endpoint for search suggestions on AsyncSearchService.
+    """
+    
+    async def get(self, request):
+        query = request.GET.get('q', '').strip()
+        
+        if not query or len(query) < 2:
+            return JsonResponse({'suggestions': []})
+        
+        try:
+            suggestions = await AsyncSearchService().suggest(query)
+            return JsonResponse({'suggestions': suggestions})
+        except Exception as e:
+            return JsonResponse({'suggestions': [], 'error': str(e)})
+
+
 class IndexManagementView(LoginRequiredMixin, View):
     """
     View for managing Elasticsearch indices.
@@ -181,6 +334,25 @@ class IndexManagementView(LoginRequiredMixin, View):
             except Exception as e:
                 return JsonResponse({'success': False, 'error': str(e)})
         
+        elif action == 'rebuild':
+            try:
+                from .tasks import rebuild_search_indices
+                rebuild_search_indices.delay()
+                return JsonResponse({'success': True, 'message': 'Index rebuild started'})
+            except Exception as e:
+                return JsonResponse({'success': False, 'error': str(e)})
+        
+        elif action == 'rollback':
+            try:
+                from .versioning import VERSIONED_DOCUMENTS, rollback_index
+                doc_type = request.POST.get('doc_type')
+                if doc_type not in VERSIONED_DOCUMENTS:
+                    return JsonResponse({'success': False, 'error': 'Unknown document type'})
+                index = rollback_index(doc_type)
+                return JsonResponse({'success': True, 'message': f'Alias now points at {index}'})
+            except Exception as e:
+                return JsonResponse({'success': False, 'error': str(e)})
+        
         return JsonResponse({'success': False, 'error': 'Unknown action'})
 
 
@@ -204,6 +376,39 @@ class IndicesAPIView(View):
         return JsonResponse({'indices': indices})
 
 
+class LogExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Stream matching log entries as NDJSON, one document per line. Staff only.
+    """
+    raise_exception = True
+    
+    def test_func(self):
+        return self.request.user.is_staff
+    
+    def get(self, request):
+        filters = {
+            key: request.GET[key]
+            for key in ('level', 'module', 'date_from', 'date_to')
+            if request.GET.get(key)
+        }
+        entries = SearchService(use_cache=False).iter_logs(request.GET.get('q', '').strip(), filters)
+        lines = (json.dumps(entry, cls=DjangoJSONEncoder) + '\n' for entry in entries)
+        
+        response = StreamingHttpResponse(lines, content_type='application/x-ndjson')
+        filename = f"logs-{timezone.now():%Y%m%d-%H%M%S}.ndjson"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class SearchCacheStatsAPIView(View):
+    """
+    API endpoint for search result cache hit rates.
+    """
+    
+    def get(self, request):
+        return JsonResponse({'endpoints': get_search_cache_stats()})
+
+
 class SearchAnalyticsView(LoginRequiredMixin, TemplateView):
     """
     View for search analytics.
@@ -213,31 +418,14 @@ class SearchAnalyticsView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Top search queries
-        from django.db.models import Count
-        context['top_queries'] = (
-            SearchQuery.objects
-            .values('query')
-            .annotate(count=Count('id'))
-            .order_by('-count')[:20]
-        )
-        
-        # Recent queries
-        context['recent_queries'] = SearchQuery.objects.all()[:50]
-        
-        # Zero result queries
-        context['zero_result_queries'] = (
-            SearchQuery.objects
-            .filter(results_count=0)
-            .values('query')
-            .annotate(count=Count('id'))
-            .order_by('-count')[:20]
-        )
-        
-        # Average response time
-        from django.db.models import Avg
-        context['avg_response_time'] = (
-            SearchQuery.objects.aggregate(avg_time=Avg('response_time_ms'))['avg_time']
-        )
+        # Aggregates come from the rollups kept by rollup_search_queries
+        context.update(summarize())
+        
+        # Latest raw rows; an indexed LIMIT rather than an aggregate
+        context['recent_queries'] = SearchQuery.objects.select_related('user')[:50]
+        
+        # Result cache hit rates per SearchService endpoint
+        context['cache_stats'] = get_search_cache_stats()
+        context['sink_stats'] = get_sink_stats()
         
         return context
@@ -1,3 +1,40 @@
 from django.contrib import admin
+from django.db.models import Count, F, Sum
 
-# Register your models here.
+from .models import StoredBlob
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'namespace', 'name', 'size', 'ref_count', 'created_at']
+    list_filter = ['namespace', 'created_at']
+    search_fields = ['sha256', 'name']
+    ordering = ['-ref_count', '-size']
+    readonly_fields = ['namespace', 'sha256', 'name', 'size', 'ref_count', 'created_at']
+    change_list_template = 'admin/file_manager/storedblob/change_list.html'
+
+    def has_add_permission(self, request):
+        # Blobs are created by the deduplicating storages only
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['dedupe_stats'] = self.get_dedupe_stats()
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def get_dedupe_stats(self):
+        """Bytes referenced by files vs bytes actually stored"""
+        stats = StoredBlob.objects.aggregate(
+            blobs=Count('pk'),
+            references=Sum('ref_count'),
+            stored_bytes=Sum('size'),
+            logical_bytes=Sum(F('size') * F('ref_count')),
+        )
+        stored = stats['stored_bytes'] or 0
+        logical = stats['logical_bytes'] or 0
+        stats['references'] = stats['references'] or 0
+        stats['stored_bytes'] = stored
+        stats['logical_bytes'] = logical
+        stats['saved_bytes'] = logical - stored
+        stats['ratio'] = round(logical / stored, 2) if stored else 1.0
+        return stats
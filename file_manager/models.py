@@ -1,11 +1,34 @@
 from django.db import models
-from django_starter.storage_backends import PublicMediaStorage, ProtectedMediaStorage, PrivateMediaStorage
+from django_starter.storage_backends import (
+    DedupPublicMediaStorage, DedupProtectedMediaStorage, DedupPrivateMediaStorage
+)
 from django_starter.models import AbstractBaseModel
 
+
+class StoredBlob(models.Model):
+    """One stored copy of a file's content, shared by every file with that content"""
+    namespace = models.CharField(max_length=50, help_text='Storage the blob lives in')
+    sha256 = models.CharField(max_length=64)
+    name = models.CharField(max_length=255, help_text='Name of the object in its storage')
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['namespace', 'sha256'], name='unique_blob_content'),
+        ]
+        indexes = [
+            models.Index(fields=['namespace', 'name']),
+        ]
+
+    def __str__(self):
+        return f'{self.namespace}:{self.sha256[:12]} ({self.ref_count} refs)'
+
 class PublicFile(models.Model):
     """Files accessible to everyone (no authentication needed)"""
     title = models.CharField(max_length=255)
-    file = models.FileField(storage=PublicMediaStorage, upload_to='documents/public/')
+    file = models.FileField(storage=DedupPublicMediaStorage, upload_to='documents/public/')
 
     def __str__(self):
         return self.title
@@ -14,7 +37,7 @@ class PublicFile(models.Model):
 class ProtectedFile(models.Model):
     """Files accessible only to authenticated users"""
     title = models.CharField(max_length=255)
-    file = models.FileField(storage=ProtectedMediaStorage, upload_to='documents/protected/')
+    file = models.FileField(storage=DedupProtectedMediaStorage, upload_to='documents/protected/')
     uploaded_by = models.ForeignKey('user_account.Account', on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -24,7 +47,7 @@ class ProtectedFile(models.Model):
 
 class PrivateFile(models.Model):
     title = models.CharField(max_length=255)
-    file = models.FileField(storage=PrivateMediaStorage, upload_to='documents/private/')
+    file = models.FileField(storage=DedupPrivateMediaStorage, upload_to='documents/private/')
 
     def __str__(self):
         return self.title
@@ -208,3 +208,82 @@ class TestFileManagerFunctions(TestCase):
         self.assertTrue(hasattr(views, 'upload_protected_file') or hasattr(views, 'private_file_upload') or True)
 
 
+
+
+class DeduplicatingStorageTest(TestCase):
+    """Test the content-addressed, reference-counted storage"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django_starter.storage_backends import DedupFileSystemStorage
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = DedupFileSystemStorage(location=self.location)
+
+    def _save(self, content, name='report.txt'):
+        from django.core.files.base import ContentFile
+        return self.storage.save(name, ContentFile(content))
+
+    def test_same_content_is_stored_once(self):
+        """Test re-uploading identical content reuses the stored blob"""
+        from file_manager.models import StoredBlob
+        first = self._save(b'same bytes', 'a.txt')
+        second = self._save(b'same bytes', 'b.txt')
+        other = self._save(b'other bytes', 'a.txt')
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        blob = StoredBlob.objects.get(name=first)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.size, len(b'same bytes'))
+        with self.storage.open(first) as stored:
+            self.assertEqual(stored.read(), b'same bytes')
+
+    def test_blob_deleted_with_last_reference(self):
+        """Test the stored object goes only when its last reference does"""
+        from file_manager.models import StoredBlob
+        name = self._save(b'shared')
+        self._save(b'shared')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+
+    def test_adopt_replaces_duplicate_copy(self):
+        """Test adopting a file whose content is already stored drops the copy"""
+        import hashlib
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import FileSystemStorage
+        name = self._save(b'uploaded twice')
+        FileSystemStorage(location=self.location).save('uploads/copy.txt', ContentFile(b'uploaded twice'))
+
+        digest = hashlib.sha256(b'uploaded twice').hexdigest()
+        self.assertEqual(self.storage.adopt('uploads/copy.txt', digest, 14), name)
+        self.assertFalse(self.storage.exists('uploads/copy.txt'))
+        # Adopting a name that is already a blob adds no reference
+        self.assertEqual(self.storage.adopt(name, digest, 14), name)
+
+        from file_manager.models import StoredBlob
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 2)
+
+    def test_admin_reports_dedupe_ratio(self):
+        """Test the blob changelist shows the dedupe ratio"""
+        from django.contrib.auth import get_user_model
+        for _ in range(3):
+            self._save(b'x' * 100)
+        admin_user = get_user_model().objects.create_superuser(
+            email='blobadmin@example.com', username='blobadmin', password='adminpass123'
+        )
+        admin_user.is_active = True
+        admin_user.save()
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:file_manager_storedblob_changelist'))
+        self.assertEqual(response.context['dedupe_stats']['ratio'], 3.0)
+        self.assertContains(response, 'dedupe ratio <strong>3.0x</strong>')
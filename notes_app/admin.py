@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import Note, Category, Tag, Comment, Attachment
+from django.db.models import Count
+from django.utils import timezone
+
+from django_starter.utils import EstimatedCountPaginator
+from .cache import bump_note_version
+from .signals import schedule_search_update
+from .stats import invalidate_author_stats
+from .models import Note, Category, Tag, Comment, Attachment, AttachmentUpload
 
 
 @admin.register(Category)
@@ -9,9 +16,13 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description']
     list_filter = ['created_at']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(note_total=Count('notes'))
+    
     def note_count(self, obj):
-        return obj.notes.count()
+        return obj.note_total
     note_count.short_description = 'Notes'
+    note_count.admin_order_field = 'note_total'
 
 
 @admin.register(Tag)
@@ -20,9 +31,13 @@ class TagAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(note_total=Count('notes'))
+    
     def note_count(self, obj):
-        return obj.notes.count()
+        return obj.note_total
     note_count.short_description = 'Notes'
+    note_count.admin_order_field = 'note_total'
 
 
 class CommentInline(admin.TabularInline):
@@ -34,12 +49,15 @@ class CommentInline(admin.TabularInline):
 class AttachmentInline(admin.TabularInline):
     model = Attachment
     extra = 0
-    readonly_fields = ['uploaded_at', 'file_size']
+    readonly_fields = ['uploaded_at', 'file_size', 'checksum', 'processed_at']
 
 
 @admin.register(Note)
 class NoteAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'category', 'status', 'priority', 'is_pinned', 'created_at']
+    list_select_related = ['author', 'category']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ['status', 'priority', 'is_pinned', 'is_public', 'category', 'created_at']
     search_fields = ['title', 'content', 'summary']
     prepopulated_fields = {'slug': ('title',)}
@@ -68,23 +86,30 @@ class NoteAdmin(admin.ModelAdmin):
     actions = ['make_published', 'make_archived', 'toggle_pin']
     
     def make_published(self, request, queryset):
-        queryset.update(status=Note.Status.ACTIVE)
+        queryset.update(status=Note.Status.ACTIVE, updated_at=timezone.now())
+        invalidate_author_stats(*set(queryset.values_list('author_id', flat=True)))
+        schedule_search_update(list(queryset.values_list('pk', flat=True)))
     make_published.short_description = 'Mark selected notes as published'
     
     def make_archived(self, request, queryset):
-        queryset.update(status=Note.Status.ARCHIVED)
+        queryset.update(status=Note.Status.ARCHIVED, updated_at=timezone.now())
+        invalidate_author_stats(*set(queryset.values_list('author_id', flat=True)))
+        schedule_search_update(list(queryset.values_list('pk', flat=True)))
     make_archived.short_description = 'Archive selected notes'
     
     def toggle_pin(self, request, queryset):
         for note in queryset:
             note.is_pinned = not note.is_pinned
-            note.save(update_fields=['is_pinned'])
+            note.save(update_fields=['is_pinned', 'updated_at'])
     toggle_pin.short_description = 'Toggle pin status'
 
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ['note', 'author', 'is_approved', 'created_at']
+    list_select_related = ['note', 'author']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ['is_approved', 'created_at']
     search_fields = ['content', 'author__username', 'note__title']
     raw_id_fields = ['note', 'author']
@@ -93,16 +118,35 @@ class CommentAdmin(admin.ModelAdmin):
     
     def approve_comments(self, request, queryset):
         queryset.update(is_approved=True)
+        self._bump_comment_versions(queryset)
     approve_comments.short_description = 'Approve selected comments'
     
     def reject_comments(self, request, queryset):
         queryset.update(is_approved=False)
+        self._bump_comment_versions(queryset)
     reject_comments.short_description = 'Reject selected comments'
+    
+    def _bump_comment_versions(self, queryset):
+        # update() skips post_save, so invalidate the cached comment lists here
+        for note_id in set(queryset.values_list('note_id', flat=True)):
+            bump_note_version(note_id, 'comments')
 
 
 @admin.register(Attachment)
 class AttachmentAdmin(admin.ModelAdmin):
-    list_display = ['filename', 'note', 'file_size', 'mime_type', 'uploaded_at']
+    list_display = ['filename', 'note', 'file_size', 'mime_type', 'uploaded_at', 'processed_at']
+    list_select_related = ['note']
     list_filter = ['mime_type', 'uploaded_at']
-    search_fields = ['filename', 'note__title']
+    search_fields = ['filename', 'note__title', 'checksum']
     raw_id_fields = ['note']
+    readonly_fields = ['checksum', 'processed_at']
+
+
+@admin.register(AttachmentUpload)
+class AttachmentUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'note', 'user', 'size', 'status', 'created_at', 'updated_at']
+    list_select_related = ['note', 'user']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'note__title', 'user__username']
+    raw_id_fields = ['note', 'user', 'attachment']
+    readonly_fields = ['storage_name', 'backend_upload_id', 'parts']
@@ -5,3 +5,7 @@ class NotesAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes_app'
     verbose_name = 'Notes Application'
+    
+    def ready(self):
+        """Import signals when app is ready"""
+        import notes_app.signals  # noqa
@@ -0,0 +1,49 @@
+"""
+Notes App Cache Helpers
+
+Version tokens for template fragment caching. Each note has one token per
+related collection (comments, attachments, tags); fragment keys include the
+token, so bumping it makes the old fragments unreachable without having to
+find and delete them.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_PARTS = ('comments', 'attachments', 'tags', 'related')
+
+
+def _version_key(part, note_id):
+    return f'notes_app:version:{part}:{note_id}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def get_note_versions(note_id):
+    """
+    Get the current version tokens for a note in a single cache round trip.
+
+    Missing tokens (never bumped, or evicted) are replaced with a fresh one
+    so a fragment can never be served against a recycled version.
+
+    Returns:
+        dict: Mapping of part name to version token
+    """
+    keys = {_version_key(part, note_id): part for part in VERSION_PARTS}
+    found = cache.get_many(keys.keys())
+
+    versions = {}
+    for key, part in keys.items():
+        if key not in found:
+            version = _new_version()
+            cache.add(key, version, None)
+            found[key] = cache.get(key) or version
+        versions[part] = found[key]
+    return versions
+
+
+def bump_note_version(note_id, part):
+    """Invalidate every cached fragment that depends on ``part`` of a note."""
+    cache.set(_version_key(part, note_id), _new_version(), None)
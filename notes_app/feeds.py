@@ -0,0 +1,99 @@
+"""
+Notes App Feeds
+
+Keyset-paginated note lists for infinite scroll. Pages continue from the
+(is_pinned, created_at, id) key of the previous page, so no page needs a
+COUNT or an OFFSET, and each note is reduced to a plain "card" dict that
+both the list templates and the JSON feed render from.
+"""
+from django.core.cache import cache
+from django.urls import reverse
+
+from .pagination import keyset_paginate
+
+FEED_ORDERING = ('-is_pinned', '-created_at', '-id')
+FEED_PAGE_SIZE = 12
+CARD_CACHE_TIMEOUT = 60 * 60
+
+
+def _card_key(note):
+    category_version = note.category.updated_at.timestamp() if note.category_id else 0
+    return f'notes_app:card:{note.pk}:{note.updated_at.timestamp()}:{category_version}'
+
+
+def build_card(note):
+    """Serialize the parts of a note that only change when it is saved."""
+    category = None
+    if note.category_id:
+        category = {
+            'name': note.category.name,
+            'slug': note.category.slug,
+            'url': reverse('notes_app:notes_by_category', kwargs={'slug': note.category.slug}),
+        }
+    return {
+        'id': note.pk,
+        'title': note.title,
+        'slug': note.slug,
+        'url': note.get_absolute_url(),
+        'excerpt': note.excerpt,
+        'status': note.status,
+        'status_display': note.get_status_display(),
+        'priority': note.priority,
+        'priority_display': note.get_priority_display(),
+        'is_pinned': note.is_pinned,
+        'category': category,
+        'created_at': note.created_at,
+    }
+
+
+def serialize_cards(notes):
+    """
+    Cards for a page of notes, built from the cache where possible.
+
+    Cards are keyed on the note's and its category's ``updated_at``, so
+    an edit produces a new key instead of needing an invalidation.
+    Fields that can change without touching ``updated_at`` (view count,
+    pin state, author name) are filled in fresh. Notes should come with ``author`` and ``category``
+    selected.
+
+    Returns:
+        list: One dict per note, in the order given
+    """
+    notes = list(notes)
+    keys = [_card_key(note) for note in notes]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    cards = []
+    for key, note in zip(keys, notes):
+        card = cached.get(key)
+        if card is None:
+            card = missing[key] = build_card(note)
+        cards.append({
+            **card,
+            'author': note.author.username,
+            'view_count': note.view_count,
+            'is_pinned': note.is_pinned,
+        })
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+    return cards
+
+
+def feed_page(queryset, cursor=None, limit=FEED_PAGE_SIZE):
+    """
+    One page of a note feed.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+
+    Returns:
+        tuple: (list of notes, list of cards, next_cursor or None)
+    """
+    notes, next_cursor = keyset_paginate(
+        queryset.select_related('author', 'category'),
+        FEED_ORDERING,
+        cursor=cursor,
+        limit=limit,
+    )
+    return notes, serialize_cards(notes), next_cursor
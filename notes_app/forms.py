@@ -5,6 +5,10 @@ from django import forms
 from django.utils.text import slugify
 from .models import Note, Category, Tag, Comment, Attachment
 
+ALLOWED_ATTACHMENT_EXTENSIONS = [
+    'pdf', 'doc', 'docx', 'txt', 'png', 'jpg', 'jpeg', 'gif'
+]
+
 
 class CategoryForm(forms.ModelForm):
     """Form for creating/editing categories"""
@@ -251,12 +255,9 @@ class AttachmentForm(forms.ModelForm):
                 raise forms.ValidationError('File size must be under 10MB.')
             
             # Check allowed extensions
-            allowed_extensions = [
-                'pdf', 'doc', 'docx', 'txt', 'png', 'jpg', 'jpeg', 'gif'
-            ]
             ext = file.name.split('.')[-1].lower()
-            if ext not in allowed_extensions:
+            if ext not in ALLOWED_ATTACHMENT_EXTENSIONS:
                 raise forms.ValidationError(
-                    f'File type not allowed. Allowed: {", ".join(allowed_extensions)}'
+                    f'File type not allowed. Allowed: {", ".join(ALLOWED_ATTACHMENT_EXTENSIONS)}'
                 )
         return file
@@ -0,0 +1,53 @@
+"""
+Management Command: backfill_note_rendering
+
+Fills the stored rendered HTML, word count and excerpt for notes that were
+created before those fields existed (or via bulk_create, which skips
+Note.save). Notes are streamed in batches and written with bulk_update.
+"""
+from django.core.management.base import BaseCommand
+
+from notes_app.models import Note
+from notes_app.rendering import RENDERED_FIELDS, render_note
+
+
+class Command(BaseCommand):
+    help = 'Store rendered content, word counts and excerpts for notes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Notes read and written per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-render every note, not only notes without stored HTML',
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Note.objects.order_by('pk').only('pk', 'content', 'summary')
+        if not options['all']:
+            queryset = queryset.filter(rendered_content='').exclude(content='')
+        
+        batch = []
+        total = 0
+        for note in queryset.iterator(chunk_size=batch_size):
+            render_note(note)
+            batch.append(note)
+            if len(batch) >= batch_size:
+                total += self._flush(batch)
+        total += self._flush(batch)
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Rendered {total} notes'))
+    
+    def _flush(self, batch):
+        count = len(batch)
+        if batch:
+            Note.objects.bulk_update(batch, RENDERED_FIELDS)
+            self.stdout.write(f'   - {count} notes written')
+            batch.clear()
+        return count
@@ -0,0 +1,88 @@
+"""
+Management Command: benchmark_random_note
+
+Compares ORDER BY RANDOM() against the indexed id-range lookup used by
+RandomNoteRedirectView. Synthetic notes are created inside a transaction
+that is rolled back at the end, so the database is left untouched.
+"""
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django_starter.utils import random_instance
+from notes_app.models import Note
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark random note selection strategies'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--notes',
+            type=int,
+            default=20000,
+            help='Number of synthetic notes to create (default: 20000)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Number of random picks per strategy (default: 50)',
+        )
+    
+    def handle(self, *args, **options):
+        count = options['notes']
+        iterations = options['iterations']
+        
+        with transaction.atomic():
+            self._create_notes(count)
+            queryset = Note.objects.filter(status=Note.Status.ACTIVE, is_public=True)
+            
+            order_by_random = self._time(lambda: queryset.order_by('?').first(), iterations)
+            id_range = self._time(lambda: random_instance(queryset), iterations)
+            cache_key = f'notes_app:benchmark_bounds:{uuid.uuid4().hex}'
+            cached = self._time(lambda: random_instance(queryset, cache_key=cache_key), iterations)
+            cache.delete(cache_key)
+            
+            transaction.set_rollback(True)
+        
+        self.stdout.write(f'📊 Random note selection over {count} notes ({iterations} picks each):')
+        self.stdout.write(f'   - ORDER BY RANDOM(): {order_by_random:.3f} ms/pick')
+        self.stdout.write(f'   - id range lookup:   {id_range:.3f} ms/pick')
+        self.stdout.write(f'   - cached bounds:     {cached:.3f} ms/pick')
+        if cached:
+            self.stdout.write(self.style.SUCCESS(f'✅ Speedup: {order_by_random / cached:.1f}x'))
+    
+    def _create_notes(self, count):
+        author = User.objects.create_user(
+            username=f'bench-{uuid.uuid4().hex[:8]}',
+            email=f'bench-{uuid.uuid4().hex[:8]}@example.com',
+            password=None,
+        )
+        batch = uuid.uuid4().hex[:8]
+        Note.objects.bulk_create(
+            (
+                Note(
+                    title=f'Benchmark note {i}',
+                    slug=f'benchmark-{batch}-{i}',
+                    content='Benchmark content',
+                    author=author,
+                    status=Note.Status.ACTIVE,
+                    is_public=True,
+                )
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+    
+    def _time(self, func, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) * 1000 / iterations
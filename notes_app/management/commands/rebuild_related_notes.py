@@ -0,0 +1,38 @@
+"""
+Management Command: rebuild_related_notes
+
+Recomputes the stored related-note recommendations for every note. Run it
+once after deploying the RelatedNote table; afterwards the nightly Celery
+beat entry and incremental updates keep it current.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes_app.recommendations import rebuild_related_notes
+from notes_app.tasks import rebuild_related_notes as rebuild_related_notes_task
+
+
+class Command(BaseCommand):
+    help = 'Recompute related-note recommendations for every note'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='run_async',
+            help='Queue the rebuild as a Celery task instead of running it here',
+        )
+    
+    def handle(self, *args, **options):
+        if options['run_async']:
+            task = rebuild_related_notes_task.delay()
+            self.stdout.write(self.style.SUCCESS(f'✅ Rebuild queued as task {task.id}'))
+            return
+        
+        start = time.perf_counter()
+        total = rebuild_related_notes()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt related notes for {total} notes in {elapsed:.1f}s'
+        ))
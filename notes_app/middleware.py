@@ -0,0 +1,28 @@
+"""
+Notes App Middleware
+"""
+
+
+class FragmentCacheMetricsMiddleware:
+    """
+    Report template fragment cache usage for the request.
+    
+    Adds an ``X-Fragment-Cache`` header such as ``hits=3; misses=1; ratio=0.75``
+    to every response that rendered at least one cached fragment.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        request.fragment_cache_stats = {'hits': 0, 'misses': 0}
+        response = self.get_response(request)
+        
+        stats = request.fragment_cache_stats
+        lookups = stats['hits'] + stats['misses']
+        if lookups:
+            response['X-Fragment-Cache'] = (
+                f"hits={stats['hits']}; misses={stats['misses']}; "
+                f"ratio={stats['hits'] / lookups:.2f}"
+            )
+        return response
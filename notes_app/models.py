@@ -1,11 +1,16 @@
 """
 Notes App Models - Demonstrates Django Models with various field types
 """
+import uuid
+
+from django.core.files.storage import storages
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 
+from .rendering import render_note
+
 User = get_user_model()
 
 
@@ -105,6 +110,13 @@ class Note(models.Model):
     
     # Metadata
     view_count = models.PositiveIntegerField(default=0)
+    # Lowest stored related-note score once the list is full (0 until then)
+    related_score_floor = models.FloatField(default=0, editable=False)
+    
+    # Derived from content/summary on save (see notes_app.rendering)
+    rendered_content = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    excerpt = models.TextField(blank=True, editable=False)
     
     class Meta:
         ordering = ['-is_pinned', '-created_at']
@@ -112,6 +124,9 @@ class Note(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['author', 'status']),
             models.Index(fields=['created_at']),
+            # Keyset feed ordering (see notes_app.feeds)
+            models.Index(fields=['status', 'is_public', '-is_pinned', '-created_at', '-id']),
+            models.Index(fields=['author', '-is_pinned', '-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -120,6 +135,33 @@ class Note(models.Model):
     def get_absolute_url(self):
         return reverse('notes_app:note_detail', kwargs={'slug': self.slug})
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the stored rendering was made from (None if deferred)
+        instance._rendered_source = (
+            instance.__dict__.get('content'),
+            instance.__dict__.get('summary'),
+        )
+        # Lets signals invalidate the previous author's stats on reassignment
+        instance._loaded_author_id = instance.__dict__.get('author_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            if self._needs_rendering():
+                render_note(self)
+        elif {'content', 'summary'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | set(render_note(self))
+        super().save(*args, **kwargs)
+        self._rendered_source = (self.content, self.summary)
+    
+    def _needs_rendering(self):
+        if self.content and not self.rendered_content:
+            return True
+        return getattr(self, '_rendered_source', None) != (self.content, self.summary)
+    
     def publish(self):
         """Publish the note"""
         self.status = self.Status.ACTIVE
@@ -140,9 +182,33 @@ class Note(models.Model):
     def is_published(self):
         return self.status == self.Status.ACTIVE
     
-    @property
-    def word_count(self):
-        return len(self.content.split())
+
+
+class RelatedNote(models.Model):
+    """Precomputed related-note recommendations (top-k neighbours per note)"""
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    related = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='recommended_for'
+    )
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['note', 'rank']
+        unique_together = ['note', 'related']
+        indexes = [
+            models.Index(fields=['note', 'rank']),
+        ]
+    
+    def __str__(self):
+        return f'{self.note} -> {self.related} ({self.score:.3f})'
 
 
 class Comment(models.Model):
@@ -164,11 +230,19 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['note', 'is_approved', 'created_at']),
+        ]
     
     def __str__(self):
         return f'Comment by {self.author} on {self.note}'
 
 
+def get_attachment_storage():
+    """Deduplicating storage for attachment files (see settings.STORAGES)"""
+    return storages['attachments']
+
+
 class Attachment(models.Model):
     """File attachments for notes"""
     note = models.ForeignKey(
@@ -176,18 +250,83 @@ class Attachment(models.Model):
         on_delete=models.CASCADE,
         related_name='attachments'
     )
-    file = models.FileField(upload_to='note_attachments/%Y/%m/')
+    file = models.FileField(
+        upload_to='note_attachments/%Y/%m/', storage=get_attachment_storage, max_length=255
+    )
     filename = models.CharField(max_length=255)
-    file_size = models.PositiveIntegerField(default=0)
+    file_size = models.PositiveBigIntegerField(default=0)
     mime_type = models.CharField(max_length=100, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    # Filled in by the process_attachment task
+    checksum = models.CharField(max_length=64, blank=True, help_text='SHA-256 of the file')
+    thumbnail = models.ImageField(upload_to='note_attachments/thumbnails/%Y/%m/', blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
     def __str__(self):
         return self.filename
     
     def save(self, *args, **kwargs):
         if self.file:
-            self.file_size = self.file.size
+            # Chunked uploads already know the size; asking the storage would
+            # be a HEAD request (S3) or a stat for every save
+            if not self.file_size:
+                self.file_size = self.file.size
             if not self.filename:
                 self.filename = self.file.name
         super().save(*args, **kwargs)
+
+
+class AttachmentUpload(models.Model):
+    """Chunked, resumable attachment upload in progress"""
+    
+    class Status(models.TextChoices):
+        ACTIVE = 'active', 'Active'
+        COMPLETE = 'complete', 'Complete'
+        ABORTED = 'aborted', 'Aborted'
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='attachment_uploads'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='attachment_uploads'
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField(help_text='Declared total size in bytes')
+    storage_name = models.CharField(max_length=255, help_text='Final name in the default storage')
+    backend_upload_id = models.CharField(max_length=1024, blank=True)
+    # {"<part number>": {"etag": "...", "size": 123}}
+    parts = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.ACTIVE
+    )
+    attachment = models.OneToOneField(
+        Attachment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f'Upload of {self.filename} ({self.get_status_display()})'
+    
+    @property
+    def received_bytes(self):
+        return sum(part['size'] for part in self.parts.values())
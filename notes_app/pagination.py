@@ -0,0 +1,113 @@
+"""
+Notes App Keyset Pagination
+
+Cursor-based pagination for long, append-heavy lists. Instead of OFFSET,
+each page continues from the sort key of the last row of the previous page,
+so every page is a single index range scan no matter how deep it is.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def encode_cursor(values):
+    """Encode sort key values as an opaque, URL-safe token."""
+    values = [
+        value.isoformat() if isinstance(value, (date, datetime)) else value
+        for value in values
+    ]
+    payload = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token produced by ``encode_cursor``."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(str(e)) from e
+    if not isinstance(values, list):
+        raise InvalidCursor('Cursor must encode a list of values')
+    return values
+
+
+def keyset_paginate(queryset, ordering, cursor=None, limit=20):
+    """
+    Fetch one page of a queryset ordered by a unique sort key.
+
+    Args:
+        queryset: Queryset to paginate
+        ordering: Field names making up a unique key, e.g.
+            ``('created_at', 'id')``; prefix with ``-`` for descending
+        cursor: Token from a previous page's ``next_cursor``, or None
+        limit: Page size
+
+    Returns:
+        tuple: (list of objects, next_cursor token or None)
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+    """
+    fields = [name.lstrip('-') for name in ordering]
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise InvalidCursor('Cursor does not match the ordering')
+        values = [
+            _to_python(queryset.model, field, value)
+            for field, value in zip(fields, values)
+        ]
+        queryset = queryset.filter(_after(ordering, fields, values))
+
+    # One extra row tells us whether another page exists
+    items = list(queryset[:limit + 1])
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor([_attr(last, field) for field in fields])
+
+
+def _after(ordering, fields, values):
+    """(a, b) > (x, y) expanded to a > x OR (a = x AND b > y), per direction."""
+    condition = Q()
+    for i, name in enumerate(ordering):
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        branch = Q(**{f'{fields[i]}__{lookup}': values[i]})
+        for field, value in zip(fields[:i], values[:i]):
+            branch &= Q(**{field: value})
+        condition |= branch
+    return condition
+
+
+def _to_python(model, field, value):
+    """Convert a decoded cursor value to the type of the field it sorts on."""
+    opts = model._meta
+    parts = field.split('__')
+    try:
+        for part in parts[:-1]:
+            opts = opts.get_field(part).related_model._meta
+        model_field = opts.pk if parts[-1] == 'pk' else opts.get_field(parts[-1])
+        if value is None:
+            raise ValidationError('Cursor values cannot be null')
+        return model_field.to_python(value)
+    except (FieldDoesNotExist, ValidationError, TypeError, ValueError) as e:
+        raise InvalidCursor(f'Invalid value for {field}') from e
+
+
+def _attr(obj, field):
+    for part in field.split('__'):
+        obj = getattr(obj, part)
+    return obj
@@ -0,0 +1,415 @@
+"""
+Related Notes Engine
+
+Scores candidate notes against a note by shared tags, same category and
+TF-IDF cosine similarity over title and summary. The corpus is held as
+flat NumPy posting arrays (document index, term index, weight), so scoring
+one note against every candidate is a single sparse matrix-vector product
+done with ``np.bincount``.
+
+The index is cached per process and patched in place as notes change, so
+an incremental refresh only reads the changed notes. Each refresh publishes
+the changed ids in the cache under a shared version counter; other
+processes replay the versions they have not seen before using their index,
+and rebuild it when they are too far behind. IDF weights are frozen at
+build time and refreshed by the periodic full rebuild.
+"""
+import math
+import re
+import time
+from collections import Counter
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Note, RelatedNote
+
+RELATED_NOTES_LIMIT = 5
+
+# Relative weight of each signal in the combined score
+TAG_WEIGHT = 0.4
+CATEGORY_WEIGHT = 0.2
+TEXT_WEIGHT = 0.4
+
+# Rebuild the cached index (and its IDF weights) after this many seconds
+INDEX_MAX_AGE = 6 * 60 * 60
+
+# Shared index version, and the note ids changed by each version
+INDEX_VERSION_KEY = 'notes_app:related_index_version'
+INDEX_CHANGES_KEY = 'notes_app:related_index_changes:{}'
+
+# An index further behind than this, or whose changes expired, is rebuilt
+MAX_REPLAYED_VERSIONS = 200
+INDEX_CHANGES_TIMEOUT = 60 * 60
+
+# Ids per IN (...) clause when reading notes by id
+QUERY_CHUNK_SIZE = 500
+
+TOKEN_RE = re.compile(r'[a-z0-9]{3,}')
+
+_index = None
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class RelatedNotesIndex:
+    """
+    In-memory scoring index over the active notes.
+
+    Each note owns a slot; removing a note drops its postings and leaves an
+    empty slot behind, so slots never move and ``position`` stays valid.
+    """
+
+    def __init__(self, rows, note_tags, version=0):
+        self.built_at = time.monotonic()
+        self.version = version
+        self.note_ids = np.zeros(0, dtype=np.int64)
+        self.categories = np.zeros(0, dtype=np.int64)
+        self.position = {}
+        self.text_docs = np.zeros(0, dtype=np.int64)
+        self.text_terms = np.zeros(0, dtype=np.int64)
+        self.text_weights = np.zeros(0, dtype=np.float64)
+        self.tag_docs = np.zeros(0, dtype=np.int64)
+        self.tag_ids = np.zeros(0, dtype=np.int64)
+        self._build_idf(rows)
+        self._add(rows, note_tags)
+
+    @classmethod
+    def build(cls):
+        """Load every active note's title, summary, category and tags."""
+        # Read first: changes published while loading are replayed, not lost
+        version = shared_index_version()
+        rows = list(
+            Note.objects.filter(status=Note.Status.ACTIVE)
+            .order_by('pk')
+            .values('id', 'title', 'summary', 'category_id')
+        )
+        note_tags = {}
+        for note_id, tag_id in Note.tags.through.objects.filter(
+            note__status=Note.Status.ACTIVE
+        ).values_list('note_id', 'tag_id'):
+            note_tags.setdefault(note_id, set()).add(tag_id)
+        return cls(rows, note_tags, version)
+
+    def update(self, note_ids):
+        """Re-read the given notes; inactive or deleted ones leave the index."""
+        rows = []
+        for chunk in _chunks(list(note_ids)):
+            rows.extend(
+                Note.objects.filter(pk__in=chunk, status=Note.Status.ACTIVE)
+                .values('id', 'title', 'summary', 'category_id')
+            )
+        self.remove(note_ids)
+        self._add(rows, _tags_for(row['id'] for row in rows))
+
+    def remove(self, note_ids):
+        slots = [self.position[note_id] for note_id in note_ids if note_id in self.position]
+        if not slots:
+            return
+        keep = ~np.isin(self.text_docs, slots)
+        self.text_docs = self.text_docs[keep]
+        self.text_terms = self.text_terms[keep]
+        self.text_weights = self.text_weights[keep]
+        keep = ~np.isin(self.tag_docs, slots)
+        self.tag_docs = self.tag_docs[keep]
+        self.tag_ids = self.tag_ids[keep]
+        self.categories[slots] = -1
+        self._count_tags()
+
+    def _build_idf(self, rows):
+        document_frequency = Counter()
+        for row in rows:
+            document_frequency.update(set(tokenize(f"{row['title']} {row['summary']}")))
+
+        self.document_count = max(len(rows), 1)
+        self.vocabulary = {}
+        self.idf = []
+        for term, frequency in document_frequency.items():
+            self.vocabulary[term] = len(self.idf)
+            self.idf.append(math.log((1 + self.document_count) / (1 + frequency)) + 1)
+
+    def _add(self, rows, note_tags):
+        new_ids = [row['id'] for row in rows if row['id'] not in self.position]
+        if new_ids:
+            start = len(self.note_ids)
+            self.note_ids = np.concatenate([self.note_ids, np.array(new_ids, dtype=np.int64)])
+            self.categories = np.concatenate([self.categories, np.full(len(new_ids), -1, dtype=np.int64)])
+            for offset, note_id in enumerate(new_ids):
+                self.position[note_id] = start + offset
+
+        doc_index, term_index, weights = [], [], []
+        tag_docs, tag_ids = [], []
+        for row in rows:
+            slot = self.position[row['id']]
+            self.categories[slot] = row['category_id'] or -1
+            counts = Counter(tokenize(f"{row['title']} {row['summary']}"))
+            for term, weight in self._tfidf(counts, extend=True).items():
+                doc_index.append(slot)
+                term_index.append(term)
+                weights.append(weight)
+            for tag_id in note_tags.get(row['id'], ()):
+                tag_docs.append(slot)
+                tag_ids.append(tag_id)
+
+        self.text_docs = np.concatenate([self.text_docs, np.array(doc_index, dtype=np.int64)])
+        self.text_terms = np.concatenate([self.text_terms, np.array(term_index, dtype=np.int64)])
+        self.text_weights = np.concatenate([self.text_weights, np.array(weights, dtype=np.float64)])
+        self.tag_docs = np.concatenate([self.tag_docs, np.array(tag_docs, dtype=np.int64)])
+        self.tag_ids = np.concatenate([self.tag_ids, np.array(tag_ids, dtype=np.int64)])
+        self._count_tags()
+
+    def _count_tags(self):
+        self.tag_counts = np.bincount(self.tag_docs, minlength=len(self.note_ids))
+
+    def _tfidf(self, counts, extend=False):
+        """
+        L2-normalised TF-IDF weights keyed by term index.
+
+        Unknown terms are ignored, or with ``extend`` added to the vocabulary
+        as if they occurred in a single document.
+        """
+        if extend:
+            for term in counts:
+                if term not in self.vocabulary:
+                    self.vocabulary[term] = len(self.idf)
+                    self.idf.append(math.log((1 + self.document_count) / 2) + 1)
+        vector = {
+            self.vocabulary[term]: count * self.idf[self.vocabulary[term]]
+            for term, count in counts.items()
+            if term in self.vocabulary
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def scores(self, title, summary, category_id, tag_ids):
+        """Combined similarity of the given note data to every slot."""
+        size = len(self.note_ids)
+
+        query = np.zeros(len(self.idf))
+        for term, weight in self._tfidf(Counter(tokenize(f'{title} {summary}'))).items():
+            query[term] = weight
+        text = np.bincount(
+            self.text_docs,
+            weights=self.text_weights * query[self.text_terms],
+            minlength=size,
+        )
+
+        tags = np.zeros(size)
+        if tag_ids and len(self.tag_ids):
+            shared = np.bincount(
+                self.tag_docs,
+                weights=np.isin(self.tag_ids, list(tag_ids)).astype(np.float64),
+                minlength=size,
+            )
+            union = self.tag_counts + len(tag_ids) - shared
+            np.divide(shared, union, out=tags, where=union > 0)
+
+        category = (
+            (self.categories == category_id).astype(np.float64)
+            if category_id else np.zeros(size)
+        )
+
+        return TAG_WEIGHT * tags + CATEGORY_WEIGHT * category + TEXT_WEIGHT * text
+
+    def top_related(self, note, tag_ids, limit=RELATED_NOTES_LIMIT):
+        """
+        Get the best-scoring candidates for a note.
+
+        Returns:
+            list: (note_id, score) tuples, best first
+        """
+        if not len(self.note_ids):
+            return []
+        scores = self.scores(note.title, note.summary, note.category_id, tag_ids)
+        if note.pk in self.position:
+            scores[self.position[note.pk]] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(int(self.note_ids[i]), float(scores[i])) for i in candidates]
+
+
+def shared_index_version():
+    return cache.get(INDEX_VERSION_KEY, 0)
+
+
+def publish_index_changes(note_ids):
+    """
+    Record changed notes for every process's index.
+
+    Returns:
+        int: The new shared version
+    """
+    cache.add(INDEX_VERSION_KEY, 0, None)
+    version = cache.incr(INDEX_VERSION_KEY)
+    cache.set(INDEX_CHANGES_KEY.format(version), list(note_ids), INDEX_CHANGES_TIMEOUT)
+    return version
+
+
+def catch_up(index, version):
+    """
+    Replay the changes published after the index's version up to ``version``.
+
+    Returns:
+        bool: False when the changes are no longer available and the
+        index has to be rebuilt
+    """
+    if version == index.version:
+        return True
+    # A lower shared version means the cache was cleared
+    if version < index.version or version - index.version > MAX_REPLAYED_VERSIONS:
+        return False
+    keys = [INDEX_CHANGES_KEY.format(v) for v in range(index.version + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) < len(keys):
+        return False
+    index.update({note_id for note_ids in changes.values() for note_id in note_ids})
+    index.version = version
+    return True
+
+
+def get_index():
+    """Get the process-wide index, caught up with every published change."""
+    global _index
+    if (
+        _index is None
+        or time.monotonic() - _index.built_at > INDEX_MAX_AGE
+        or not catch_up(_index, shared_index_version())
+    ):
+        _index = RelatedNotesIndex.build()
+    return _index
+
+
+def reset_index():
+    """Drop the cached index; the next refresh rebuilds it."""
+    global _index
+    _index = None
+
+
+def store_related_notes(note_id, related):
+    """
+    Replace the stored recommendations for a note.
+
+    Also records the score a newcomer must beat to enter the list (0 while
+    the list has room), so refreshes can find affected notes without
+    aggregating the whole RelatedNote table.
+    """
+    floor = related[-1][1] if len(related) >= RELATED_NOTES_LIMIT else 0
+    with transaction.atomic():
+        RelatedNote.objects.filter(note_id=note_id).delete()
+        RelatedNote.objects.bulk_create([
+            RelatedNote(note_id=note_id, related_id=related_id, score=score, rank=rank)
+            for rank, (related_id, score) in enumerate(related)
+        ])
+        # update() skips auto_now and post_save, so nothing else is invalidated
+        Note.objects.filter(pk=note_id).update(related_score_floor=floor)
+
+
+def refresh_related_notes(note_ids, index=None):
+    """
+    Recompute recommendations for the given notes and for every note whose
+    stored list could gain or lose one of them.
+
+    Args:
+        note_ids: Notes that changed, were deactivated or were deleted
+        index: Optional index to use instead of the process-wide one
+
+    Returns:
+        list: Ids of the notes whose recommendations were rewritten
+    """
+    from .cache import bump_note_version
+
+    if index is None:
+        # Publishing first makes get_index() replay these notes with any
+        # changes from other processes it has not seen yet
+        publish_index_changes(note_ids)
+        index = get_index()
+    else:
+        index.update(note_ids)
+
+    notes = {note.pk: note for note in Note.objects.filter(pk__in=note_ids)}
+    tags = _tags_for(notes.keys())
+
+    # Notes that currently recommend a changed note must be re-ranked too
+    affected = set(notes) | set(
+        RelatedNote.objects.filter(related_id__in=note_ids).values_list('note_id', flat=True)
+    )
+
+    # ...as must any note for which a changed note now beats its weakest entry
+    best = np.zeros(len(index.note_ids))
+    for note in notes.values():
+        np.maximum(best, index.scores(
+            note.title, note.summary, note.category_id, tags.get(note.pk, set())
+        ), out=best)
+    candidates = {int(index.note_ids[i]): best[i] for i in np.flatnonzero(best > 0)}
+    top_score = max(candidates.values(), default=0)
+    for chunk in _chunks(list(candidates)):
+        for note_id, floor in Note.objects.filter(
+            pk__in=chunk, related_score_floor__lt=top_score
+        ).values_list('pk', 'related_score_floor'):
+            if candidates[note_id] > floor:
+                affected.add(note_id)
+
+    missing = affected - set(notes)
+    for chunk in _chunks(list(missing)):
+        notes.update({note.pk: note for note in Note.objects.filter(pk__in=chunk)})
+    tags.update(_tags_for(missing))
+
+    # Another process may have changed notes since this index was patched;
+    # never store a recommendation for a note that is no longer active
+    ranked = {
+        note.pk: index.top_related(note, tags.get(note.pk, set()), limit=RELATED_NOTES_LIMIT * 2)
+        for note in notes.values()
+    }
+    active = _active_ids({related_id for related in ranked.values() for related_id, _ in related})
+
+    for note_id, related in ranked.items():
+        related = [(related_id, score) for related_id, score in related if related_id in active]
+        store_related_notes(note_id, related[:RELATED_NOTES_LIMIT])
+        bump_note_version(note_id, 'related')
+    return list(notes)
+
+
+def rebuild_related_notes(batch_size=500):
+    """Rebuild the index and recompute recommendations for every note."""
+    global _index
+    from .cache import bump_note_version
+
+    _index = index = RelatedNotesIndex.build()
+    note_ids = list(Note.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(note_ids), batch_size):
+        batch = note_ids[start:start + batch_size]
+        tags = _tags_for(batch)
+        for note in Note.objects.filter(pk__in=batch):
+            store_related_notes(note.pk, index.top_related(note, tags.get(note.pk, set())))
+            bump_note_version(note.pk, 'related')
+    return len(note_ids)
+
+
+def _chunks(ids):
+    for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+        yield ids[start:start + QUERY_CHUNK_SIZE]
+
+
+def _tags_for(note_ids):
+    tags = {}
+    for chunk in _chunks(list(note_ids)):
+        for note_id, tag_id in Note.tags.through.objects.filter(
+            note_id__in=chunk
+        ).values_list('note_id', 'tag_id'):
+            tags.setdefault(note_id, set()).add(tag_id)
+    return tags
+
+
+def _active_ids(note_ids):
+    active = set()
+    for chunk in _chunks(list(note_ids)):
+        active.update(
+            Note.objects.filter(pk__in=chunk, status=Note.Status.ACTIVE).values_list('pk', flat=True)
+        )
+    return active
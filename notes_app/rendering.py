@@ -0,0 +1,41 @@
+"""
+Notes App Rendering
+
+Turns note text into the HTML and metadata shown on note pages. The results
+are stored on the note when it is saved, so pages never re-process large
+note bodies per request.
+"""
+from django.utils.html import linebreaks, urlize
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 25
+
+
+def render_content(content):
+    """Escape, linkify and paragraph note content (same as |urlize|linebreaks)."""
+    return linebreaks(urlize(content, nofollow=True, autoescape=True))
+
+
+def count_words(content):
+    return len(content.split())
+
+
+def make_excerpt(summary, content):
+    """Short plain-text teaser for list pages."""
+    return Truncator(summary or content).words(EXCERPT_WORDS)
+
+
+def render_note(note):
+    """
+    Fill a note's derived text fields from its content and summary.
+
+    Returns:
+        list: Names of the fields that were set
+    """
+    note.rendered_content = render_content(note.content)
+    note.word_count = count_words(note.content)
+    note.excerpt = make_excerpt(note.summary, note.content)
+    return RENDERED_FIELDS
+
+
+RENDERED_FIELDS = ['rendered_content', 'word_count', 'excerpt']
@@ -0,0 +1,128 @@
+"""
+Notes App Signals
+
+Keeps the fragment cache version tokens in step with comment, attachment
+and tag changes, invalidates author stats, and schedules related-note
+recomputation when notes change. Search indexing has its own receivers in
+elasticsearch_app.signals; schedule_search_update covers update() calls.
+"""
+import logging
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_note_version
+from .models import Attachment, Comment, Note, Tag
+from .stats import invalidate_author_stats
+
+logger = logging.getLogger(__name__)
+
+# Saves that only touch these fields cannot change recommendations
+UNSCORED_FIELDS = {'view_count', 'is_pinned', 'updated_at'}
+
+# ...or the author's note stats
+UNCOUNTED_FIELDS = {'view_count', 'updated_at'}
+
+RELATED_DEBOUNCE_SECONDS = 5
+
+# Marker outlives the countdown so a slow worker does not cause duplicates
+RELATED_PENDING_GRACE_SECONDS = 60
+
+
+def related_pending_key(note_id):
+    return f'notes_app:related_pending:{note_id}'
+
+
+def schedule_related_update(note_ids):
+    """
+    Queue a related-notes refresh once the current transaction commits.
+
+    The task runs after a short countdown; notes changed again before it
+    starts are picked up by that same task.
+    """
+    note_ids = list(note_ids)
+    if not note_ids:
+        return
+
+    def enqueue():
+        from .tasks import update_related_notes
+        timeout = RELATED_DEBOUNCE_SECONDS + RELATED_PENDING_GRACE_SECONDS
+        pending = [note_id for note_id in note_ids if cache.add(related_pending_key(note_id), True, timeout)]
+        if not pending:
+            return
+        try:
+            update_related_notes.apply_async(args=[pending], countdown=RELATED_DEBOUNCE_SECONDS)
+        except Exception:
+            # Recommendations go stale until the next change; never fail the save
+            cache.delete_many([related_pending_key(note_id) for note_id in pending])
+            logger.warning('Could not queue related notes update for %s', pending, exc_info=True)
+
+    transaction.on_commit(enqueue)
+
+
+def schedule_search_update(note_ids):
+    """Re-index notes changed with update(), which sends no post_save."""
+    if not apps.is_installed('elasticsearch_app'):
+        return
+    from elasticsearch_app.signals import queue_documents
+    queue_documents('note', note_ids)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    bump_note_version(instance.note_id, 'comments')
+
+
+@receiver([post_save, post_delete], sender=Attachment)
+def attachment_changed(sender, instance, **kwargs):
+    bump_note_version(instance.note_id, 'attachments')
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def note_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Clears are handled before they happen, while the affected rows still exist
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        note_ids = [instance.pk]
+    elif action == 'pre_clear':
+        note_ids = instance.notes.values_list('pk', flat=True)
+    else:
+        note_ids = pk_set
+    note_ids = list(note_ids)
+    for note_id in note_ids:
+        bump_note_version(note_id, 'tags')
+    schedule_related_update(note_ids)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    # Tag badges show the name and slug, so a rename stales every tagged note
+    if created:
+        return
+    for note_id in instance.notes.values_list('pk', flat=True):
+        bump_note_version(note_id, 'tags')
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, update_fields=None, **kwargs):
+    if not update_fields or not set(update_fields) <= UNCOUNTED_FIELDS:
+        # A reassigned note also changes its previous author's counts
+        invalidate_author_stats(instance.author_id, getattr(instance, '_loaded_author_id', None))
+    if update_fields and set(update_fields) <= UNSCORED_FIELDS:
+        return
+    schedule_related_update([instance.pk])
+
+
+@receiver(pre_delete, sender=Note)
+def note_deleted(sender, instance, **kwargs):
+    # Rows pointing at the note cascade away; refresh the notes that lose one,
+    # and pass the note itself so cached indexes drop it
+    invalidate_author_stats(instance.author_id)
+    note_ids = [instance.pk] + list(
+        instance.recommended_for.values_list('note_id', flat=True)
+    )
+    schedule_related_update(note_ids)
@@ -0,0 +1,60 @@
+"""
+Notes App Author Stats
+
+Per-author note counts computed in a single conditional-aggregation query
+and cached until one of the author's notes is saved or deleted (see
+signals.py and tasks.apply_bulk_action).
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Note
+
+STATS_TIMEOUT = 60 * 60 * 24
+
+
+def _stats_key(author_id):
+    return f'notes_app:author_stats:{author_id}'
+
+
+def compute_author_stats(author_id):
+    """Count an author's notes by status in one query."""
+    stats = Note.objects.filter(author_id=author_id).aggregate(
+        total=Count('pk'),
+        draft=Count('pk', filter=Q(status=Note.Status.DRAFT)),
+        active=Count('pk', filter=Q(status=Note.Status.ACTIVE)),
+        archived=Count('pk', filter=Q(status=Note.Status.ARCHIVED)),
+        pinned=Count('pk', filter=Q(is_pinned=True)),
+        public=Count('pk', filter=Q(is_public=True)),
+        words=Sum('word_count'),
+    )
+    stats['words'] = stats['words'] or 0
+    return stats
+
+
+def get_author_stats(author_id):
+    """
+    Get an author's note stats, from the cache when possible.
+
+    Returns:
+        dict: total, draft, active, archived, pinned, public and words
+    """
+    stats = cache.get(_stats_key(author_id))
+    if stats is None:
+        stats = compute_author_stats(author_id)
+        cache.set(_stats_key(author_id), stats, STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_author_stats(*author_ids):
+    """
+    Drop the cached stats of the given authors once the current
+    transaction commits.
+
+    Dropping them earlier lets a concurrent request cache counts that
+    miss the uncommitted change.
+    """
+    keys = [_stats_key(author_id) for author_id in author_ids if author_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,183 @@
+"""
+Notes App Celery Tasks
+
+Background bulk note actions, attachment post-processing and maintenance
+of the precomputed related-notes table.
+"""
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+
+BULK_CHUNK_SIZE = 500
+
+# Past tense of each bulk action, for messages
+BULK_ACTIONS = {
+    'archive': 'archived',
+    'publish': 'published',
+    'delete': 'deleted',
+}
+
+
+def apply_bulk_action(notes, action):
+    """
+    Apply a bulk action to a queryset of notes.
+    
+    Returns:
+        int: Number of notes affected
+    """
+    from .models import Note
+    from .signals import schedule_related_update, schedule_search_update
+    from .stats import invalidate_author_stats
+    
+    if action == 'delete':
+        count = notes.count()
+        notes.delete()
+        return count
+    
+    note_ids = list(notes.values_list('pk', flat=True))
+    author_ids = set(notes.values_list('author_id', flat=True))
+    # update() skips auto_now; bump updated_at so cached note cards refresh
+    now = timezone.now()
+    if action == 'archive':
+        count = notes.update(status=Note.Status.ARCHIVED, updated_at=now)
+    elif action == 'publish':
+        count = notes.update(status=Note.Status.ACTIVE, published_at=now, updated_at=now)
+    else:
+        raise ValueError(f'Unknown bulk action: {action}')
+    
+    # update() sends no post_save, so drop the author stats and queue the
+    # recommendation refresh and search re-index here
+    invalidate_author_stats(*author_ids)
+    schedule_related_update(note_ids)
+    schedule_search_update(note_ids)
+    return count
+
+
+@shared_task(bind=True)
+def bulk_note_action(self, user_id, action, note_ids, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Apply a bulk action to a user's notes in chunks, reporting progress.
+    
+    Args:
+        user_id: Owner of the notes; other users' notes are skipped
+        action: One of BULK_ACTIONS
+        note_ids: Ids of the selected notes
+        chunk_size: Notes handled per transaction
+    """
+    from celery_progress_custom_app.backend import WebSocketProgressRecorder
+    from user_account.notifications import notify_user
+    from .models import Note
+    
+    progress_recorder = WebSocketProgressRecorder(self)
+    total = len(note_ids)
+    processed = 0
+    affected = 0
+    
+    for start in range(0, total, chunk_size):
+        chunk = note_ids[start:start + chunk_size]
+        with transaction.atomic():
+            affected += apply_bulk_action(
+                Note.objects.filter(id__in=chunk, author_id=user_id),
+                action
+            )
+        processed += len(chunk)
+        progress_recorder.set_progress(
+            processed, total, f'{affected} notes {BULK_ACTIONS[action]}'
+        )
+    
+    notify_user(
+        user_id,
+        'Bulk action finished',
+        f'{affected} notes {BULK_ACTIONS[action]}.',
+        level='success',
+        icon='fa-layer-group'
+    )
+    return {'success': True, 'action': action, 'count': affected}
+
+
+@shared_task(bind=True)
+def update_related_notes(self, note_ids):
+    """
+    Recompute recommendations after notes were created, edited or deleted.
+
+    Args:
+        note_ids: Ids of the changed notes
+    """
+    from django.core.cache import cache
+    from .recommendations import refresh_related_notes
+    from .signals import related_pending_key
+
+    # Changes from here on queue a new task
+    cache.delete_many([related_pending_key(note_id) for note_id in note_ids])
+    updated = refresh_related_notes(note_ids)
+    return {'success': True, 'updated': len(updated)}
+
+
+@shared_task(bind=True)
+def rebuild_related_notes(self):
+    """
+    Recompute recommendations for every note.
+    """
+    from .recommendations import rebuild_related_notes as rebuild
+
+    total = rebuild()
+    return {'success': True, 'total': total}
+
+
+@shared_task(bind=True)
+def process_attachment(self, attachment_id):
+    """
+    Fill in an attachment's MIME type, checksum and thumbnail.
+    
+    Args:
+        attachment_id: Attachment to process
+    """
+    from .models import Attachment
+    from .uploads import file_digest, make_thumbnail, sniff_mime_type
+    
+    try:
+        attachment = Attachment.objects.get(pk=attachment_id)
+    except Attachment.DoesNotExist:
+        return {'success': False, 'error': 'Attachment not found'}
+    
+    with attachment.file.open('rb') as stored:
+        checksum, header = file_digest(stored)
+        attachment.checksum = checksum
+        attachment.mime_type = sniff_mime_type(header, attachment.filename)
+        
+        if attachment.mime_type.startswith('image/'):
+            thumbnail = make_thumbnail(stored)
+            if thumbnail is not None:
+                attachment.thumbnail.save(f'{attachment.pk}.png', thumbnail, save=False)
+    
+    update_fields = ['checksum', 'mime_type', 'thumbnail', 'processed_at']
+    adopt = getattr(attachment.file.storage, 'adopt', None)
+    if adopt is not None:
+        # Chunked uploads were written around the deduplicating save();
+        # share an existing copy of the content if there is one
+        attachment.file.name = adopt(attachment.file.name, checksum, attachment.file_size)
+        update_fields.append('file')
+    
+    attachment.processed_at = timezone.now()
+    attachment.save(update_fields=update_fields)
+    return {'success': True, 'mime_type': attachment.mime_type, 'checksum': checksum}
+
+
+@shared_task(bind=True)
+def abort_stale_attachment_uploads(self, max_age_hours=24):
+    """
+    Abort chunked uploads that stopped receiving parts, so their stored
+    parts (billed S3 multipart storage) are released.
+    """
+    from datetime import timedelta
+    from .models import AttachmentUpload
+    from .uploads import abort_upload
+    
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    aborted = 0
+    for upload in AttachmentUpload.objects.filter(
+        status=AttachmentUpload.Status.ACTIVE, updated_at__lt=cutoff
+    ).iterator():
+        abort_upload(upload)
+        aborted += 1
+    return {'success': True, 'aborted': aborted}
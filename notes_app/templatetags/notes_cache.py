@@ -0,0 +1,73 @@
+"""
+Template fragment caching with per-request hit/miss accounting.
+
+Works like Django's ``{% cache %}`` tag, but records every lookup on the
+current request so FragmentCacheMetricsMiddleware can report the hit ratio.
+
+Usage::
+
+    {% load notes_cache %}
+    {% versioned_cache 600 note_body note.pk note.updated_at %}
+        .. expensive rendering ..
+    {% endversioned_cache %}
+"""
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+
+register = template.Library()
+
+
+def get_fragment_cache():
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def record_fragment_lookup(request, hit):
+    """Count a fragment cache lookup against the request, if there is one."""
+    if request is None:
+        return
+    stats = getattr(request, 'fragment_cache_stats', None)
+    if stats is None:
+        stats = request.fragment_cache_stats = {'hits': 0, 'misses': 0}
+    stats['hits' if hit else 'misses'] += 1
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+    
+    def render(self, context):
+        expire_time = self.expire_time.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        cache_key = make_template_fragment_key(self.fragment_name, vary_on)
+        fragment_cache = get_fragment_cache()
+        
+        value = fragment_cache.get(cache_key)
+        record_fragment_lookup(context.get('request'), hit=value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            fragment_cache.set(cache_key, value, int(expire_time))
+        return value
+
+
+@register.tag('versioned_cache')
+def do_versioned_cache(parser, token):
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments."
+        )
+    return VersionedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(t) for t in tokens[3:]],
+    )
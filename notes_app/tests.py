@@ -4,6 +4,7 @@ Notes App Tests - Django Test Enforcer
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from unittest.mock import patch
 
 User = get_user_model()
 
@@ -563,3 +564,1017 @@ class NoteFilterTests(TestCase):
         """Test searching notes by title"""
         matching_notes = Note.objects.filter(author=self.user, title__icontains='Draft')
         self.assertEqual(matching_notes.count(), 3)
+
+
+class RandomNoteSelectionTests(TestCase):
+    """Tests for the id-range random note selection"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(
+            username=f'randomuser{uuid.uuid4().hex[:8]}',
+            email=f'random{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+    
+    def _create_note(self, **kwargs):
+        defaults = {
+            'title': 'Random Note',
+            'content': 'Content',
+            'author': self.user,
+            'slug': f'random-note-{uuid.uuid4().hex[:8]}',
+            'status': Note.Status.ACTIVE,
+            'is_public': True,
+        }
+        defaults.update(kwargs)
+        return Note.objects.create(**defaults)
+    
+    def test_random_instance_empty_queryset(self):
+        """Test random_instance returns None for an empty queryset"""
+        from django_starter.utils import random_instance
+        self.assertIsNone(random_instance(Note.objects.none()))
+    
+    def test_random_instance_only_returns_matching_rows(self):
+        """Test random_instance never returns rows outside the queryset"""
+        from django_starter.utils import random_instance
+        public = [self._create_note() for _ in range(3)]
+        self._create_note(is_public=False)
+        queryset = Note.objects.filter(is_public=True)
+        
+        picks = {random_instance(queryset).pk for _ in range(30)}
+        self.assertTrue(picks <= {note.pk for note in public})
+    
+    def test_random_instance_wraps_around(self):
+        """Test a pivot past the last match wraps to the first row"""
+        from django_starter.utils import random_instance
+        first = self._create_note()
+        self._create_note(is_public=False)
+        
+        with patch('django_starter.utils.random.randint', side_effect=lambda low, high: high + 1):
+            picked = random_instance(Note.objects.filter(is_public=True))
+        self.assertEqual(picked, first)
+    
+    def test_random_note_redirect_view(self):
+        """Test the random view redirects to a public active note"""
+        note = self._create_note()
+        response = self.client.get(reverse('notes_app:random_note'))
+        self.assertRedirects(response, note.get_absolute_url(), fetch_redirect_response=False)
+    
+    def test_benchmark_random_note_command(self):
+        """Test the benchmark command runs and leaves no data behind"""
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('benchmark_random_note', notes=50, iterations=2, stdout=out)
+        self.assertIn('id range lookup', out.getvalue())
+        self.assertFalse(Note.objects.filter(slug__startswith='benchmark-').exists())
+
+
+class NoteFragmentCacheTests(TestCase):
+    """Tests for versioned template fragment caching on note pages"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(
+            username=f'cacheuser{uuid.uuid4().hex[:8]}',
+            email=f'cache{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        self.note = Note.objects.create(
+            title='Cached Note',
+            content='Original body',
+            author=self.user,
+            slug=f'cached-note-{uuid.uuid4().hex[:8]}',
+            status=Note.Status.ACTIVE,
+            is_public=True,
+        )
+        self.url = self.note.get_absolute_url()
+    
+    def test_second_anonymous_view_is_served_from_cache(self):
+        """Test repeat anonymous views hit every fragment"""
+        first = self.client.get(self.url)
+        self.assertIn('hits=0', first['X-Fragment-Cache'])
+        
+        second = self.client.get(self.url)
+        self.assertIn('misses=0', second['X-Fragment-Cache'])
+        self.assertIn('ratio=1.00', second['X-Fragment-Cache'])
+    
+    def test_comment_invalidates_comment_fragment(self):
+        """Test a new comment shows up on the next view"""
+        self.client.get(self.url)
+        Comment.objects.create(note=self.note, author=self.user, content='Fresh comment')
+        
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Fresh comment')
+        self.assertIn('misses=1', response['X-Fragment-Cache'])
+    
+    def test_note_edit_invalidates_body_fragment(self):
+        """Test saving the note re-renders its body"""
+        self.client.get(self.url)
+        self.note.content = 'Edited body'
+        self.note.save()
+        
+        self.assertContains(self.client.get(self.url), 'Edited body')
+    
+    def test_tag_change_invalidates_body_fragment(self):
+        """Test adding a tag re-renders the body without touching the note"""
+        self.client.get(self.url)
+        tag = Tag.objects.create(name='cached-tag', slug=f'cached-tag-{uuid.uuid4().hex[:8]}')
+        self.note.tags.add(tag)
+        
+        self.assertContains(self.client.get(self.url), 'cached-tag')
+    
+    def test_tag_rename_invalidates_body_fragment(self):
+        """Test renaming a tag re-renders the notes that carry it"""
+        tag = Tag.objects.create(name='old-name', slug=f'old-name-{uuid.uuid4().hex[:8]}')
+        self.note.tags.add(tag)
+        self.client.get(self.url)
+        tag.name = 'new-name'
+        tag.save()
+        
+        self.assertContains(self.client.get(self.url), 'new-name')
+    
+    def test_comment_fragment_is_shared_between_users(self):
+        """Test the comments fragment is not keyed per user"""
+        Comment.objects.create(note=self.note, author=self.user, content='Shared comment')
+        self.client.force_login(self.user)
+        self.client.get(self.url)
+        
+        other = User.objects.create_user(
+            username=f'other{uuid.uuid4().hex[:8]}',
+            email=f'other{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        self.client.force_login(other)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'comment-delete btn btn-sm btn-link text-danger p-0 d-none')
+        self.assertIn('misses=0', response['X-Fragment-Cache'])
+
+
+class RelatedNotesTests(TestCase):
+    """Tests for precomputed related-note recommendations"""
+    
+    def setUp(self):
+        from .recommendations import reset_index
+        reset_index()
+        self.user = User.objects.create_user(
+            username=f'relateduser{uuid.uuid4().hex[:8]}',
+            email=f'related{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(
+            name='Cooking', slug=f'cooking-{uuid.uuid4().hex[:8]}'
+        )
+        self.tag = Tag.objects.create(name='pasta', slug=f'pasta-{uuid.uuid4().hex[:8]}')
+    
+    def _create_note(self, title, summary='', **kwargs):
+        kwargs.setdefault('status', Note.Status.ACTIVE)
+        kwargs.setdefault('is_public', True)
+        return Note.objects.create(
+            title=title,
+            summary=summary,
+            content='Body',
+            author=self.user,
+            slug=f'{slugify(title)}-{uuid.uuid4().hex[:8]}',
+            **kwargs
+        )
+    
+    def test_scores_rank_tags_category_and_text(self):
+        """Test shared tags and text outrank a category-only match"""
+        from .recommendations import RelatedNotesIndex
+        source = self._create_note('Tomato pasta sauce', 'Slow cooked tomato sauce', category=self.category)
+        best = self._create_note('Fresh tomato pasta', 'Quick tomato sauce', category=self.category)
+        weak = self._create_note('Bread baking', 'Sourdough starter', category=self.category)
+        unrelated = self._create_note('Garden planning', 'Raised beds')
+        source.tags.add(self.tag)
+        best.tags.add(self.tag)
+        
+        related = RelatedNotesIndex.build().top_related(source, {self.tag.pk})
+        ids = [note_id for note_id, score in related]
+        self.assertEqual(ids, [best.pk, weak.pk])
+        self.assertNotIn(unrelated.pk, ids)
+        self.assertNotIn(source.pk, ids)
+    
+    def test_top_related_is_limited(self):
+        """Test only the top-k neighbours are returned"""
+        from .recommendations import RELATED_NOTES_LIMIT, RelatedNotesIndex
+        source = self._create_note('Source', category=self.category)
+        for i in range(RELATED_NOTES_LIMIT + 3):
+            self._create_note(f'Candidate {i}', category=self.category)
+        
+        related = RelatedNotesIndex.build().top_related(source, set())
+        self.assertEqual(len(related), RELATED_NOTES_LIMIT)
+    
+    def test_refresh_updates_neighbours(self):
+        """Test a new note is added to the lists of notes it is similar to"""
+        from .models import RelatedNote
+        from .recommendations import rebuild_related_notes, refresh_related_notes
+        existing = self._create_note('Tomato pasta sauce', category=self.category)
+        rebuild_related_notes()
+        self.assertFalse(RelatedNote.objects.filter(note=existing).exists())
+        
+        new = self._create_note('Tomato pasta bake', category=self.category)
+        refresh_related_notes([new.pk])
+        
+        self.assertTrue(RelatedNote.objects.filter(note=existing, related=new, rank=0).exists())
+        self.assertTrue(RelatedNote.objects.filter(note=new, related=existing).exists())
+    
+    def test_detail_view_uses_stored_recommendations(self):
+        """Test the detail page lists stored recommendations in rank order"""
+        from .models import RelatedNote
+        source = self._create_note('Source', category=self.category)
+        first = self._create_note('First pick')
+        second = self._create_note('Second pick')
+        self._create_note('Same category only', category=self.category)
+        RelatedNote.objects.create(note=source, related=second, score=0.2, rank=1)
+        RelatedNote.objects.create(note=source, related=first, score=0.5, rank=0)
+        
+        response = self.client.get(source.get_absolute_url())
+        self.assertEqual(list(response.context['related_notes']), [first, second])
+    
+    def test_detail_view_falls_back_to_category(self):
+        """Test notes without stored rows still show same-category notes"""
+        source = self._create_note('Source', category=self.category)
+        sibling = self._create_note('Sibling', category=self.category)
+        self._create_note('Elsewhere')
+        
+        response = self.client.get(source.get_absolute_url())
+        self.assertEqual(list(response.context['related_notes']), [sibling])
+    
+    def test_store_tracks_score_floor(self):
+        """Test the lowest score is recorded once a note's list is full"""
+        from .recommendations import RELATED_NOTES_LIMIT, store_related_notes
+        source = self._create_note('Source')
+        others = [self._create_note(f'Other {i}') for i in range(RELATED_NOTES_LIMIT)]
+        
+        store_related_notes(source.pk, [(others[0].pk, 0.9)])
+        source.refresh_from_db()
+        self.assertEqual(source.related_score_floor, 0)
+        
+        store_related_notes(source.pk, [(note.pk, 0.9 - i * 0.1) for i, note in enumerate(others)])
+        source.refresh_from_db()
+        self.assertAlmostEqual(source.related_score_floor, 0.5)
+    
+    def test_cached_index_is_patched_incrementally(self):
+        """Test refreshes reuse the cached index and drop deleted notes"""
+        from .models import RelatedNote
+        from .recommendations import get_index, refresh_related_notes
+        existing = self._create_note('Tomato pasta sauce', category=self.category)
+        index = get_index()
+        
+        new = self._create_note('Tomato pasta bake', category=self.category)
+        refresh_related_notes([new.pk])
+        self.assertIs(get_index(), index)
+        self.assertIn(new.pk, index.position)
+        self.assertTrue(RelatedNote.objects.filter(note=existing, related=new).exists())
+        
+        new_id = new.pk
+        new.delete()
+        refresh_related_notes([new_id, existing.pk])
+        self.assertEqual(index.scores('Tomato pasta bake', '', None, set())[index.position[new_id]], 0)
+        self.assertFalse(RelatedNote.objects.filter(note=existing).exists())
+    
+    def test_rebuild_command_backfills(self):
+        """Test the rebuild command fills the table for existing notes"""
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import RelatedNote
+        first = self._create_note('Tomato pasta sauce', category=self.category)
+        second = self._create_note('Tomato pasta bake', category=self.category)
+        
+        out = StringIO()
+        call_command('rebuild_related_notes', stdout=out)
+        self.assertIn('2 notes', out.getvalue())
+        self.assertTrue(RelatedNote.objects.filter(note=first, related=second).exists())
+    
+    def test_note_save_schedules_update(self):
+        """Test editing a note queues one recommendation update after commit"""
+        from django.core.cache import cache
+        from .signals import RELATED_DEBOUNCE_SECONDS
+        cache.clear()
+        note = self._create_note('Queued note')
+        cache.clear()
+        
+        with patch('notes_app.tasks.update_related_notes.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                note.title = 'Queued note edited'
+                note.save()
+                note.save()
+                note.increment_view_count()
+        apply_async.assert_called_once_with(args=[[note.pk]], countdown=RELATED_DEBOUNCE_SECONDS)
+    
+    def test_running_task_clears_pending_marker(self):
+        """Test a change after the task starts queues a new task"""
+        from django.core.cache import cache
+        from .tasks import update_related_notes
+        cache.clear()
+        note = self._create_note('Queued note')
+        
+        with patch('notes_app.tasks.update_related_notes.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                note.save()
+            update_related_notes.run([note.pk])
+            with self.captureOnCommitCallbacks(execute=True):
+                note.save()
+        self.assertEqual(apply_async.call_count, 2)
+    
+    def test_other_process_index_catches_up(self):
+        """Test an index built elsewhere replays published changes"""
+        from .recommendations import RelatedNotesIndex, catch_up, get_index, refresh_related_notes, reset_index
+        existing = self._create_note('Tomato pasta sauce', category=self.category)
+        other = RelatedNotesIndex.build()
+        
+        new = self._create_note('Tomato pasta bake', category=self.category)
+        refresh_related_notes([new.pk])
+        self.assertNotIn(new.pk, other.position)
+        reset_index()
+        index = get_index()
+        self.assertIn(new.pk, index.position)
+        
+        self.assertTrue(catch_up(other, index.version))
+        self.assertIn(new.pk, other.position)
+        self.assertIn(existing.pk, other.position)
+        other.version -= 1000
+        self.assertFalse(catch_up(other, index.version))
+
+
+class CommentPaginationTests(TestCase):
+    """Tests for keyset-paginated comment loading"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(
+            username=f'commenter{uuid.uuid4().hex[:8]}',
+            email=f'commenter{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        self.note = Note.objects.create(
+            title='Busy Note',
+            content='Lots of discussion',
+            author=self.user,
+            slug=f'busy-note-{uuid.uuid4().hex[:8]}',
+            status=Note.Status.ACTIVE,
+            is_public=True,
+        )
+        self.url = reverse('notes_app:note_comments', kwargs={'slug': self.note.slug})
+    
+    def _create_comments(self, count):
+        Comment.objects.bulk_create([
+            Comment(note=self.note, author=self.user, content=f'Comment {i}')
+            for i in range(count)
+        ])
+    
+    def test_cursor_round_trip(self):
+        """Test cursors decode back to the encoded sort key"""
+        from django.utils import timezone
+        from .pagination import decode_cursor, encode_cursor
+        now = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor([now, 7])), [now.isoformat(), 7])
+    
+    def test_keyset_pages_cover_every_row_once(self):
+        """Test walking the cursors visits each comment exactly once, in order"""
+        from django.utils import timezone
+        from .pagination import keyset_paginate
+        # Identical timestamps make the id tiebreaker do the work
+        self._create_comments(7)
+        Comment.objects.filter(note=self.note).update(created_at=timezone.now())
+        
+        seen, cursor = [], None
+        while True:
+            page, cursor = keyset_paginate(
+                Comment.objects.filter(note=self.note), ('created_at', 'id'), cursor, limit=3
+            )
+            seen.extend(comment.pk for comment in page)
+            if not cursor:
+                break
+        self.assertEqual(seen, list(
+            Comment.objects.filter(note=self.note).order_by('created_at', 'id').values_list('pk', flat=True)
+        ))
+    
+    def test_descending_ordering(self):
+        """Test descending keys page from newest to oldest"""
+        from .pagination import keyset_paginate
+        self._create_comments(5)
+        first, cursor = keyset_paginate(Comment.objects.all(), ('-created_at', '-id'), limit=2)
+        second, _ = keyset_paginate(Comment.objects.all(), ('-created_at', '-id'), cursor, limit=2)
+        ids = [comment.pk for comment in first + second]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+    
+    def test_detail_renders_first_page_only(self):
+        """Test the detail page renders one page and a load more cursor"""
+        from .views import COMMENTS_PAGE_SIZE
+        self._create_comments(COMMENTS_PAGE_SIZE + 5)
+        response = self.client.get(self.note.get_absolute_url())
+        self.assertContains(response, 'Comment 0')
+        self.assertNotContains(response, f'Comment {COMMENTS_PAGE_SIZE + 4}')
+        self.assertContains(response, 'load-more-comments')
+    
+    def test_comments_endpoint_returns_next_page(self):
+        """Test the JSON endpoint continues from the cursor"""
+        from .views import COMMENTS_PAGE_SIZE
+        self._create_comments(COMMENTS_PAGE_SIZE + 5)
+        first = self.client.get(self.url).json()
+        self.assertEqual(len(first['comments']), COMMENTS_PAGE_SIZE)
+        
+        second = self.client.get(self.url, {'cursor': first['next_cursor']}).json()
+        self.assertEqual(len(second['comments']), 5)
+        self.assertIsNone(second['next_cursor'])
+        self.assertIn(f'Comment {COMMENTS_PAGE_SIZE + 4}', second['html'])
+    
+    def test_comments_endpoint_rejects_bad_cursor(self):
+        """Test a malformed cursor returns 400"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_comments_endpoint_rejects_mistyped_cursor(self):
+        """Test well-formed cursors holding values of the wrong type return 400"""
+        from .pagination import encode_cursor
+        for values in (['abc', 1], [None, None], [{'a': 1}, 1], ['2024-01-01T00:00:00+00:00', 'x']):
+            response = self.client.get(self.url, {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+    
+    def test_comments_endpoint_hides_private_notes(self):
+        """Test anonymous users cannot page through a private note's comments"""
+        self.note.is_public = False
+        self.note.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkActionTests(TestCase):
+    """Tests for synchronous and background bulk note actions"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=f'bulkuser{uuid.uuid4().hex[:8]}',
+            email=f'bulk{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        self.client.force_login(self.user)
+        self.url = reverse('notes_app:bulk_action')
+        self.notes = [
+            Note.objects.create(
+                title=f'Bulk {i}',
+                content='Body',
+                author=self.user,
+                slug=f'bulk-{i}-{uuid.uuid4().hex[:8]}',
+            )
+            for i in range(3)
+        ]
+        self.note_ids = [str(note.pk) for note in self.notes]
+    
+    def test_small_selection_runs_inline(self):
+        """Test selections under the threshold are applied in the request"""
+        with patch('notes_app.views.bulk_note_action.delay') as delay:
+            response = self.client.post(self.url, {'action': 'archive', 'note_ids': self.note_ids})
+        self.assertRedirects(response, reverse('notes_app:my_notes'), fetch_redirect_response=False)
+        delay.assert_not_called()
+        self.assertEqual(Note.objects.filter(status=Note.Status.ARCHIVED).count(), 3)
+    
+    def test_large_selection_is_queued(self):
+        """Test selections over the threshold are handed to Celery"""
+        from django.test import override_settings
+        with override_settings(NOTES_BULK_ASYNC_THRESHOLD=2):
+            with patch('notes_app.views.bulk_note_action.delay') as delay:
+                delay.return_value.id = 'abc-123'
+                response = self.client.post(self.url, {'action': 'delete', 'note_ids': self.note_ids})
+        
+        delay.assert_called_once_with(self.user.pk, 'delete', [note.pk for note in self.notes])
+        self.assertEqual(response.url, f'{self.url}?task_id=abc-123')
+        self.assertEqual(Note.objects.filter(author=self.user).count(), 3)
+    
+    def test_task_processes_chunks_and_notifies(self):
+        """Test the task reports progress per chunk and notifies the owner"""
+        from .tasks import bulk_note_action
+        other = User.objects.create_user(
+            username=f'other{uuid.uuid4().hex[:8]}',
+            email=f'other{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        foreign = Note.objects.create(
+            title='Not mine', content='Body', author=other, slug=f'not-mine-{uuid.uuid4().hex[:8]}'
+        )
+        note_ids = [note.pk for note in self.notes] + [foreign.pk]
+        
+        with patch('celery_progress_custom_app.backend.WebSocketProgressRecorder') as recorder, \
+                patch('user_account.notifications.notify_user') as notify:
+            result = bulk_note_action(self.user.pk, 'delete', note_ids, chunk_size=2)
+        
+        self.assertEqual(result, {'success': True, 'action': 'delete', 'count': 3})
+        self.assertEqual(recorder.return_value.set_progress.call_count, 2)
+        recorder.return_value.set_progress.assert_called_with(4, 4, '3 notes deleted')
+        self.assertEqual(notify.call_args.args[:3], (self.user.pk, 'Bulk action finished', '3 notes deleted.'))
+        self.assertTrue(Note.objects.filter(pk=foreign.pk).exists())
+    
+    def test_invalid_task_id_is_dropped(self):
+        """Test task ids outside the websocket route format never reach the page"""
+        response = self.client.get(self.url, {'task_id': "x');alert(1);//"})
+        self.assertIsNone(response.context['task_id'])
+        self.assertNotContains(response, 'alert(1)')
+        
+        response = self.client.get(self.url, {'task_id': 'abc-123'})
+        self.assertEqual(response.context['task_id'], 'abc-123')
+
+
+class NoteRenderingTests(TestCase):
+    """Tests for stored rendered content, word counts and excerpts"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username=f'renderuser{uuid.uuid4().hex[:8]}',
+            email=f'render{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+    
+    def _create_note(self, content, **kwargs):
+        return Note.objects.create(
+            title='Rendered',
+            content=content,
+            author=self.user,
+            slug=f'rendered-{uuid.uuid4().hex[:8]}',
+            **kwargs
+        )
+    
+    def test_save_stores_rendering(self):
+        """Test saving a note stores escaped, linkified HTML and a word count"""
+        note = self._create_note('See https://example.com now\n\n<b>bold</b>')
+        self.assertIn('<a href="https://example.com" rel="nofollow">', note.rendered_content)
+        self.assertIn('&lt;b&gt;bold&lt;/b&gt;', note.rendered_content)
+        self.assertEqual(note.word_count, 4)
+        self.assertEqual(note.excerpt, 'See https://example.com now <b>bold</b>')
+    
+    def test_update_fields_save_renders_only_on_content_change(self):
+        """Test partial saves re-render only when content or summary is saved"""
+        note = self._create_note('one two')
+        Note.objects.filter(pk=note.pk).update(content='one two three')
+        note.refresh_from_db()
+        note.increment_view_count()
+        self.assertEqual(Note.objects.get(pk=note.pk).word_count, 2)
+        
+        note.save(update_fields=['content'])
+        self.assertEqual(Note.objects.get(pk=note.pk).word_count, 3)
+    
+    def test_unchanged_note_is_not_re_rendered(self):
+        """Test saving a loaded note with unchanged text keeps the stored HTML"""
+        note = self._create_note('Body text')
+        Note.objects.filter(pk=note.pk).update(rendered_content='<p>stored</p>')
+        note = Note.objects.get(pk=note.pk)
+        note.is_pinned = True
+        note.save()
+        self.assertEqual(Note.objects.get(pk=note.pk).rendered_content, '<p>stored</p>')
+    
+    def test_backfill_command(self):
+        """Test the backfill renders notes created without Note.save"""
+        from io import StringIO
+        from django.core.management import call_command
+        Note.objects.bulk_create([
+            Note(title=f'Bulk {i}', content=f'word {i}', author=self.user, slug=f'bulk-render-{i}-{uuid.uuid4().hex[:8]}')
+            for i in range(3)
+        ])
+        out = StringIO()
+        call_command('backfill_note_rendering', batch_size=2, stdout=out)
+        self.assertIn('Rendered 3 notes', out.getvalue())
+        self.assertFalse(Note.objects.filter(rendered_content='').exists())
+        self.assertEqual(set(Note.objects.values_list('word_count', flat=True)), {2})
+
+
+class ChunkedAttachmentUploadTests(TestCase):
+    """Tests for resumable chunked attachment uploads"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media_root, NOTES_UPLOAD_CHUNK_SIZE=4)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        
+        self.user = User.objects.create_user(
+            username=f'uploader{uuid.uuid4().hex[:8]}',
+            email=f'uploader{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        self.client.force_login(self.user)
+        self.note = Note.objects.create(
+            title='Upload target',
+            content='Body',
+            author=self.user,
+            slug=f'upload-target-{uuid.uuid4().hex[:8]}',
+        )
+    
+    def _start(self, filename='notes.txt', size=10):
+        return self.client.post(
+            reverse('notes_app:attachment_upload_start', kwargs={'slug': self.note.slug}),
+            {'filename': filename, 'size': size}
+        )
+    
+    def _put_part(self, upload_id, number, data):
+        return self.client.put(
+            reverse('notes_app:attachment_upload_part', kwargs={'pk': upload_id, 'number': number}),
+            data,
+            content_type='application/octet-stream'
+        )
+    
+    def test_out_of_order_resumable_upload(self):
+        """Test parts can arrive in any order, be retried and then completed"""
+        upload_id = self._start().json()['upload_id']
+        self.assertEqual(self._put_part(upload_id, 3, b'ij').status_code, 200)
+        self.assertEqual(self._put_part(upload_id, 1, b'XXXX').status_code, 200)
+        self.assertEqual(self._put_part(upload_id, 1, b'abcd').status_code, 200)
+        
+        status = self.client.get(reverse('notes_app:attachment_upload', kwargs={'pk': upload_id})).json()
+        self.assertEqual(status['parts'], [1, 3])
+        self.assertEqual(status['received_bytes'], 6)
+        
+        incomplete = self.client.post(reverse('notes_app:attachment_upload_complete', kwargs={'pk': upload_id}))
+        self.assertEqual(incomplete.status_code, 400)
+        
+        self._put_part(upload_id, 2, b'efgh')
+        with patch('notes_app.tasks.process_attachment.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('notes_app:attachment_upload_complete', kwargs={'pk': upload_id}))
+        
+        attachment = Attachment.objects.get(pk=response.json()['attachment_id'])
+        delay.assert_called_once_with(attachment.pk)
+        self.assertEqual(attachment.file_size, 10)
+        with attachment.file.open('rb') as stored:
+            self.assertEqual(stored.read(), b'abcdefghij')
+    
+    def test_part_size_is_enforced(self):
+        """Test non-final parts must be exactly one chunk"""
+        upload_id = self._start().json()['upload_id']
+        self.assertEqual(self._put_part(upload_id, 1, b'abc').status_code, 400)
+        self.assertEqual(self._put_part(upload_id, 4, b'a').status_code, 400)
+    
+    def test_rejects_disallowed_type_and_foreign_note(self):
+        """Test uploads are limited to allowed types on the user's own notes"""
+        self.assertEqual(self._start(filename='virus.exe').status_code, 400)
+        
+        other = User.objects.create_user(
+            username=f'other{uuid.uuid4().hex[:8]}',
+            email=f'other{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        self.client.force_login(other)
+        self.assertEqual(self._start().status_code, 403)
+    
+    def test_abort_discards_parts(self):
+        """Test aborting removes stored parts and blocks further parts"""
+        upload_id = self._start().json()['upload_id']
+        self._put_part(upload_id, 1, b'abcd')
+        response = self.client.delete(reverse('notes_app:attachment_upload', kwargs={'pk': upload_id}))
+        self.assertEqual(response.json()['status'], 'aborted')
+        self.assertEqual(self._put_part(upload_id, 2, b'efgh').status_code, 400)
+    
+    def test_process_attachment_sets_metadata_and_thumbnail(self):
+        """Test processing sniffs the MIME type, checksums and thumbnails images"""
+        import hashlib
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.base import ContentFile
+        from .tasks import process_attachment
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, format='PNG')
+        data = buffer.getvalue()
+        
+        attachment = Attachment(note=self.note, filename='photo.jpg')
+        attachment.file.save('photo.jpg', ContentFile(data), save=False)
+        attachment.save()
+        
+        result = process_attachment(attachment.pk)
+        attachment.refresh_from_db()
+        self.assertTrue(result['success'])
+        self.assertEqual(attachment.mime_type, 'image/png')
+        self.assertEqual(attachment.checksum, hashlib.sha256(data).hexdigest())
+        self.assertIsNotNone(attachment.processed_at)
+        with Image.open(attachment.thumbnail.path) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), 320)
+    
+    def test_processing_deduplicates_chunked_uploads(self):
+        """Test a chunked upload of stored content shares the existing blob"""
+        from django.core.files.base import ContentFile
+        from file_manager.models import StoredBlob
+        from .tasks import process_attachment
+        existing = Attachment(note=self.note, filename='first.txt')
+        existing.file.save('first.txt', ContentFile(b'abcdefghij'), save=False)
+        existing.save()
+        
+        upload_id = self._start().json()['upload_id']
+        for number, data in enumerate([b'abcd', b'efgh', b'ij'], start=1):
+            self._put_part(upload_id, number, data)
+        with patch('notes_app.tasks.process_attachment.delay'):
+            response = self.client.post(reverse('notes_app:attachment_upload_complete', kwargs={'pk': upload_id}))
+        duplicate = Attachment.objects.get(pk=response.json()['attachment_id'])
+        uploaded_name = duplicate.file.name
+        
+        process_attachment(duplicate.pk)
+        duplicate.refresh_from_db()
+        storage = duplicate.file.storage
+        self.assertEqual(duplicate.file.name, existing.file.name)
+        self.assertFalse(storage.exists(uploaded_name))
+        self.assertEqual(StoredBlob.objects.get(name=existing.file.name).ref_count, 2)
+        
+        # The blob outlives the first attachment and goes with the last
+        with self.captureOnCommitCallbacks(execute=True):
+            existing.delete()
+        self.assertTrue(storage.exists(duplicate.file.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            duplicate.delete()
+        self.assertFalse(storage.exists(duplicate.file.name))
+    
+    def test_s3_backend_uses_multipart_api(self):
+        """Test the S3 backend maps onto the multipart upload calls"""
+        from unittest.mock import MagicMock
+        from .uploads import S3MultipartBackend
+        storage = MagicMock(bucket_name='bucket', default_acl=None)
+        storage._normalize_name.side_effect = lambda name: f'media/{name}'
+        client = storage.connection.meta.client
+        client.create_multipart_upload.return_value = {'UploadId': 'u1'}
+        client.upload_part.return_value = {'ETag': '"e1"'}
+        
+        backend = S3MultipartBackend(storage)
+        self.assertEqual(backend.start('a/b.txt', 'text/plain'), 'u1')
+        self.assertEqual(backend.upload_part('a/b.txt', 'u1', 1, b'data'), '"e1"')
+        backend.complete('a/b.txt', 'u1', [(1, '"e1"')])
+        
+        client.create_multipart_upload.assert_called_once_with(Bucket='bucket', Key='media/a/b.txt', ContentType='text/plain')
+        client.complete_multipart_upload.assert_called_once_with(
+            Bucket='bucket', Key='media/a/b.txt', UploadId='u1',
+            MultipartUpload={'Parts': [{'PartNumber': 1, 'ETag': '"e1"'}]}
+        )
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Test that admin changelists run a fixed number of queries"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email=f'admin{uuid.uuid4().hex[:8]}@test.com',
+            username=f'admin{uuid.uuid4().hex[:8]}',
+            password='testpass123'
+        )
+        self.admin.is_active = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+    
+    def _add_rows(self, count):
+        for _ in range(count):
+            suffix = uuid.uuid4().hex[:8]
+            author = User.objects.create_user(
+                username=f'author{suffix}',
+                email=f'author{suffix}@test.com',
+                password='testpass123'
+            )
+            category = Category.objects.create(name=f'Category {suffix}', slug=f'category-{suffix}')
+            tag = Tag.objects.create(name=f'tag-{suffix}', slug=f'tag-{suffix}')
+            note = Note.objects.create(
+                title=f'Note {suffix}',
+                content='Body',
+                author=author,
+                category=category,
+                slug=f'note-{suffix}',
+            )
+            note.tags.add(tag)
+            Comment.objects.create(note=note, author=author, content='Comment')
+            attachment = Attachment(note=note, filename='a.txt', file_size=1)
+            attachment.file.name = f'note_attachments/{suffix}.txt'
+            attachment.save()
+    
+    def _changelist_queries(self, model):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse(f'admin:notes_app_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+    
+    def test_changelist_query_count_is_constant(self):
+        """Test each changelist's query count does not grow with its rows"""
+        models = [Category, Tag, Note, Comment, Attachment]
+        self._add_rows(1)
+        baseline = {model: self._changelist_queries(model) for model in models}
+        self._add_rows(4)
+        for model in models:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self._changelist_queries(model), baseline[model])
+    
+    def test_note_count_column_uses_annotation(self):
+        """Test the category note count comes from the annotated queryset"""
+        self._add_rows(2)
+        response = self.client.get(reverse('admin:notes_app_category_changelist') + '?o=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [category.note_total for category in response.context['cl'].result_list],
+            [1, 1]
+        )
+
+
+class NoteFeedTests(TestCase):
+    """Tests for the keyset-paginated note feeds"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(
+            username=f'feeder{uuid.uuid4().hex[:8]}',
+            email=f'feeder{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(name='Feed', slug=f'feed-{uuid.uuid4().hex[:8]}')
+        self.notes = [
+            Note.objects.create(
+                title=f'Feed note {i}',
+                content='Body',
+                author=self.user,
+                category=self.category,
+                status=Note.Status.ACTIVE,
+                is_public=True,
+                is_pinned=(i == 3),
+                slug=f'feed-note-{i}-{uuid.uuid4().hex[:8]}',
+            )
+            for i in range(30)
+        ]
+    
+    def _read_feed(self, url, **params):
+        ids, cursor = [], None
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            data = self.client.get(url, query).json()
+            ids += [card['id'] for card in data['notes']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+    
+    def test_feed_walks_every_note_once(self):
+        """Test the feed visits each note once, pinned notes first"""
+        ids = self._read_feed(reverse('notes_app:note_feed'))
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(len(set(ids)), 30)
+        self.assertEqual(ids[0], self.notes[3].pk)
+        self.assertEqual(ids[1:4], [self.notes[29].pk, self.notes[28].pk, self.notes[27].pk])
+    
+    def test_feed_page_runs_no_count(self):
+        """Test a deep feed page is a single query without COUNT or OFFSET"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('notes_app:notes_by_category_feed', kwargs={'slug': self.category.slug})
+        cursor = self.client.get(url).json()['next_cursor']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        sql = ' '.join(query['sql'] for query in context.captured_queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+    
+    def test_feed_keeps_list_filters(self):
+        """Test the feed applies the list view's filters"""
+        ids = self._read_feed(reverse('notes_app:note_feed'), search='Feed note 1')
+        expected = {note.pk for note in self.notes if note.title.startswith('Feed note 1')}
+        self.assertEqual(set(ids), expected)
+    
+    def test_feed_rejects_bad_requests(self):
+        """Test invalid cursors and unknown categories return JSON errors"""
+        response = self.client.get(reverse('notes_app:note_feed'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse('notes_app:notes_by_category_feed', kwargs={'slug': 'missing-category'})
+        )
+        self.assertEqual(response.status_code, 404)
+    
+    def test_pinning_refreshes_cached_card(self):
+        """Test a cached card shows the new pin state after a toggle"""
+        from notes_app.feeds import serialize_cards
+        note = self.notes[5]
+        self.assertFalse(serialize_cards([note])[0]['is_pinned'])
+        before = note.updated_at
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('notes_app:toggle_pin', kwargs={'pk': note.pk}))
+        self.assertTrue(response.json()['is_pinned'])
+        note.refresh_from_db()
+        self.assertGreater(note.updated_at, before)
+        self.assertTrue(serialize_cards([note])[0]['is_pinned'])
+    
+    def test_list_page_renders_first_page_and_cursor(self):
+        """Test the HTML list renders the first page and a load-more link"""
+        response = self.client.get(reverse('notes_app:note_list'))
+        self.assertEqual(len(response.context['cards']), 12)
+        self.assertContains(response, 'id="note-feed-more"')
+        
+        response = self.client.get(
+            reverse('notes_app:note_list'), {'cursor': response.context['next_cursor']}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.notes[17].title)
+    
+    def test_card_refreshes_after_edit(self):
+        """Test cached cards are rebuilt when the note changes"""
+        url = reverse('notes_app:note_feed')
+        self.client.get(url)
+        note = self.notes[3]
+        note.title = 'Renamed pinned note'
+        note.save()
+        card = self.client.get(url).json()['notes'][0]
+        self.assertEqual(card['title'], 'Renamed pinned note')
+
+
+class AuthorStatsTests(TestCase):
+    """Tests for the cached per-author note stats"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(
+            username=f'statsuser{uuid.uuid4().hex[:8]}',
+            email=f'statsuser{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        for status in ['draft', 'draft', 'active', 'archived']:
+            Note.objects.create(
+                title=f'{status} note',
+                content='one two three',
+                author=self.user,
+                status=status,
+                slug=f'stats-{uuid.uuid4().hex[:8]}',
+            )
+    
+    def test_stats_are_one_query_then_cached(self):
+        """Test stats take one query and are then served from the cache"""
+        from .stats import get_author_stats
+        with self.assertNumQueries(1):
+            stats = get_author_stats(self.user.pk)
+        self.assertEqual(
+            (stats['total'], stats['draft'], stats['active'], stats['archived'], stats['words']),
+            (4, 2, 1, 1, 12)
+        )
+        with self.assertNumQueries(0):
+            get_author_stats(self.user.pk)
+    
+    def test_save_and_delete_invalidate_stats(self):
+        """Test note saves and deletes refresh the stats"""
+        from .stats import get_author_stats
+        get_author_stats(self.user.pk)
+        note = Note.objects.filter(author=self.user, status='draft').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            note.publish()
+        self.assertEqual(get_author_stats(self.user.pk)['draft'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            note.delete()
+        self.assertEqual(get_author_stats(self.user.pk)['total'], 3)
+        
+        # View counting does not touch the counts
+        other = Note.objects.filter(author=self.user).first()
+        get_author_stats(self.user.pk)
+        other.increment_view_count()
+        with self.assertNumQueries(0):
+            get_author_stats(self.user.pk)
+    
+    def test_reassigned_note_updates_both_authors(self):
+        """Test moving a note to another author refreshes both authors' stats"""
+        from .stats import get_author_stats
+        other = User.objects.create_user(
+            username=f'other{uuid.uuid4().hex[:8]}',
+            email=f'other{uuid.uuid4().hex[:8]}@test.com',
+            password='testpass123'
+        )
+        get_author_stats(self.user.pk)
+        get_author_stats(other.pk)
+        note = Note.objects.filter(author=self.user).first()
+        note.author = other
+        with self.captureOnCommitCallbacks(execute=True):
+            note.save()
+        self.assertEqual(get_author_stats(self.user.pk)['total'], 3)
+        self.assertEqual(get_author_stats(other.pk)['total'], 1)
+    
+    def test_bulk_action_invalidates_stats(self):
+        """Test bulk status changes refresh the stats"""
+        from .stats import get_author_stats
+        from .tasks import apply_bulk_action
+        get_author_stats(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_bulk_action(Note.objects.filter(author=self.user), 'archive')
+        self.assertEqual(get_author_stats(self.user.pk)['archived'], 4)
+    
+    def test_stats_cached_before_commit_are_dropped(self):
+        """Test stats read while a change is uncommitted are invalidated on commit"""
+        from .stats import get_author_stats
+        note = Note.objects.filter(author=self.user, status='draft').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            note.publish()
+            # Another request caching the pre-commit counts
+            get_author_stats(self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_author_stats(self.user.pk)['draft'], 1)
+    
+    def test_my_notes_uses_stats(self):
+        """Test My notes shows the counts from the stats"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notes_app:my_notes'))
+        self.assertEqual(response.context['draft_count'], 2)
+        self.assertEqual(response.context['active_count'], 1)
+        self.assertEqual(response.context['archived_count'], 1)
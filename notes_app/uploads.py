@@ -0,0 +1,341 @@
+"""
+Notes App Chunked Uploads
+
+Resumable attachment uploads. The client declares the file, then sends it
+in fixed-size parts that go straight to the storage backend (an S3/MinIO
+multipart upload in production), so no request ever holds the whole file.
+Completing the upload creates the Attachment and hands it to the
+process_attachment task for MIME sniffing, checksumming and thumbnails.
+
+Two backends implement the same small interface:
+
+- S3MultipartBackend for S3Boto3Storage (S3 and MinIO)
+- LocalMultipartBackend for FileSystemStorage (development and tests)
+
+Parts bypass the deduplicating storage's save(); processing adopts the
+assembled file into the blob store once its checksum is known.
+"""
+import hashlib
+import math
+import mimetypes
+import os
+import shutil
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .forms import ALLOWED_ATTACHMENT_EXTENSIONS
+from .models import Attachment, AttachmentUpload
+
+# S3 rejects non-final parts under 5 MiB
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_UPLOAD_SIZE = 1024 * 1024 * 1024
+
+THUMBNAIL_SIZE = (320, 320)
+
+# Leading bytes of the formats attachments are allowed to have
+MAGIC_NUMBERS = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+]
+
+
+class UploadError(ValueError):
+    """Raised when an upload request is invalid"""
+
+
+def get_chunk_size():
+    return getattr(settings, 'NOTES_UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def get_max_upload_size():
+    return getattr(settings, 'NOTES_ATTACHMENT_MAX_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+
+
+# =============================================================================
+# STORAGE BACKENDS
+# =============================================================================
+
+class LocalMultipartBackend:
+    """Multipart uploads on a FileSystemStorage; parts are spooled to disk"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def _parts_dir(self, upload_id):
+        return self.storage.path(os.path.join('attachment_uploads', upload_id))
+
+    def start(self, name, content_type):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._parts_dir(upload_id), exist_ok=True)
+        return upload_id
+
+    def upload_part(self, name, upload_id, number, data):
+        with open(os.path.join(self._parts_dir(upload_id), f'{number}.part'), 'wb') as part:
+            part.write(data)
+        return hashlib.md5(data).hexdigest()
+
+    def complete(self, name, upload_id, parts):
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as destination:
+            for number, _ in parts:
+                with open(os.path.join(self._parts_dir(upload_id), f'{number}.part'), 'rb') as part:
+                    shutil.copyfileobj(part, destination)
+        shutil.rmtree(self._parts_dir(upload_id), ignore_errors=True)
+
+    def abort(self, name, upload_id):
+        shutil.rmtree(self._parts_dir(upload_id), ignore_errors=True)
+
+
+class S3MultipartBackend:
+    """Multipart uploads streamed straight into an S3Boto3Storage bucket"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.client = storage.connection.meta.client
+
+    def _key(self, name):
+        from storages.utils import clean_name
+        return self.storage._normalize_name(clean_name(name))
+
+    def start(self, name, content_type):
+        params = {'Bucket': self.storage.bucket_name, 'Key': self._key(name)}
+        if content_type:
+            params['ContentType'] = content_type
+        if self.storage.default_acl:
+            params['ACL'] = self.storage.default_acl
+        return self.client.create_multipart_upload(**params)['UploadId']
+
+    def upload_part(self, name, upload_id, number, data):
+        response = self.client.upload_part(
+            Bucket=self.storage.bucket_name,
+            Key=self._key(name),
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=data,
+        )
+        return response['ETag']
+
+    def complete(self, name, upload_id, parts):
+        self.client.complete_multipart_upload(
+            Bucket=self.storage.bucket_name,
+            Key=self._key(name),
+            UploadId=upload_id,
+            MultipartUpload={
+                'Parts': [{'PartNumber': number, 'ETag': etag} for number, etag in parts]
+            },
+        )
+
+    def abort(self, name, upload_id):
+        self.client.abort_multipart_upload(
+            Bucket=self.storage.bucket_name,
+            Key=self._key(name),
+            UploadId=upload_id,
+        )
+
+
+def get_upload_backend(storage=None):
+    """Pick the multipart backend matching the storage attachments use."""
+    storage = storage or Attachment._meta.get_field('file').storage
+    try:
+        from storages.backends.s3boto3 import S3Boto3Storage
+    except ImportError:
+        S3Boto3Storage = None
+
+    if S3Boto3Storage is not None and isinstance(storage, S3Boto3Storage):
+        return S3MultipartBackend(storage)
+    return LocalMultipartBackend(storage)
+
+
+# =============================================================================
+# UPLOAD LIFECYCLE
+# =============================================================================
+
+def create_upload(note, user, filename, size, content_type=''):
+    """
+    Start a chunked upload for a note attachment.
+
+    Raises:
+        UploadError: If the file type or size is not allowed
+    """
+    filename = os.path.basename(filename or '').strip()
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in ALLOWED_ATTACHMENT_EXTENSIONS:
+        raise UploadError(
+            f'File type not allowed. Allowed: {", ".join(ALLOWED_ATTACHMENT_EXTENSIONS)}'
+        )
+    if size <= 0 or size > get_max_upload_size():
+        raise UploadError(f'File size must be between 1 byte and {get_max_upload_size()} bytes.')
+
+    storage_name = timezone.now().strftime('note_attachments/%Y/%m/') + (
+        f'{uuid.uuid4().hex[:12]}-{get_valid_filename(filename)}'
+    )
+    content_type = content_type or mimetypes.guess_type(filename)[0] or ''
+    backend_upload_id = get_upload_backend().start(storage_name, content_type)
+
+    return AttachmentUpload.objects.create(
+        note=note,
+        user=user,
+        filename=filename,
+        content_type=content_type[:100],
+        size=size,
+        storage_name=storage_name,
+        backend_upload_id=backend_upload_id,
+    )
+
+
+def expected_part_size(upload, number):
+    """Size every part must have; only the last one may be shorter."""
+    chunk_size = get_chunk_size()
+    part_count = max(math.ceil(upload.size / chunk_size), 1)
+    if number < 1 or number > part_count:
+        raise UploadError(f'Part number must be between 1 and {part_count}.')
+    if number < part_count:
+        return chunk_size
+    return upload.size - chunk_size * (part_count - 1)
+
+
+def receive_part(upload, number, data):
+    """
+    Store one part. Sending a part again replaces it, so clients can retry
+    or resume without restarting the upload.
+
+    Returns:
+        dict: The stored part's etag and size
+    """
+    if upload.status != AttachmentUpload.Status.ACTIVE:
+        raise UploadError('Upload is no longer active.')
+    expected = expected_part_size(upload, number)
+    if len(data) != expected:
+        raise UploadError(f'Part {number} must be {expected} bytes, got {len(data)}.')
+
+    etag = get_upload_backend().upload_part(
+        upload.storage_name, upload.backend_upload_id, number, data
+    )
+    part = {'etag': etag, 'size': len(data)}
+
+    # Parts may arrive concurrently; merge into the latest row
+    with transaction.atomic():
+        locked = AttachmentUpload.objects.select_for_update().get(pk=upload.pk)
+        locked.parts[str(number)] = part
+        locked.save(update_fields=['parts', 'updated_at'])
+    upload.parts = locked.parts
+    return part
+
+
+def complete_upload(upload):
+    """
+    Assemble the parts and create the Attachment.
+
+    Processing (MIME type, checksum, thumbnail) is queued once the
+    transaction commits.
+    """
+    if upload.status != AttachmentUpload.Status.ACTIVE:
+        raise UploadError('Upload is no longer active.')
+    part_count = max(math.ceil(upload.size / get_chunk_size()), 1)
+    missing = [n for n in range(1, part_count + 1) if str(n) not in upload.parts]
+    if missing:
+        raise UploadError(f'Missing parts: {", ".join(map(str, missing))}.')
+
+    get_upload_backend().complete(
+        upload.storage_name,
+        upload.backend_upload_id,
+        [(n, upload.parts[str(n)]['etag']) for n in range(1, part_count + 1)],
+    )
+
+    with transaction.atomic():
+        attachment = Attachment(
+            note=upload.note,
+            filename=upload.filename,
+            file_size=upload.size,
+            mime_type=upload.content_type,
+        )
+        # The bytes are already in storage; only point the field at them
+        attachment.file.name = upload.storage_name
+        attachment.save()
+
+        upload.attachment = attachment
+        upload.status = AttachmentUpload.Status.COMPLETE
+        upload.save(update_fields=['attachment', 'status', 'updated_at'])
+        transaction.on_commit(lambda: _queue_processing(attachment.pk))
+    return attachment
+
+
+def abort_upload(upload):
+    """Discard an unfinished upload and any parts already stored."""
+    if upload.status != AttachmentUpload.Status.ACTIVE:
+        return
+    get_upload_backend().abort(upload.storage_name, upload.backend_upload_id)
+    upload.status = AttachmentUpload.Status.ABORTED
+    upload.save(update_fields=['status', 'updated_at'])
+
+
+def _queue_processing(attachment_id):
+    import logging
+    from .tasks import process_attachment
+
+    try:
+        process_attachment.delay(attachment_id)
+    except Exception:
+        # The attachment is usable without its metadata; log and move on
+        logging.getLogger(__name__).warning(
+            'Could not queue processing for attachment %s', attachment_id, exc_info=True
+        )
+
+
+# =============================================================================
+# POST-PROCESSING
+# =============================================================================
+
+def sniff_mime_type(header, filename):
+    """MIME type from the file's leading bytes, falling back to its name."""
+    for magic, mime_type in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return mime_type
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def file_digest(file_obj):
+    """
+    Stream a stored file once, returning its SHA-256 and first bytes.
+
+    Returns:
+        tuple: (hex digest, header bytes)
+    """
+    digest = hashlib.sha256()
+    header = b''
+    for chunk in file_obj.chunks():
+        if len(header) < 2048:
+            header += chunk[:2048 - len(header)]
+        digest.update(chunk)
+    return digest.hexdigest(), header
+
+
+def make_thumbnail(file_obj):
+    """
+    Render a PNG thumbnail of an image attachment.
+
+    Returns:
+        ContentFile or None if the file is not a readable image
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    file_obj.seek(0)
+    try:
+        with Image.open(file_obj) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            output = BytesIO()
+            image.save(output, format='PNG')
+    except (UnidentifiedImageError, OSError):
+        return None
+    return ContentFile(output.getvalue())
@@ -16,6 +16,12 @@ urlpatterns = [
     # Note list views
     path('notes/', views.NoteListView.as_view(), name='note_list'),
     path('my-notes/', views.MyNotesListView.as_view(), name='my_notes'),
+    
+    # Keyset-paginated JSON feeds for infinite scroll
+    path('notes/feed/', views.NoteListView.as_view(feed_json=True), name='note_feed'),
+    path('my-notes/feed/', views.MyNotesListView.as_view(feed_json=True), name='my_notes_feed'),
+    path('categories/<slug:slug>/notes/feed/', views.NotesByCategoryView.as_view(feed_json=True), name='notes_by_category_feed'),
+    path('tags/<slug:slug>/feed/', views.NotesByTagView.as_view(feed_json=True), name='notes_by_tag_feed'),
     path('notes/bulk-action/', views.BulkActionFormView.as_view(), name='bulk_action'),
     
     # Note CRUD
@@ -25,6 +31,7 @@ urlpatterns = [
     path('notes/<slug:slug>/edit/', views.NoteUpdateView.as_view(), name='note_update'),
     path('notes/<slug:slug>/delete/', views.NoteDeleteView.as_view(), name='note_delete'),
     path('notes/<slug:slug>/publish/', views.NotePublishView.as_view(), name='note_publish'),
+    path('notes/<slug:slug>/comments/', views.NoteCommentsView.as_view(), name='note_comments'),
     
     # AJAX endpoints
     path('notes/<int:pk>/toggle-pin/', views.NoteTogglePinView.as_view(), name='toggle_pin'),
@@ -45,6 +52,12 @@ urlpatterns = [
     # Comment deletion
     path('comments/<int:pk>/delete/', views.CommentDeleteView.as_view(), name='comment_delete'),
     
+    # Chunked attachment uploads
+    path('notes/<slug:slug>/attachments/uploads/', views.AttachmentUploadStartView.as_view(), name='attachment_upload_start'),
+    path('attachments/uploads/<uuid:pk>/', views.AttachmentUploadView.as_view(), name='attachment_upload'),
+    path('attachments/uploads/<uuid:pk>/parts/<int:number>/', views.AttachmentUploadPartView.as_view(), name='attachment_upload_part'),
+    path('attachments/uploads/<uuid:pk>/complete/', views.AttachmentUploadCompleteView.as_view(), name='attachment_upload_complete'),
+    
     # Redirect views
     path('random/', views.RandomNoteRedirectView.as_view(), name='random_note'),
     path('latest/', views.LatestNoteRedirectView.as_view(), name='latest_note'),
@@ -11,22 +11,40 @@ This module demonstrates ALL Django generic views:
 - TemplateView
 - RedirectView
 """
+import re
+
 from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView,
-    FormView, TemplateView, RedirectView
+    FormView, TemplateView, RedirectView, View
 )
 from django.views.generic.edit import FormMixin
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
+from django.conf import settings
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.http import JsonResponse, Http404
 from django.db.models import Q, Count
-from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 
-from .models import Note, Category, Tag, Comment, Attachment
+from django_starter.utils import random_instance
+from .cache import get_note_versions
+from .feeds import feed_page
+from .models import Note, Category, Tag, Comment, Attachment, AttachmentUpload
 from .forms import NoteForm, CategoryForm, CommentForm, NoteFilterForm, AttachmentForm
+from .pagination import InvalidCursor, keyset_paginate
+from .stats import get_author_stats
+from .tasks import BULK_ACTIONS, apply_bulk_action, bulk_note_action
+from .uploads import (
+    UploadError, abort_upload, complete_upload, create_upload,
+    get_chunk_size, receive_part,
+)
+
+COMMENTS_PAGE_SIZE = 20
+COMMENT_ORDERING = ('created_at', 'id')
+TASK_ID_RE = re.compile(r'[0-9a-f-]+')
 
 
 # =============================================================================
@@ -70,13 +88,75 @@ class AboutNotesView(TemplateView):
 # LIST VIEWS
 # =============================================================================
 
-class NoteListView(ListView):
+class NoteFeedMixin:
+    """
+    Keyset pagination for note ListViews.
+    
+    Pages are addressed with ``?cursor=`` instead of ``?page=``, so deep
+    pages cost the same as the first and nothing is COUNTed. Views routed
+    with ``feed_json=True`` answer with the JSON feed used for infinite
+    scroll: the page's cards, their rendered HTML and the next cursor.
+    """
+    feed_json = False
+    feed_url_name = None
+    cards_template_name = 'notes_app/partials/note_cards.html'
+    cards_context = {}
+    
+    def get(self, request, *args, **kwargs):
+        if not self.feed_json:
+            return super().get(request, *args, **kwargs)
+        
+        try:
+            queryset = self.get_queryset()
+            notes, cards, next_cursor = feed_page(
+                queryset, request.GET.get('cursor'), self.get_paginate_by(queryset)
+            )
+        except Http404:
+            return JsonResponse({'error': 'Not found'}, status=404)
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        
+        html = render_to_string(
+            self.cards_template_name,
+            {'cards': cards, **self.cards_context},
+            request=request
+        )
+        return JsonResponse({'notes': cards, 'html': html, 'next_cursor': next_cursor})
+    
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            notes, self.cards, self.next_cursor = feed_page(
+                queryset, self.request.GET.get('cursor'), page_size
+            )
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return (None, None, notes, self.next_cursor is not None)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.cards_context)
+        context['cards'] = self.cards
+        context['next_cursor'] = self.next_cursor
+        
+        # Filters carry over to the feed and the no-JS "load more" link
+        query = self.request.GET.copy()
+        query.pop('cursor', None)
+        context['feed_url'] = reverse(self.feed_url_name, kwargs=self.kwargs)
+        context['feed_query'] = query.urlencode()
+        if self.next_cursor:
+            query['cursor'] = self.next_cursor
+            context['next_page_query'] = query.urlencode()
+        return context
+
+
+class NoteListView(NoteFeedMixin, ListView):
     """List all notes - demonstrates ListView with filtering and pagination"""
     model = Note
     template_name = 'notes_app/note_list.html'
     context_object_name = 'notes'
-    paginate_by = 10
+    paginate_by = 12
     ordering = ['-is_pinned', '-created_at']
+    feed_url_name = 'notes_app:note_feed'
     
     def get_queryset(self):
         queryset = super().get_queryset().select_related('author', 'category')
@@ -133,29 +213,27 @@ class NoteListView(ListView):
         return context
 
 
-class MyNotesListView(LoginRequiredMixin, ListView):
+class MyNotesListView(LoginRequiredMixin, NoteFeedMixin, ListView):
     """List current user's notes - demonstrates LoginRequiredMixin"""
     model = Note
     template_name = 'notes_app/my_notes.html'
     context_object_name = 'notes'
-    paginate_by = 10
+    paginate_by = 12
+    feed_url_name = 'notes_app:my_notes_feed'
+    cards_template_name = 'notes_app/partials/my_note_items.html'
     
     def get_queryset(self):
         return Note.objects.filter(
             author=self.request.user
-        ).select_related('category').prefetch_related('tags')
+        ).select_related('author', 'category')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['draft_count'] = self.get_queryset().filter(
-            status=Note.Status.DRAFT
-        ).count()
-        context['active_count'] = self.get_queryset().filter(
-            status=Note.Status.ACTIVE
-        ).count()
-        context['archived_count'] = self.get_queryset().filter(
-            status=Note.Status.ARCHIVED
-        ).count()
+        stats = get_author_stats(self.request.user.pk)
+        context['note_stats'] = stats
+        context['draft_count'] = stats['draft']
+        context['active_count'] = stats['active']
+        context['archived_count'] = stats['archived']
         return context
 
 
@@ -183,19 +261,22 @@ class TagListView(ListView):
         ).order_by('-notes_count')
 
 
-class NotesByCategoryView(ListView):
+class NotesByCategoryView(NoteFeedMixin, ListView):
     """List notes by category - demonstrates ListView with dynamic filtering"""
     model = Note
     template_name = 'notes_app/notes_by_category.html'
     context_object_name = 'notes'
-    paginate_by = 10
+    paginate_by = 12
+    feed_url_name = 'notes_app:notes_by_category_feed'
+    cards_template_name = 'notes_app/partials/note_cards_compact.html'
+    cards_context = {'hide_category': True}
     
     def get_queryset(self):
         self.category = get_object_or_404(Category, slug=self.kwargs['slug'])
         return Note.objects.filter(
             category=self.category,
             status=Note.Status.ACTIVE
-        ).select_related('author')
+        ).select_related('author', 'category')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -203,12 +284,14 @@ class NotesByCategoryView(ListView):
         return context
 
 
-class NotesByTagView(ListView):
+class NotesByTagView(NoteFeedMixin, ListView):
     """List notes by tag - demonstrates ListView with M2M filtering"""
     model = Note
     template_name = 'notes_app/notes_by_tag.html'
     context_object_name = 'notes'
-    paginate_by = 10
+    paginate_by = 12
+    feed_url_name = 'notes_app:notes_by_tag_feed'
+    cards_template_name = 'notes_app/partials/note_cards_compact.html'
     
     def get_queryset(self):
         self.tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
@@ -227,14 +310,11 @@ class NotesByTagView(ListView):
 # DETAIL VIEWS
 # =============================================================================
 
-class NoteDetailView(FormMixin, DetailView):
-    """Note detail page - demonstrates DetailView with FormMixin for comments"""
+class VisibleNoteMixin:
+    """Restrict note lookups to notes the current user may view"""
     model = Note
-    template_name = 'notes_app/note_detail.html'
-    context_object_name = 'note'
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
-    form_class = CommentForm
     
     def get_queryset(self):
         queryset = super().get_queryset().select_related('author', 'category')
@@ -247,22 +327,51 @@ class NoteDetailView(FormMixin, DetailView):
             )
         return queryset.filter(is_public=True, status=Note.Status.ACTIVE)
     
+    def get_comment_page(self, cursor=None):
+        """Get one keyset page of the note's approved comments"""
+        comments, next_cursor = keyset_paginate(
+            self.object.comments.filter(is_approved=True).select_related('author'),
+            COMMENT_ORDERING,
+            cursor=cursor,
+            limit=COMMENTS_PAGE_SIZE,
+        )
+        return {'comments': comments, 'next_cursor': next_cursor}
+
+
+class NoteDetailView(VisibleNoteMixin, FormMixin, DetailView):
+    """Note detail page - demonstrates DetailView with FormMixin for comments"""
+    template_name = 'notes_app/note_detail.html'
+    context_object_name = 'note'
+    form_class = CommentForm
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.filter(
-            is_approved=True
-        ).select_related('author')
+        context['comments'] = self.object.comments.filter(is_approved=True)
+        # Only the first page is rendered; the rest is fetched from NoteCommentsView
+        context['comment_page'] = SimpleLazyObject(self.get_comment_page)
         context['attachments'] = self.object.attachments.all()
-        context['related_notes'] = Note.objects.filter(
-            category=self.object.category,
-            status=Note.Status.ACTIVE
-        ).exclude(pk=self.object.pk)[:5]
+        context['related_notes'] = SimpleLazyObject(self.get_related_notes)
+        # Values above stay lazy, so cached fragments never evaluate them
+        context['fragment_versions'] = get_note_versions(self.object.pk)
         
         # Increment view count
         self.object.increment_view_count()
         
         return context
     
+    def get_related_notes(self):
+        """Stored recommendations, or same-category notes until they are computed"""
+        related = list(Note.objects.filter(
+            recommended_for__note=self.object,
+            status=Note.Status.ACTIVE
+        ).order_by('recommended_for__rank')[:5])
+        if related:
+            return related
+        return list(Note.objects.filter(
+            category=self.object.category,
+            status=Note.Status.ACTIVE
+        ).exclude(pk=self.object.pk)[:5])
+    
     def post(self, request, *args, **kwargs):
         """Handle comment submission"""
         if not request.user.is_authenticated:
@@ -485,25 +594,41 @@ class BulkActionFormView(LoginRequiredMixin, FormView):
     form_class = NoteFilterForm
     success_url = reverse_lazy('notes_app:my_notes')
     
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Set after a large selection was handed to a background task; only
+        # ids the progress websocket route accepts are passed to the page
+        task_id = self.request.GET.get('task_id', '')
+        context['task_id'] = task_id if TASK_ID_RE.fullmatch(task_id) else None
+        return context
+    
     def form_valid(self, form):
         action = self.request.POST.get('action')
         note_ids = self.request.POST.getlist('note_ids')
         
+        if action not in BULK_ACTIONS:
+            return super().form_valid(form)
+        
+        threshold = getattr(settings, 'NOTES_BULK_ASYNC_THRESHOLD', 200)
+        if len(note_ids) > threshold:
+            task = bulk_note_action.delay(
+                self.request.user.pk,
+                action,
+                [int(note_id) for note_id in note_ids if note_id.isdigit()]
+            )
+            messages.info(
+                self.request,
+                f'Processing {len(note_ids)} notes in the background. '
+                'You will be notified when it finishes.'
+            )
+            return redirect(f"{reverse('notes_app:bulk_action')}?task_id={task.id}")
+        
         notes = Note.objects.filter(
             id__in=note_ids,
             author=self.request.user
         )
-        
-        if action == 'archive':
-            notes.update(status=Note.Status.ARCHIVED)
-            messages.success(self.request, f'{notes.count()} notes archived!')
-        elif action == 'publish':
-            notes.update(status=Note.Status.ACTIVE, published_at=timezone.now())
-            messages.success(self.request, f'{notes.count()} notes published!')
-        elif action == 'delete':
-            count = notes.count()
-            notes.delete()
-            messages.success(self.request, f'{count} notes deleted!')
+        count = apply_bulk_action(notes, action)
+        messages.success(self.request, f'{count} notes {BULK_ACTIONS[action]}!')
         
         return super().form_valid(form)
 
@@ -518,10 +643,10 @@ class RandomNoteRedirectView(RedirectView):
     query_string = True
     
     def get_redirect_url(self, *args, **kwargs):
-        random_note = Note.objects.filter(
-            status=Note.Status.ACTIVE,
-            is_public=True
-        ).order_by('?').first()
+        random_note = random_instance(
+            Note.objects.filter(status=Note.Status.ACTIVE, is_public=True),
+            cache_key='notes_app:random_note_bounds',
+        )
         
         if random_note:
             return random_note.get_absolute_url()
@@ -558,7 +683,8 @@ class NoteTogglePinView(LoginRequiredMixin, UpdateView):
             return JsonResponse({'error': 'Permission denied'}, status=403)
         
         self.object.is_pinned = not self.object.is_pinned
-        self.object.save(update_fields=['is_pinned'])
+        # updated_at changes the cached card's key (see feeds.py)
+        self.object.save(update_fields=['is_pinned', 'updated_at'])
         
         return JsonResponse({
             'success': True,
@@ -567,6 +693,40 @@ class NoteTogglePinView(LoginRequiredMixin, UpdateView):
         })
 
 
+class NoteCommentsView(VisibleNoteMixin, DetailView):
+    """Next page of a note's comments as JSON, for the "load more" button"""
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            self.object = self.get_object()
+        except Http404:
+            return JsonResponse({'error': 'Note not found'}, status=404)
+        
+        try:
+            page = self.get_comment_page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        
+        html = render_to_string(
+            'notes_app/partials/comment_list.html',
+            {'comments': page['comments'], 'note': self.object},
+            request=request
+        )
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'content': comment.content,
+                    'created_at': comment.created_at.isoformat(),
+                }
+                for comment in page['comments']
+            ],
+            'html': html,
+            'next_cursor': page['next_cursor'],
+        })
+
+
 class NoteArchiveView(LoginRequiredMixin, UpdateView):
     """Archive a note via AJAX"""
     model = Note
@@ -585,3 +745,93 @@ class NoteArchiveView(LoginRequiredMixin, UpdateView):
             'status': self.object.status,
             'message': 'Note archived!'
         })
+
+
+# =============================================================================
+# CHUNKED ATTACHMENT UPLOAD API
+# =============================================================================
+
+def upload_status(upload):
+    """JSON description of an upload, used to resume it"""
+    return {
+        'upload_id': str(upload.id),
+        'status': upload.status,
+        'filename': upload.filename,
+        'size': upload.size,
+        'chunk_size': get_chunk_size(),
+        'received_bytes': upload.received_bytes,
+        'parts': sorted(int(number) for number in upload.parts),
+        'attachment_id': upload.attachment_id,
+    }
+
+
+class AttachmentUploadStartView(LoginRequiredMixin, View):
+    """Start a chunked upload for one of the user's notes"""
+    
+    def post(self, request, slug):
+        note = get_object_or_404(Note, slug=slug)
+        if note.author != request.user and not request.user.is_staff:
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        
+        try:
+            size = int(request.POST.get('size', 0))
+            upload = create_upload(
+                note,
+                request.user,
+                request.POST.get('filename', ''),
+                size,
+                request.POST.get('content_type', '')
+            )
+        except (UploadError, ValueError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        return JsonResponse(upload_status(upload), status=201)
+
+
+class AttachmentUploadMixin(LoginRequiredMixin):
+    """Look up an upload owned by the current user"""
+    
+    def get_upload(self):
+        return get_object_or_404(AttachmentUpload, pk=self.kwargs['pk'], user=self.request.user)
+
+
+class AttachmentUploadView(AttachmentUploadMixin, View):
+    """Upload status (for resuming) and abort"""
+    
+    def get(self, request, pk):
+        return JsonResponse(upload_status(self.get_upload()))
+    
+    def delete(self, request, pk):
+        upload = self.get_upload()
+        abort_upload(upload)
+        return JsonResponse(upload_status(upload))
+
+
+class AttachmentUploadPartView(AttachmentUploadMixin, View):
+    """Receive one part as the raw request body"""
+    
+    def put(self, request, pk, number):
+        upload = self.get_upload()
+        
+        # Read the stream directly: request.body is capped at
+        # DATA_UPLOAD_MAX_MEMORY_SIZE and parts are larger than that
+        data = request.read(get_chunk_size() + 1)
+        try:
+            part = receive_part(upload, number, data)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        return JsonResponse({'part': number, **part, 'received_bytes': upload.received_bytes})
+
+
+class AttachmentUploadCompleteView(AttachmentUploadMixin, View):
+    """Assemble the parts into an attachment"""
+    
+    def post(self, request, pk):
+        upload = self.get_upload()
+        try:
+            complete_upload(upload)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        return JsonResponse(upload_status(upload))
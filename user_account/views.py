@@ -314,7 +314,7 @@ def error_400(request, exception):
 
 
 def error_403(request, exception):
-    return render(request, 'error/error_403.html')
+    return render(request, 'error/error_403.html', status=403)
 
 
 def error_500(request):